@@ -102,3 +102,27 @@ Return ONLY JSON:
 }}
 """.strip()
 
+
+
+def prompt_email_body(step: dict, lead: dict, campaign_name: str) -> str:
+    return f"""
+SYSTEM:
+You are a B2B cold email copywriter. Return ONLY the email body as plain text. No subject line, no markdown.
+
+USER:
+Personalize this sequence step for one lead.
+
+CAMPAIGN:
+{campaign_name}
+
+STEP:
+{json.dumps(step)}
+
+LEAD:
+{json.dumps(lead)}
+
+RULES:
+- under 120 words
+- keep the step's goal and call to action
+- no hype, no unverifiable claims
+""".strip()
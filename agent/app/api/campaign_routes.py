@@ -1,18 +1,29 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from pydantic import BaseModel
 from app.db.sqlite import save_campaign_sequence
 import csv
-import io
+import os
+import shutil
+import tempfile
 
 from app.db.sqlite import (
     get_latest_workspace,
     create_campaign,
     set_campaign_status,
-    list_leads,
-    add_leads_bulk,
+    list_leads_page,
+    create_lead_import,
+    get_lead_import,
     get_campaign_activity,
     get_campaign,
+    log_event,
 )
+from app.db.event_rollup import get_event_trends
+from app.queue.job_queue import enqueue
+from app.queue.scheduler import wake_scheduler
+
+# Uploads are spooled here and streamed into lead by the import_leads job.
+IMPORT_DIR = os.getenv("SALESTROOPZ_IMPORT_DIR", os.path.join(tempfile.gettempdir(), "salestroopz-imports"))
+UPLOAD_CHUNK_BYTES = 1 << 20
 
 router = APIRouter(prefix="/campaign", tags=["campaign"])
 
@@ -39,6 +50,15 @@ def start(campaign_id: int):
     c = set_campaign_status(campaign_id, "running")
     if not c:
         raise HTTPException(status_code=404, detail="Campaign not found")
+    try:
+        # the campaign is already running; a missed wake only delays the first
+        # sends until the tick's next run (TICK_MAX_SLEEP_SECONDS at the latest)
+        wake_scheduler()
+    except Exception as e:
+        try:
+            log_event("scheduler.wake_failed", level="WARN", campaign_id=c.id, message=str(e))
+        except Exception:
+            pass
     return {"campaign_id": c.id, "status": c.status}
 
 @router.post("/{campaign_id}/pause")
@@ -49,20 +69,36 @@ def pause(campaign_id: int):
     return {"campaign_id": c.id, "status": c.status}
 
 @router.get("/{campaign_id}/leads")
-def leads(campaign_id: int):
-    rows = list_leads(campaign_id)
-    return [
-        {
-            "id": l.id,
-            "full_name": l.full_name,
-            "email": l.email,
-            "company": l.company,
-            "state": l.state,
-            "touch_count": l.touch_count,
-            "next_touch_at": l.next_touch_at.isoformat() if l.next_touch_at else None,
-        }
-        for l in rows
-    ]
+def leads(
+    campaign_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str | None = None,
+    state: list[str] | None = Query(None),
+    q: str | None = None,
+):
+    """
+    Keyset-paginated: pass the returned next_cursor to get the following page.
+    ?state=NEW&state=FOLLOWUP filters by state; ?q= is a prefix match on email/name/company.
+    """
+    try:
+        rows, next_cursor = list_leads_page(campaign_id, limit=limit, cursor=cursor, states=state, q=q)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {
+        "items": [
+            {
+                "id": l["id"],
+                "full_name": l["full_name"],
+                "email": l["email"],
+                "company": l["company"],
+                "state": l["state"],
+                "touch_count": l["touch_count"],
+                "next_touch_at": l["next_touch_at"].isoformat() if l["next_touch_at"] else None,
+            }
+            for l in rows
+        ],
+        "next_cursor": next_cursor,
+    }
 
 @router.get("/{campaign_id}/activity")
 def activity(campaign_id: int, limit: int = 200):
@@ -78,26 +114,59 @@ def activity(campaign_id: int, limit: int = 200):
         for a in rows
     ]
 
-@router.post("/{campaign_id}/leads/upload")
-async def upload_leads(campaign_id: int, file: UploadFile = File(...)):
+@router.get("/{campaign_id}/trends")
+def trends(campaign_id: int, days: float = 30, bucket: str = "day", event_type: list[str] | None = Query(None)):
+    """
+    e.g. ?event_type=email.sent&event_type=job.retry_scheduled&bucket=day
+    """
+    return get_event_trends(campaign_id=campaign_id, event_types=event_type, days=days, bucket=bucket)
+
+@router.post("/{campaign_id}/leads/upload", status_code=202)
+def upload_leads(campaign_id: int, file: UploadFile = File(...)):
+    """
+    Spools the CSV to disk in chunks and queues an import_leads job; poll
+    GET /campaign/{id}/leads/imports/{import_id} for progress.
+    A plain def: the file copy and DB writes block, so FastAPI runs it in its threadpool.
+    """
     c = get_campaign(campaign_id)
     if not c:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    content = await file.read()
-    text = content.decode("utf-8", errors="ignore")
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".csv", dir=IMPORT_DIR)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(file.file, out, UPLOAD_CHUNK_BYTES)
+
+    with open(path, newline="", encoding="utf-8-sig", errors="ignore") as f:
+        header = next(csv.reader(f), [])
+    if "email" not in [h.strip() for h in header]:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="CSV needs an 'email' column")
 
-    reader = csv.DictReader(io.StringIO(text))
-    leads = []
-    for row in reader:
-        leads.append({
-            "full_name": row.get("full_name") or row.get("name") or "",
-            "email": row.get("email") or "",
-            "company": row.get("company") or "",
-        })
+    import_id = create_lead_import(campaign_id, path, filename=file.filename)
+    job_id = enqueue(
+        "import_leads",
+        {"import_id": import_id, "campaign_id": campaign_id},
+        dedupe_key=f"import_leads:i{import_id}",
+    )
+    return {"import_id": import_id, "job_id": job_id, "status": "queued"}
 
-    inserted = add_leads_bulk(campaign_id, leads)
-    return {"inserted": inserted}
+@router.get("/{campaign_id}/leads/imports/{import_id}")
+def lead_import_status(campaign_id: int, import_id: int):
+    imp = get_lead_import(import_id)
+    if not imp or imp.campaign_id != campaign_id:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return {
+        "import_id": imp.id,
+        "filename": imp.filename,
+        "status": imp.status,
+        "rows_read": imp.rows_read,
+        "inserted": imp.inserted,
+        "skipped": imp.rows_read - imp.inserted,   # duplicates and rows without an email
+        "error": imp.error,
+        "created_at": imp.created_at.isoformat() if imp.created_at else None,
+        "finished_at": imp.finished_at.isoformat() if imp.finished_at else None,
+    }
 
 class SequenceSaveRequest(BaseModel):
     name: str
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Query
+
+from app.queue.metrics import get_queue_metrics
+from app.db.event_rollup import get_event_trends
+
+router = APIRouter(prefix="/queue", tags=["queue"])
+
+@router.get("/metrics")
+def metrics():
+    """
+    Cheap enough to poll every second: reads counters, never scans job_queue/event.
+    """
+    return get_queue_metrics()
+
+@router.get("/events/trends")
+def event_trends(days: float = 30, bucket: str = "day", event_type: list[str] | None = Query(None)):
+    """
+    Event counts per day/hour from the event_hourly rollup, all campaigns.
+    """
+    return get_event_trends(event_types=event_type, days=days, bucket=bucket)
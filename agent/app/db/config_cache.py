@@ -0,0 +1,88 @@
+# agent/app/db/config_cache.py
+"""
+In-process cache of parsed campaign configs.
+
+Entries are keyed by campaign id and carry the campaign's config_version; a
+lookup only hits when the caller's freshly read version matches, so a save
+from another process (API vs runner) is picked up on the next job. Writes in
+this process also drop the entry right away (invalidate). Least recently used
+entries are evicted past maxsize.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+
+class CampaignConfig:
+    """
+    Parsed, read-only view of one campaign version: sequence steps (subject/body
+    templates), stop rule, strategy and run_config. Shared between threads, so
+    callers must not mutate the dicts.
+    """
+
+    __slots__ = (
+        "campaign_id", "version", "name", "cadence_days", "max_touches",
+        "sequence", "steps", "stop_rule", "strategy", "run_config",
+    )
+
+    def __init__(self, campaign_id: int, version: int, name: str, cadence_days: int, max_touches: int,
+                 sequence_json: str | None, strategy_json: str | None, run_config_json: str | None):
+        self.campaign_id = campaign_id
+        self.version = version
+        self.name = name
+        self.cadence_days = cadence_days
+        self.max_touches = max_touches
+        self.sequence = json.loads(sequence_json or "{}")
+        self.steps = self.sequence.get("steps") or []
+        self.stop_rule = self.sequence.get("stop_rule")
+        self.strategy = json.loads(strategy_json or "{}")
+        self.run_config = json.loads(run_config_json or "{}")
+
+
+class CampaignConfigCache:
+    """
+    Thread-safe LRU of CampaignConfig by campaign id.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items: OrderedDict[int, CampaignConfig] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, campaign_id: int, version: int) -> CampaignConfig | None:
+        with self._lock:
+            cfg = self._items.get(campaign_id)
+            if cfg is None or cfg.version != version:
+                self.misses += 1
+                return None
+            self._items.move_to_end(campaign_id)
+            self.hits += 1
+            return cfg
+
+    def put(self, cfg: CampaignConfig):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            current = self._items.get(cfg.campaign_id)
+            if current is not None and current.version > cfg.version:
+                return  # a slower reader must not replace a newer version
+            self._items[cfg.campaign_id] = cfg
+            self._items.move_to_end(cfg.campaign_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, campaign_id: int | None = None):
+        """
+        Drop one campaign, or everything when campaign_id is None.
+        """
+        with self._lock:
+            if campaign_id is None:
+                self._items.clear()
+            else:
+                self._items.pop(campaign_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
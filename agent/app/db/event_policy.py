@@ -0,0 +1,118 @@
+# agent/app/db/event_policy.py
+"""
+Which events log_event() stores, and how much of their data.
+
+Rules are keyed by event_type with dotted wildcards, most specific first:
+"job.start", then "job.*", then "*".
+
+- levels: minimum level stored for an event_type (DEBUG < INFO < WARN < ERROR)
+- sampling: fraction of sub-WARN events stored for an event_type (1.0 = all).
+  Stored events carry the rate they were kept at, so counts can be scaled back
+  up (see app.db.event_rollup)
+- data_json longer than max_data_bytes is replaced by a truncated preview,
+  except for ERROR events, which keep their full data (tracebacks, payloads)
+
+Configured from the environment, e.g.
+    SALESTROOPZ_EVENT_LEVELS="*=INFO,job.*=WARN"
+    SALESTROOPZ_EVENT_SAMPLING="job.claimed=0.01,job.start=0.1"
+    SALESTROOPZ_EVENT_MAX_DATA_BYTES=2048
+"""
+import json
+import random
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+
+DEFAULT_EVENT_LEVELS = {"*": "INFO"}
+
+# per-job bookkeeping events: job.success / job.error carry the outcome
+DEFAULT_EVENT_SAMPLING = {
+    "job.claimed": 0.1,
+    "job.start": 0.1,
+    "job.done": 0.1,
+}
+
+DEFAULT_MAX_DATA_BYTES = 2048
+
+
+def parse_event_rules(spec: str | None, defaults: dict, cast) -> dict:
+    """
+    "job.*=WARN,job.start=DEBUG" -> {**defaults, "job.*": "WARN", "job.start": "DEBUG"}
+    Malformed entries are ignored.
+    """
+    rules = dict(defaults)
+    for part in (spec or "").split(","):
+        key, _, value = part.partition("=")
+        key, value = key.strip(), value.strip()
+        if not key or not value:
+            continue
+        try:
+            rules[key] = cast(value)
+        except ValueError:
+            continue
+    return rules
+
+
+def _level_name(value: str) -> str:
+    value = value.upper()
+    if value not in LEVELS:
+        raise ValueError(value)
+    return value
+
+
+class EventPolicy:
+    def __init__(self, levels: dict | None = None, sampling: dict | None = None,
+                 max_data_bytes: int = DEFAULT_MAX_DATA_BYTES):
+        self.levels = levels if levels is not None else dict(DEFAULT_EVENT_LEVELS)
+        self.sampling = sampling if sampling is not None else dict(DEFAULT_EVENT_SAMPLING)
+        self.max_data_bytes = max_data_bytes
+
+    @classmethod
+    def from_env(cls, env: dict) -> "EventPolicy":
+        return cls(
+            levels=parse_event_rules(env.get("SALESTROOPZ_EVENT_LEVELS"), DEFAULT_EVENT_LEVELS, _level_name),
+            sampling=parse_event_rules(env.get("SALESTROOPZ_EVENT_SAMPLING"), DEFAULT_EVENT_SAMPLING, float),
+            max_data_bytes=int(env.get("SALESTROOPZ_EVENT_MAX_DATA_BYTES", DEFAULT_MAX_DATA_BYTES)),
+        )
+
+    @staticmethod
+    def _lookup(rules: dict, event_type: str):
+        if event_type in rules:
+            return rules[event_type]
+        parts = event_type.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            key = ".".join(parts[:i]) + ".*"
+            if key in rules:
+                return rules[key]
+        return rules.get("*")
+
+    def sample_rate(self, event_type: str, level: str) -> float | None:
+        """
+        The rate an event is stored at (1.0 = unsampled), or None if it is dropped.
+        """
+        rank = LEVELS.get(level, LEVELS["INFO"])
+        min_level = self._lookup(self.levels, event_type) or "DEBUG"
+        if rank < LEVELS[min_level]:
+            return None
+        if rank >= LEVELS["WARN"]:
+            return 1.0
+
+        rate = self._lookup(self.sampling, event_type)
+        if rate is None or rate >= 1.0:
+            return 1.0
+        return rate if random.random() < rate else None
+
+    def allows(self, event_type: str, level: str) -> bool:
+        return self.sample_rate(event_type, level) is not None
+
+    def encode_data(self, level: str, data: dict | None) -> str | None:
+        if not data:
+            return None
+        raw = json.dumps(data)
+        if level == "ERROR" or not self.max_data_bytes or len(raw) <= self.max_data_bytes:
+            return raw
+        return json.dumps({
+            "truncated": True,
+            "bytes": len(raw),
+            "keys": sorted(data)[:50],
+            "preview": raw[: self.max_data_bytes],
+        })
@@ -0,0 +1,191 @@
+# agent/app/db/event_rollup.py
+"""
+Hourly rollup and retention for the event table.
+
+rollup_events() folds raw events into event_hourly counts per
+(hour, event_type, level, campaign_id). Progress is an event id watermark in
+event_rollup_state, so every event is counted exactly once, however late its
+batch was written. prune_events() then deletes raw rows that are both rolled up
+and older than SALESTROOPZ_EVENT_RETENTION_DAYS.
+
+Sampled events (app.db.event_policy) count 1 / sample_rate each, so n is an
+estimate of how many events happened, not how many rows were stored.
+
+Trend reporting (get_event_trends) reads event_hourly, plus the few raw events
+past the watermark so the current hour is never missing.
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, bindparam, DateTime
+
+from app.db.sqlite import get_session, get_read_session, EventRollupState, log_event
+
+EVENT_RETENTION_DAYS = float(os.getenv("SALESTROOPZ_EVENT_RETENTION_DAYS", "14"))
+ROLLUP_BATCH_SIZE = int(os.getenv("SALESTROOPZ_EVENT_ROLLUP_BATCH", "5000"))
+PRUNE_BATCH_SIZE = int(os.getenv("SALESTROOPZ_EVENT_PRUNE_BATCH", "1000"))
+
+# same text format SQLAlchemy uses for DateTime on SQLite, so hour compares with bound datetimes
+_HOUR_SQL = "strftime('%Y-%m-%d %H:00:00.000000', timestamp)"
+
+# events one stored row stands for
+_WEIGHT_SQL = "1.0 / COALESCE(sample_rate, 1.0)"
+
+# Claims the next id range first: the UPDATE takes the write lock, so concurrent
+# rollups serialize instead of counting the same range twice.
+_ADVANCE_SQL = """
+UPDATE event_rollup_state
+SET prev_event_id = last_event_id,
+    last_event_id = MIN(last_event_id + :batch, (SELECT COALESCE(MAX(id), 0) FROM event)),
+    updated_at = :now
+WHERE id = 1
+RETURNING prev_event_id, last_event_id
+"""
+
+_ROLLUP_SQL = f"""
+INSERT INTO event_hourly (hour, event_type, level, campaign_id, n)
+SELECT {_HOUR_SQL}, COALESCE(event_type, ''), COALESCE(level, 'INFO'), COALESCE(campaign_id, 0),
+       CAST(ROUND(SUM({_WEIGHT_SQL})) AS INTEGER)
+FROM event
+WHERE id > :lo AND id <= :hi
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (hour, event_type, level, campaign_id) DO UPDATE SET n = n + excluded.n
+"""
+
+
+def _ensure_state(session):
+    session.execute(text("INSERT OR IGNORE INTO event_rollup_state (id, last_event_id, prev_event_id) VALUES (1, 0, 0)"))
+
+
+def rollup_events(batch_size: int = ROLLUP_BATCH_SIZE, max_batches: int = 50) -> int:
+    """
+    Fold events past the watermark into event_hourly, one short transaction per
+    batch. Returns the number of events rolled up.
+    """
+    total = 0
+    for _ in range(max_batches):
+        session = get_session()
+        _ensure_state(session)
+        lo, hi = session.execute(
+            text(_ADVANCE_SQL).bindparams(bindparam("now", type_=DateTime)),
+            {"batch": batch_size, "now": datetime.utcnow()},
+        ).one()
+        if hi <= lo:
+            session.rollback()
+            session.close()
+            break
+
+        session.execute(text(_ROLLUP_SQL), {"lo": lo, "hi": hi})
+        session.commit()
+        session.close()
+
+        total += hi - lo
+        if hi - lo < batch_size:
+            break
+    return total
+
+
+def rollup_watermark(session=None) -> int:
+    own_session = session is None
+    session = session or get_session()
+    state = session.get(EventRollupState, 1)
+    if own_session:
+        session.close()
+    return state.last_event_id if state else 0
+
+
+def prune_events(
+    older_than_days: float = EVENT_RETENTION_DAYS,
+    batch_size: int = PRUNE_BATCH_SIZE,
+    max_batches: int = 20,
+) -> int:
+    """
+    Delete raw events that are already rolled up and older than the cutoff.
+    Bounded like app.queue.retention.prune_finished_jobs.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    watermark = rollup_watermark()
+    total = 0
+
+    for _ in range(max_batches):
+        session = get_session()
+        # ids grow with time, so walking the PK from the bottom finds the oldest rows first.
+        # The newest row is always kept: SQLite hands out MAX(id) + 1, and ids must
+        # never drop back below the watermark.
+        n = session.execute(
+            text(
+                "DELETE FROM event WHERE id IN ("
+                "  SELECT id FROM event WHERE id <= :watermark AND timestamp < :cutoff"
+                "  AND id < (SELECT MAX(id) FROM event)"
+                "  ORDER BY id LIMIT :n"
+                ")"
+            ).bindparams(bindparam("cutoff", type_=DateTime)),
+            {"watermark": watermark, "cutoff": cutoff, "n": batch_size},
+        ).rowcount
+        session.commit()
+        session.close()
+
+        total += n
+        if n < batch_size:
+            break
+    return total
+
+
+def run_event_retention() -> dict:
+    """
+    One pass: roll up new events, then prune old raw ones.
+    """
+    rolled = rollup_events()
+    pruned = prune_events()
+    if pruned:
+        log_event(
+            "event.retention",
+            message=f"Pruned {pruned} raw events",
+            data={"rolled_up": rolled, "pruned": pruned, "retention_days": EVENT_RETENTION_DAYS},
+        )
+    return {"rolled_up": rolled, "pruned": pruned}
+
+
+def get_event_trends(
+    campaign_id: int | None = None,
+    event_types: list[str] | None = None,
+    days: float = 30,
+    bucket: str = "day",
+) -> list[dict]:
+    """
+    Event counts per time bucket ("hour" | "day") and event_type/level, from event_hourly.
+    campaign_id=None means all campaigns.
+    """
+    since = (datetime.utcnow() - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+    bucket_len = 10 if bucket == "day" else 13
+
+    # watermark and counts come from one read transaction, so a rollup committing
+    # in between can't count its events twice (or not at all)
+    session = get_read_session()
+    where = ["hour >= :since"]
+    raw_where = ["id > :watermark", "timestamp >= :since"]
+    params = {"since": since, "watermark": rollup_watermark(session)}
+    if campaign_id is not None:
+        where.append("campaign_id = :campaign_id")
+        raw_where.append("campaign_id = :campaign_id")
+        params["campaign_id"] = campaign_id
+    if event_types:
+        names = [f":et{i}" for i in range(len(event_types))]
+        where.append(f"event_type IN ({', '.join(names)})")
+        raw_where.append(f"event_type IN ({', '.join(names)})")
+        params.update({f"et{i}": et for i, et in enumerate(event_types)})
+
+    sql = f"""
+    SELECT bucket, event_type, level, CAST(ROUND(SUM(n)) AS INTEGER) FROM (
+        SELECT substr(hour, 1, {bucket_len}) AS bucket, event_type, level, n
+        FROM event_hourly WHERE {' AND '.join(where)}
+        UNION ALL
+        SELECT substr({_HOUR_SQL}, 1, {bucket_len}), COALESCE(event_type, ''), COALESCE(level, 'INFO'), {_WEIGHT_SQL}
+        FROM event WHERE {' AND '.join(raw_where)}
+    )
+    GROUP BY bucket, event_type, level
+    ORDER BY bucket, event_type, level
+    """
+    rows = session.execute(text(sql).bindparams(bindparam("since", type_=DateTime)), params).all()
+    session.close()
+    return [{"bucket": b, "event_type": et, "level": lvl, "n": n} for b, et, lvl, n in rows]
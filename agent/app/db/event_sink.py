@@ -0,0 +1,132 @@
+# agent/app/db/event_sink.py
+"""
+Buffered, in-process sink for operational events.
+
+log_event() only appends a row dict to a bounded in-memory queue; a background
+thread writes queued rows in one INSERT transaction whenever batch_size rows
+are waiting or flush_seconds have passed. Callers (handlers, the runner loop)
+never wait on the database.
+
+If the disk stalls and the queue fills up, INFO/DEBUG rows are dropped first;
+WARN/ERROR rows evict the oldest queued row instead. The number of dropped rows
+is reported by the next successful flush as an "event.dropped" row.
+
+Remaining rows are flushed at interpreter exit (atexit) and by flush().
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable
+
+_KEEP_LEVELS = ("WARN", "ERROR")
+
+
+class EventSink:
+    def __init__(
+        self,
+        write_batch: Callable[[list[dict]], None],
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_seconds: float = 0.5,
+    ):
+        self.write_batch = write_batch
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+
+        self._rows: deque[dict] = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def put(self, row: dict):
+        with self._cond:
+            if len(self._rows) >= self.max_queue:
+                if row.get("level") not in _KEEP_LEVELS:
+                    self.dropped += 1
+                    return
+                self._rows.popleft()
+                self.dropped += 1
+            self._rows.append(row)
+
+            if self._thread is None and not self._closed:
+                self._start()
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """
+        Write everything queued so far (blocking). Safe to call from any thread.
+        """
+        while self._write_once():
+            pass
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception:
+            # shutting down with the database unavailable: nothing left to retry with
+            pass
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._loop, name="event-sink", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._rows) < self.batch_size:
+                    self._cond.wait(self.flush_seconds)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # database unavailable: rows were re-queued, back off one interval
+                time.sleep(self.flush_seconds)
+
+    def _write_once(self) -> bool:
+        """
+        Write up to batch_size queued rows in one transaction. Returns False when
+        there was nothing to write.
+        """
+        with self._write_lock:
+            with self._cond:
+                if not self._rows and not self.dropped:
+                    return False
+                batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+                dropped, self.dropped = self.dropped, 0
+
+            rows = list(batch)
+            if dropped:
+                rows.append({
+                    "level": "WARN",
+                    "event_type": "event.dropped",
+                    "campaign_id": None,
+                    "lead_id": None,
+                    "job_id": None,
+                    "message": f"Event buffer full; dropped {dropped} events",
+                    "data_json": None,
+                    "sample_rate": None,
+                    "timestamp": datetime.utcnow(),
+                })
+
+            try:
+                self.write_batch(rows)
+            except Exception:
+                with self._cond:
+                    # put the batch back in front, keeping the newest max_queue rows
+                    room = max(0, self.max_queue - len(self._rows))
+                    keep = batch[len(batch) - room:] if room < len(batch) else batch
+                    self._rows.extendleft(reversed(keep))
+                    self.dropped += dropped + len(batch) - len(keep)
+                raise
+            return True
@@ -2,20 +2,145 @@ from sqlalchemy import (
     create_engine,
     Column,
     Integer,
+    Float,
     String,
     DateTime,
     ForeignKey,
     Text,
+    Index,
+    text,
+    insert,
+    event,
+    func,
+    select,
+    or_,
+    and_,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from datetime import datetime, timedelta
+import atexit
+import base64
 import json
+import os
 
-DATABASE_URL = "sqlite:///salestroopz.db"
+from app.db.event_policy import EventPolicy
+from app.db.event_sink import EventSink
+from app.db.config_cache import CampaignConfig, CampaignConfigCache
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("SALESTROOPZ_DATABASE_URL", "sqlite:///salestroopz.db")
+
+# Per-connection tuning, applied to every pooled connection (see _apply_connection_pragmas).
+# Sizes are per connection, so keep them modest: pool_size * cache_kb is the worst case.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SALESTROOPZ_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SALESTROOPZ_SQLITE_SYNCHRONOUS", "NORMAL")         # NORMAL is safe with WAL
+SQLITE_CACHE_KB = int(os.getenv("SALESTROOPZ_SQLITE_CACHE_KB", "8192"))
+SQLITE_MMAP_MB = int(os.getenv("SALESTROOPZ_SQLITE_MMAP_MB", "128"))
+SQLITE_TEMP_STORE = os.getenv("SALESTROOPZ_SQLITE_TEMP_STORE", "MEMORY")           # DEFAULT | FILE | MEMORY
+SQLITE_WAL_AUTOCHECKPOINT = int(os.getenv("SALESTROOPZ_SQLITE_WAL_AUTOCHECKPOINT", "1000"))  # pages
+
+# QueuePool sizing; processes override it with configure_pool() (worker_main, main)
+DB_POOL_SIZE = int(os.getenv("SALESTROOPZ_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("SALESTROOPZ_DB_MAX_OVERFLOW", "10"))
+
+# Read-only engine for dashboard/API reads (get_read_session), pooled separately so
+# reads never wait on connections the writers hold. SALESTROOPZ_DB_READ_ENGINE=0
+# routes reads through the writer engine instead.
+DB_READ_ENGINE_ENABLED = os.getenv("SALESTROOPZ_DB_READ_ENGINE", "1") != "0"
+DB_READ_POOL_SIZE = int(os.getenv("SALESTROOPZ_DB_READ_POOL_SIZE", "4"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("SALESTROOPZ_DB_READ_MAX_OVERFLOW", "4"))
+
+
+def _apply_connection_pragmas(dbapi_conn, connection_record):
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute("PRAGMA foreign_keys=ON")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA cache_size={-SQLITE_CACHE_KB}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cur.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+        cur.execute(f"PRAGMA wal_autocheckpoint={SQLITE_WAL_AUTOCHECKPOINT}")
+    finally:
+        cur.close()
+
+
+def _apply_read_only_pragmas(dbapi_conn, connection_record):
+    _apply_connection_pragmas(dbapi_conn, connection_record)
+    dbapi_conn.execute("PRAGMA query_only=ON")
+
+
+def _create_engine(pool_size: int, max_overflow: int):
+    eng = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+    event.listen(eng, "connect", _apply_connection_pragmas)
+    return eng
+
+
+def _read_only_url(url: str) -> str | None:
+    """
+    sqlite:///path.db -> sqlite:///file:/abs/path.db?mode=ro&uri=true
+    None for in-memory / non-file URLs, which can't be shared by a second engine.
+    """
+    prefix = "sqlite:///"
+    if not url.startswith(prefix):
+        return None
+    path = url[len(prefix):].split("?", 1)[0]
+    if not path or path == ":memory:" or path.startswith("file:"):
+        return None
+    return f"{prefix}file:{os.path.abspath(path)}?mode=ro&uri=true"
+
+
+def _create_read_engine(pool_size: int, max_overflow: int):
+    """
+    Engine for get_read_session(), or the writer engine when read routing is off
+    or the database can't be opened twice.
+    """
+    ro_url = _read_only_url(DATABASE_URL) if DB_READ_ENGINE_ENABLED else None
+    if ro_url is None:
+        return engine
+    eng = create_engine(
+        ro_url,
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+    event.listen(eng, "connect", _apply_read_only_pragmas)
+    return eng
+
+
+engine = _create_engine(DB_POOL_SIZE, DB_MAX_OVERFLOW)
 SessionLocal = sessionmaker(bind=engine)
 
+read_engine = _create_read_engine(DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW)
+ReadSessionLocal = sessionmaker(bind=read_engine)
+
+
+def configure_pool(pool_size: int, max_overflow: int = 0,
+                   read_pool_size: int | None = None, read_max_overflow: int | None = None):
+    """
+    Resize the connection pools for this process (call once at startup, before
+    sessions are in use). The runner sizes the writer pool to its concurrency; the
+    API sizes both to its threadpool. The read pool keeps its size unless given.
+    """
+    global engine, read_engine, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW
+    if read_pool_size is not None:
+        DB_READ_POOL_SIZE = read_pool_size
+    if read_max_overflow is not None:
+        DB_READ_MAX_OVERFLOW = read_max_overflow
+
+    old, old_read = engine, read_engine
+    engine = _create_engine(pool_size, max_overflow)
+    SessionLocal.configure(bind=engine)
+    read_engine = _create_read_engine(DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW)
+    ReadSessionLocal.configure(bind=read_engine)
+    old.dispose()
+    if old_read is not old:
+        old_read.dispose()
+
 Base = declarative_base()
 
 # ----------------------------
@@ -54,6 +179,9 @@ class Campaign(Base):
     sequence_json = Column(Text, nullable=True)
     run_config_json = Column(Text, nullable=True)
 
+    # bumped by every config write; keys the parsed-config cache (get_campaign_config)
+    config_version = Column(Integer, nullable=False, default=1)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     workspace = relationship("Workspace", back_populates="campaigns")
@@ -88,6 +216,37 @@ class Lead(Base):
     campaign = relationship("Campaign", back_populates="leads")
     activities = relationship("ActivityLog", back_populates="lead")
 
+    __table_args__ = (
+        # tick / get_due_leads
+        Index("ix_lead_campaign_state_due", "campaign_id", "state", "next_touch_at"),
+        # list_leads
+        Index("ix_lead_campaign_created", "campaign_id", "created_at"),
+        # one lead per email per campaign; inserts use INSERT OR IGNORE against it
+        Index("uq_lead_campaign_email", "campaign_id", func.lower(email), unique=True),
+    )
+
+
+# ----------------------------
+# Lead CSV imports (progress of the import_leads job)
+# ----------------------------
+class LeadImport(Base):
+    __tablename__ = "lead_import"
+
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey("campaign.id"), index=True)
+
+    filename = Column(String, nullable=True)
+    path = Column(String, nullable=False)                  # spooled upload, removed when done
+
+    status = Column(String, default="queued")              # queued | running | done | failed
+    rows_read = Column(Integer, nullable=False, default=0) # CSV rows committed so far (resume point)
+    inserted = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
 
 # ----------------------------
 # Activity Log (Human-friendly)
@@ -108,6 +267,11 @@ class ActivityLog(Base):
 
     lead = relationship("Lead", back_populates="activities")
 
+    __table_args__ = (
+        # get_campaign_activity
+        Index("ix_activity_log_lead_ts", "lead_id", "timestamp"),
+    )
+
 
 # ============================================================
 # NEW: Production Runtime Tables
@@ -116,27 +280,124 @@ class ActivityLog(Base):
 # ----------------------------
 # Durable Job Queue (SQLite-backed)
 # ----------------------------
+# Partial unique index predicate: dedupe keys only collide while a job is live.
+JOB_ACTIVE_DEDUPE_WHERE = "dedupe_key IS NOT NULL AND status IN ('queued', 'running')"
+
 class JobQueue(Base):
     __tablename__ = "job_queue"
 
     id = Column(Integer, primary_key=True, index=True)
     job_type = Column(String, index=True)                 # tick | generate_copy | send_email | poll_replies | decide_next
-    status = Column(String, default="queued", index=True) # queued | running | done | failed
+    status = Column(String, default="queued")             # queued | running | done | failed
 
-    run_at = Column(DateTime, default=datetime.utcnow, index=True)
+    run_at = Column(DateTime, default=datetime.utcnow)
 
     attempts = Column(Integer, default=0)
     max_attempts = Column(Integer, default=8)
 
-    lease_owner = Column(String, nullable=True, index=True)
-    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    # status / run_at / lease lookups go through the composite indexes below
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
 
     payload_json = Column(Text, nullable=False)
     last_error = Column(Text, nullable=True)
 
+    # Optional coalescing key: at most one queued/running job per key
+    dedupe_key = Column(String, nullable=True)
+
+    # Scheduling lane: (campaign_id, job_type). campaign_id 0 = system jobs (tick, ...)
+    # priority doubles as the lane weight for fair claiming (higher = more share, sooner)
+    campaign_id = Column(Integer, nullable=False, default=0, server_default="0")
+    priority = Column(Integer, nullable=False, default=0, server_default="0")
+
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index(
+            "uq_job_queue_active_dedupe_key",
+            "dedupe_key",
+            unique=True,
+            sqlite_where=text(JOB_ACTIVE_DEDUPE_WHERE),
+        ),
+        # claim_jobs: per-lane head lookups + lane enumeration
+        Index("ix_job_queue_lane", "status", "campaign_id", "job_type", text("priority DESC"), "run_at"),
+        # claim_jobs: requeue expired leases
+        Index("ix_job_queue_status_lease", "status", "lease_expires_at"),
+        # next_due_at / queue lag: MIN(run_at) of queued jobs
+        Index("ix_job_queue_status_run_at", "status", "run_at"),
+    )
+
+
+# ----------------------------
+# Job Queue depth counters (maintained by triggers, see _m003_queue_metrics)
+# ----------------------------
+class JobQueueDepth(Base):
+    __tablename__ = "job_queue_depth"
+
+    job_type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    n = Column(Integer, nullable=False, default=0)
+
+
+# ----------------------------
+# Runner status (one upserted row per runner process)
+# ----------------------------
+class RunnerStatus(Base):
+    __tablename__ = "runner_status"
+
+    runner_id = Column(String, primary_key=True)      # host:pid
+    last_seen_at = Column(DateTime, default=datetime.utcnow, index=True)
+    metrics_json = Column(Text, nullable=True)        # app.queue.metrics snapshot
+    heartbeat_json = Column(Text, nullable=True)      # in-flight counts etc. from the last heartbeat
+
+
+# ----------------------------
+# Runner membership (lease-based; campaign partitions are hashed over live members)
+# ----------------------------
+class RunnerMember(Base):
+    __tablename__ = "runner_member"
+
+    runner_id = Column(String, primary_key=True)          # host:pid
+    lease_expires_at = Column(DateTime, nullable=False)   # renewed with every heartbeat
+    joined_at = Column(DateTime, default=datetime.utcnow)
+
+
+# ----------------------------
+# Job Queue archive (finished jobs moved out by app.queue.retention)
+# ----------------------------
+class JobQueueArchive(Base):
+    __tablename__ = "job_queue_archive"
+
+    # its own AUTOINCREMENT key: job_queue.id is a plain rowid, which SQLite hands
+    # out again once the newest rows are deleted, as retention does
+    id = Column(Integer, primary_key=True)
+    original_id = Column(Integer, index=True)             # the job's job_queue.id
+
+    # every job_queue column, as it was when archived
+    job_type = Column(String, index=True)
+    status = Column(String)                               # done | failed
+
+    run_at = Column(DateTime)
+    attempts = Column(Integer)
+    max_attempts = Column(Integer)
+
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    payload_json = Column(Text)
+    last_error = Column(Text, nullable=True)
+    dedupe_key = Column(String, nullable=True)
+
+    campaign_id = Column(Integer, nullable=False, default=0, server_default="0")
+    priority = Column(Integer, nullable=False, default=0, server_default="0")
+
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime, index=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
 
 # ----------------------------
 # Outbox (Idempotent sending)
@@ -161,11 +422,40 @@ class OutboxEmail(Base):
     thread_id = Column(String, nullable=True, index=True)
 
     last_error = Column(Text, nullable=True)
+    scheduled_at = Column(DateTime, nullable=True)        # send slot booked by app.queue.pacing
     sent_at = Column(DateTime, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+# ----------------------------
+# Send pacing state (app.queue.pacing), one row per campaign / mailbox
+# ----------------------------
+class SendPacing(Base):
+    __tablename__ = "send_pacing"
+
+    key = Column(String, primary_key=True)                # campaign:{id} | mailbox:{provider}
+    next_eligible_at = Column(DateTime, nullable=True)    # token bucket: earliest next send
+    day = Column(String, nullable=True)                   # local date sent_today counts for
+    sent_today = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+# ----------------------------
+# Recurring jobs (one live job_queue instance per name, see app.queue.recurring)
+# ----------------------------
+class RecurringJob(Base):
+    __tablename__ = "recurring_job"
+
+    name = Column(String, primary_key=True)               # instance dedupe_key = recurring:{name}
+    job_type = Column(String, nullable=False)
+    payload_json = Column(Text, nullable=False, default="{}")
+    interval_seconds = Column(Integer, nullable=False)    # next run when the handler doesn't pick one
+    next_run_at = Column(DateTime, nullable=True)         # run_at of the live instance
+    last_run_at = Column(DateTime, nullable=True)         # start of the latest run
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 # ----------------------------
 # System Events (Operational logs)
 # ----------------------------
@@ -183,9 +473,39 @@ class Event(Base):
     message = Column(Text, nullable=True)
     data_json = Column(Text, nullable=True)
 
+    # EVENT_POLICY sampling rate this row was kept at; NULL = every event stored
+    sample_rate = Column(Float, nullable=True)
+
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
 
+# ----------------------------
+# Hourly event counts (rolled up from event by app.db.event_rollup)
+# ----------------------------
+class EventHourly(Base):
+    __tablename__ = "event_hourly"
+
+    hour = Column(DateTime, primary_key=True)             # start of the UTC hour
+    event_type = Column(String, primary_key=True)
+    level = Column(String, primary_key=True)
+    campaign_id = Column(Integer, primary_key=True)       # 0 = not campaign-scoped
+
+    n = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_event_hourly_campaign_hour", "campaign_id", "hour"),
+    )
+
+
+class EventRollupState(Base):
+    __tablename__ = "event_rollup_state"
+
+    id = Column(Integer, primary_key=True)                # single row, id = 1
+    last_event_id = Column(Integer, nullable=False, default=0)   # events up to here are in event_hourly
+    prev_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 # ----------------------------
 # Versioned strategy snapshots (recommended)
 # ----------------------------
@@ -203,70 +523,382 @@ class CampaignStrategyVersion(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+# ----------------------------
+# Applied schema migrations (see MIGRATIONS)
+# ----------------------------
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
 # ============================================================
 # DB Helpers / Migrations
 # ============================================================
 
 def _set_sqlite_pragmas():
     """
-    Recommended for production-ish SQLite on a desktop app:
+    Database-level settings, persisted in the file:
     - WAL mode for concurrency
-    - busy_timeout to reduce "database is locked"
+    - incremental auto_vacuum so retention can hand pages back to the OS
+      (only takes effect on new DBs, or after a one-off VACUUM)
+    Per-connection settings (busy_timeout, synchronous, foreign_keys, cache...)
+    are applied to every pooled connection by _apply_connection_pragmas.
     """
     conn = engine.raw_connection()
     cur = conn.cursor()
     try:
+        cur.execute("PRAGMA auto_vacuum=INCREMENTAL;")
         cur.execute("PRAGMA journal_mode=WAL;")
-        cur.execute("PRAGMA synchronous=NORMAL;")
-        cur.execute("PRAGMA foreign_keys=ON;")
-        cur.execute("PRAGMA busy_timeout=5000;")
     finally:
         conn.commit()
         conn.close()
 
 
-def _ensure_campaign_columns():
+# ----------------------------
+# Versioned migrations
+# ----------------------------
+# New DBs get every table/column/index from create_all(); migrations bring
+# older DBs up to date. Each step runs once, in its own transaction, and is
+# recorded in schema_migrations. Steps must stay idempotent against a fresh
+# create_all() schema (check before ALTER, IF NOT EXISTS / IF EXISTS).
+
+def _has_column(cur, table: str, column: str) -> bool:
+    cur.execute(f"PRAGMA table_info({table})")
+    return any(r[1] == column for r in cur.fetchall())
+
+
+def _add_column(cur, table: str, column: str, decl: str):
+    if not _has_column(cur, table, column):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _m001_campaign_config_columns(cur):
+    _add_column(cur, "campaign", "strategy_json", "TEXT")
+    _add_column(cur, "campaign", "sequence_json", "TEXT")
+    _add_column(cur, "campaign", "run_config_json", "TEXT")
+
+
+def _backfill_job_queue_lanes(cur):
     """
-    Lightweight migration for existing SQLite DBs.
-    Adds missing columns if the table already exists.
+    Give jobs enqueued before migration 2 the lane and dedupe_key enqueue would set
+    today (values frozen here, see job_queue.JOB_PRIORITIES and the handlers), so
+    they keep their priority and new enqueues coalesce with them.
     """
-    conn = engine.raw_connection()
-    cur = conn.cursor()
+    cur.execute(
+        "UPDATE job_queue SET campaign_id = COALESCE(CASE WHEN json_valid(payload_json) THEN "
+        "CAST(json_extract(payload_json, '$.campaign_id') AS INTEGER) END, 0)"
+    )
+    # legacy send_email payloads carry only outbox_id
+    cur.execute(
+        "UPDATE job_queue SET campaign_id = COALESCE((SELECT o.campaign_id FROM outbox_email o "
+        "WHERE o.id = json_extract(job_queue.payload_json, '$.outbox_id')), 0) "
+        "WHERE job_type = 'send_email' AND campaign_id = 0 AND json_valid(payload_json)"
+    )
+    cur.execute(
+        "UPDATE job_queue SET priority = CASE job_type "
+        "WHEN 'tick' THEN 100 WHEN 'send_email' THEN 50 WHEN 'poll_replies' THEN 30 ELSE 10 END"
+    )
 
-    # Add columns defensively (ignore if exists)
-    try:
-        cur.execute("ALTER TABLE campaign ADD COLUMN strategy_json TEXT")
-    except Exception:
-        pass
+    # one key per live job: the oldest holder keeps it, later queued copies are dropped
+    cur.execute(
+        "CREATE TEMP TABLE job_keys AS "
+        "SELECT id, status, CASE job_type "
+        "  WHEN 'generate_copy' THEN 'generate_copy:c' || campaign_id || ':l' || json_extract(payload_json, '$.lead_id') "
+        "  WHEN 'send_email' THEN 'send_email:o' || json_extract(payload_json, '$.outbox_id') "
+        "  WHEN 'poll_replies' THEN 'poll_replies:l' || json_extract(payload_json, '$.lead_id') "
+        "END AS dedupe_key "
+        "FROM job_queue WHERE status IN ('queued', 'running') AND json_valid(payload_json)"
+    )
+    cur.execute("DELETE FROM job_keys WHERE dedupe_key IS NULL")
+    cur.execute(
+        "DELETE FROM job_queue WHERE status = 'queued' AND id IN ("
+        "  SELECT k.id FROM job_keys k WHERE k.id > (SELECT MIN(id) FROM job_keys WHERE dedupe_key = k.dedupe_key))"
+    )
+    cur.execute(
+        "UPDATE job_queue SET dedupe_key = (SELECT k.dedupe_key FROM job_keys k WHERE k.id = job_queue.id) "
+        "WHERE id IN (SELECT MIN(id) FROM job_keys GROUP BY dedupe_key)"
+    )
+    cur.execute("DROP TABLE job_keys")
+
+
+def _m002_job_queue_lanes(cur):
+    # dedupe_key and scheduling lane columns, with their indexes
+    _add_column(cur, "job_queue", "dedupe_key", "TEXT")
+    _add_column(cur, "job_queue", "campaign_id", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cur, "job_queue", "priority", "INTEGER NOT NULL DEFAULT 0")
+    _backfill_job_queue_lanes(cur)
+
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_job_queue_active_dedupe_key "
+        f"ON job_queue (dedupe_key) WHERE {JOB_ACTIVE_DEDUPE_WHERE}"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS ix_job_queue_lane "
+        "ON job_queue (status, campaign_id, job_type, priority DESC, run_at)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_job_queue_status_lease ON job_queue (status, lease_expires_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_job_queue_status_run_at ON job_queue (status, run_at)")
+
+
+_JOB_QUEUE_DEPTH_TRIGGERS = {
+    "trg_job_queue_depth_insert": """
+        CREATE TRIGGER IF NOT EXISTS trg_job_queue_depth_insert AFTER INSERT ON job_queue
+        BEGIN
+            INSERT INTO job_queue_depth (job_type, status, n) VALUES (NEW.job_type, NEW.status, 1)
+            ON CONFLICT (job_type, status) DO UPDATE SET n = n + 1;
+        END
+    """,
+    "trg_job_queue_depth_update": """
+        CREATE TRIGGER IF NOT EXISTS trg_job_queue_depth_update AFTER UPDATE OF status, job_type ON job_queue
+        WHEN OLD.status IS NOT NEW.status OR OLD.job_type IS NOT NEW.job_type
+        BEGIN
+            UPDATE job_queue_depth SET n = n - 1 WHERE job_type = OLD.job_type AND status = OLD.status;
+            INSERT INTO job_queue_depth (job_type, status, n) VALUES (NEW.job_type, NEW.status, 1)
+            ON CONFLICT (job_type, status) DO UPDATE SET n = n + 1;
+        END
+    """,
+    "trg_job_queue_depth_delete": """
+        CREATE TRIGGER IF NOT EXISTS trg_job_queue_depth_delete AFTER DELETE ON job_queue
+        BEGIN
+            UPDATE job_queue_depth SET n = n - 1 WHERE job_type = OLD.job_type AND status = OLD.status;
+        END
+    """,
+}
+
+
+def _m003_queue_metrics(cur):
+    """
+    Keep job_queue_depth in sync via triggers so /queue/metrics never counts job_queue.
+    The first time the triggers are installed, depth is backfilled with one GROUP BY.
+    """
+    _add_column(cur, "runner_status", "heartbeat_json", "TEXT")
+
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_job_queue_depth_%'")
+    existing = {r[0] for r in cur.fetchall()}
+
+    if not existing:
+        cur.execute("DELETE FROM job_queue_depth")
+        cur.execute(
+            "INSERT INTO job_queue_depth (job_type, status, n) "
+            "SELECT job_type, status, COUNT(*) FROM job_queue GROUP BY job_type, status"
+        )
+
+    for name, ddl in _JOB_QUEUE_DEPTH_TRIGGERS.items():
+        if name not in existing:
+            cur.execute(ddl)
+
+
+# (name, DDL) of the hot-path indexes added by migration 4; benchmarks.bench_schema_indexes
+# drops and restores them to compare plans
+HOT_PATH_INDEXES = [
+    # tick / get_due_leads: campaign_id = ? AND state IN (...) AND next_touch_at <= ?
+    ("ix_lead_campaign_state_due", "CREATE INDEX IF NOT EXISTS ix_lead_campaign_state_due ON lead (campaign_id, state, next_touch_at)"),
+    # list_leads: campaign_id = ? ORDER BY created_at DESC
+    ("ix_lead_campaign_created", "CREATE INDEX IF NOT EXISTS ix_lead_campaign_created ON lead (campaign_id, created_at)"),
+    # get_campaign_activity: per-lead activity, newest first
+    ("ix_activity_log_lead_ts", "CREATE INDEX IF NOT EXISTS ix_activity_log_lead_ts ON activity_log (lead_id, timestamp)"),
+]
+
+# single-column job_queue indexes made redundant by the composite (status, ...) ones;
+# status / lease columns change on every claim, so each extra index is an extra write
+REDUNDANT_JOB_QUEUE_INDEXES = [
+    ("ix_job_queue_status", "CREATE INDEX IF NOT EXISTS ix_job_queue_status ON job_queue (status)"),
+    ("ix_job_queue_run_at", "CREATE INDEX IF NOT EXISTS ix_job_queue_run_at ON job_queue (run_at)"),
+    ("ix_job_queue_lease_owner", "CREATE INDEX IF NOT EXISTS ix_job_queue_lease_owner ON job_queue (lease_owner)"),
+    ("ix_job_queue_lease_expires_at", "CREATE INDEX IF NOT EXISTS ix_job_queue_lease_expires_at ON job_queue (lease_expires_at)"),
+]
+
+
+def _m004_hot_path_indexes(cur):
+    for _, ddl in HOT_PATH_INDEXES:
+        cur.execute(ddl)
+    for name, _ in REDUNDANT_JOB_QUEUE_INDEXES:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    # refresh planner statistics for the new indexes (bounded work on large tables)
+    cur.execute("PRAGMA analysis_limit=1000")
+    cur.execute("ANALYZE")
+
+
+def _m005_unique_lead_email(cur):
+    """
+    Merge leads that share (campaign_id, lower(email)) into the oldest one, moving
+    their activity and outbox rows over, then enforce uniqueness with an index.
+    """
+    cur.execute(
+        "CREATE TEMP TABLE lead_dupes AS "
+        "SELECT l.id AS dup_id, k.keep_id FROM lead l JOIN ("
+        "  SELECT campaign_id, lower(email) AS em, MIN(id) AS keep_id FROM lead"
+        "  WHERE email IS NOT NULL GROUP BY campaign_id, lower(email) HAVING COUNT(*) > 1"
+        ") k ON l.campaign_id = k.campaign_id AND lower(l.email) = k.em "
+        "WHERE l.id != k.keep_id"
+    )
+    for table in ("activity_log", "outbox_email"):
+        cur.execute(
+            f"UPDATE {table} SET lead_id = (SELECT keep_id FROM lead_dupes WHERE dup_id = {table}.lead_id) "
+            "WHERE lead_id IN (SELECT dup_id FROM lead_dupes)"
+        )
+    cur.execute("DELETE FROM lead WHERE id IN (SELECT dup_id FROM lead_dupes)")
+    cur.execute("DROP TABLE lead_dupes")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_lead_campaign_email ON lead (campaign_id, lower(email))")
+
+
+def _m006_campaign_config_version(cur):
+    _add_column(cur, "campaign", "config_version", "INTEGER NOT NULL DEFAULT 1")
+
+
+def _m007_outbox_scheduled_at(cur):
+    _add_column(cur, "outbox_email", "scheduled_at", "DATETIME")
+
+
+def _m008_retire_tick_chains(cur):
+    """
+    Every API start used to seed another self-requeueing tick. Drop the queued
+    ones; the recurring_job registry enqueues the single tick from now on.
+    """
+    cur.execute("DELETE FROM job_queue WHERE job_type = 'tick' AND status = 'queued'")
+
+
+def _m009_event_sample_rate(cur):
+    _add_column(cur, "event", "sample_rate", "REAL")
 
-    try:
-        cur.execute("ALTER TABLE campaign ADD COLUMN sequence_json TEXT")
-    except Exception:
-        pass
 
+def _m010_job_queue_archive_own_ids(cur):
+    """
+    Rebuild job_queue_archive with its own AUTOINCREMENT id (the job's id moves to
+    original_id) and the job_queue columns it was missing. Keyed on job_queue.id,
+    INSERT OR REPLACE let a reused id overwrite an older archived job.
+    """
+    if _has_column(cur, "job_queue_archive", "original_id"):
+        return
+    cur.execute("ALTER TABLE job_queue_archive RENAME TO job_queue_archive_old")
+    cur.execute(
+        "CREATE TABLE job_queue_archive ("
+        " id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,"
+        " original_id INTEGER,"
+        " job_type VARCHAR, status VARCHAR, run_at DATETIME, attempts INTEGER, max_attempts INTEGER,"
+        " lease_owner VARCHAR, lease_expires_at DATETIME,"
+        " payload_json TEXT, last_error TEXT, dedupe_key VARCHAR,"
+        " campaign_id INTEGER DEFAULT '0' NOT NULL, priority INTEGER DEFAULT '0' NOT NULL,"
+        " created_at DATETIME, updated_at DATETIME, archived_at DATETIME)"
+    )
+    cur.execute(
+        "INSERT INTO job_queue_archive (original_id, job_type, status, run_at, attempts, max_attempts,"
+        " payload_json, last_error, dedupe_key, campaign_id, created_at, updated_at, archived_at) "
+        "SELECT id, job_type, status, run_at, attempts, max_attempts, payload_json, last_error, dedupe_key,"
+        " COALESCE(CASE WHEN json_valid(payload_json) THEN json_extract(payload_json, '$.campaign_id') END, 0),"
+        " created_at, updated_at, archived_at "
+        "FROM job_queue_archive_old ORDER BY archived_at, id"
+    )
+    cur.execute("DROP TABLE job_queue_archive_old")
+    cur.execute("CREATE INDEX ix_job_queue_archive_original_id ON job_queue_archive (original_id)")
+    cur.execute("CREATE INDEX ix_job_queue_archive_job_type ON job_queue_archive (job_type)")
+    cur.execute("CREATE INDEX ix_job_queue_archive_updated_at ON job_queue_archive (updated_at)")
+
+
+MIGRATIONS = [
+    (1, "campaign config columns", _m001_campaign_config_columns),
+    (2, "job_queue dedupe + lane columns", _m002_job_queue_lanes),
+    (3, "queue depth triggers + runner heartbeat", _m003_queue_metrics),
+    (4, "hot-path composite indexes", _m004_hot_path_indexes),
+    (5, "unique lead email per campaign", _m005_unique_lead_email),
+    (6, "campaign config_version", _m006_campaign_config_version),
+    (7, "outbox scheduled_at for send pacing", _m007_outbox_scheduled_at),
+    (8, "retire unregistered tick chains", _m008_retire_tick_chains),
+    (9, "event sample_rate", _m009_event_sample_rate),
+    (10, "job_queue_archive own ids", _m010_job_queue_archive_own_ids),
+]
+
+
+def run_migrations() -> list[int]:
+    """
+    Apply pending MIGRATIONS in order. Returns the versions applied by this call.
+    API and runner may start together: each step re-checks its version under
+    the write lock (BEGIN IMMEDIATE), so it runs exactly once.
+    """
+    conn = engine.raw_connection()
+    cur = conn.cursor()
+    applied = []
     try:
-        cur.execute("ALTER TABLE campaign ADD COLUMN run_config_json TEXT")
-    except Exception:
-        pass
+        for version, name, step in MIGRATIONS:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,))
+            if cur.fetchone():
+                conn.rollback()
+                continue
+            try:
+                step(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, datetime.utcnow().isoformat(" ")),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
 
-    conn.commit()
-    conn.close()
+
+def schema_version() -> int:
+    session = get_session()
+    version = session.query(func.max(SchemaMigration.version)).scalar()
+    session.close()
+    return version or 0
 
 
 def init_db():
     _set_sqlite_pragmas()
     Base.metadata.create_all(bind=engine)
-    _ensure_campaign_columns()
+    applied = run_migrations()
+    if applied:
+        log_event("db.migrated", message=f"Applied schema migrations {applied}", data={"versions": applied})
 
 
 def get_session():
     return SessionLocal()
 
 
+def get_read_session():
+    """
+    Session on the read-only engine, for API read paths. Writes through it fail
+    (query_only); use get_session() for anything that mutates.
+    """
+    return ReadSessionLocal()
+
+
 # ============================================================
 # NEW: Operational Event Logger
 # ============================================================
 
+def _write_events(rows: list[dict]):
+    session = get_session()
+    try:
+        session.execute(insert(Event), rows)
+        session.commit()
+    finally:
+        session.close()
+
+
+# log_event() is called several times per job; rows are buffered and written in
+# batches by a background thread. SALESTROOPZ_EVENT_BUFFER=0 writes synchronously.
+EVENT_BUFFER_ENABLED = os.getenv("SALESTROOPZ_EVENT_BUFFER", "1") != "0"
+EVENT_SINK = EventSink(
+    _write_events,
+    max_queue=int(os.getenv("SALESTROOPZ_EVENT_BUFFER_MAX", "10000")),
+    batch_size=int(os.getenv("SALESTROOPZ_EVENT_BATCH", "200")),
+    flush_seconds=float(os.getenv("SALESTROOPZ_EVENT_FLUSH_SECONDS", "0.5")),
+)
+atexit.register(EVENT_SINK.close)
+
+# per-event_type levels / sampling and data_json size cap, see app.db.event_policy
+EVENT_POLICY = EventPolicy.from_env(os.environ)
+
+
 def log_event(
     event_type: str,
     level: str = "INFO",
@@ -275,23 +907,44 @@ def log_event(
     job_id: int | None = None,
     message: str | None = None,
     data: dict | None = None,
+    session=None,
 ):
-    session = get_session()
-    row = Event(
-        level=level,
-        event_type=event_type,
-        campaign_id=campaign_id,
-        lead_id=lead_id,
-        job_id=job_id,
-        message=message,
-        data_json=json.dumps(data) if data else None,
-    )
-    session.add(row)
-    session.commit()
-    session.close()
+    """
+    Record an operational event. Returns False if EVENT_POLICY filtered it out.
+    With session=, the row is added to the caller's transaction instead of the buffer.
+    """
+    sample_rate = EVENT_POLICY.sample_rate(event_type, level)
+    if sample_rate is None:
+        return False
+
+    row = {
+        "level": level,
+        "event_type": event_type,
+        "campaign_id": campaign_id,
+        "lead_id": lead_id,
+        "job_id": job_id,
+        "message": message,
+        "data_json": EVENT_POLICY.encode_data(level, data),
+        "sample_rate": sample_rate if sample_rate < 1.0 else None,
+        # stamped now, not when the batch is written
+        "timestamp": datetime.utcnow(),
+    }
+    if session is not None:
+        session.add(Event(**row))
+    elif EVENT_BUFFER_ENABLED:
+        EVENT_SINK.put(row)
+    else:
+        _write_events([row])
     return True
 
 
+def flush_events():
+    """
+    Write any buffered events now (e.g. before reading them back).
+    """
+    EVENT_SINK.flush()
+
+
 # ============================================================
 # Workspace Save / Helpers
 # ============================================================
@@ -311,7 +964,7 @@ def save_workspace(data):
 
 
 def get_latest_workspace():
-    session = get_session()
+    session = get_read_session()
     ws = session.query(Workspace).order_by(Workspace.id.desc()).first()
     session.close()
     return ws
@@ -400,14 +1053,51 @@ def set_campaign_status(campaign_id: int, status: str):
 
 
 def get_campaign(campaign_id: int):
-    session = get_session()
+    session = get_read_session()
     campaign = session.query(Campaign).filter(Campaign.id == campaign_id).first()
     session.close()
     return campaign
 
 
+# Parsed sequence/strategy/run_config per campaign, see app.db.config_cache
+CAMPAIGN_CONFIGS = CampaignConfigCache(int(os.getenv("SALESTROOPZ_CAMPAIGN_CACHE_SIZE", "256")))
+
+
+def get_campaign_config(campaign_id: int, session=None) -> CampaignConfig | None:
+    """
+    Parsed config for a campaign; None if it doesn't exist.
+    Costs one primary-key lookup of config_version when cached; the row is only
+    re-read and its JSON re-parsed after a config write. Pass the caller's
+    session to read inside its transaction; without one it reads on the
+    read-only engine.
+    """
+    own_session = session is None
+    session = session or get_read_session()
+    try:
+        version = session.execute(
+            select(Campaign.config_version).where(Campaign.id == campaign_id)
+        ).scalar()
+        if version is None:
+            return None
+        cfg = CAMPAIGN_CONFIGS.get(campaign_id, version)
+        if cfg is None:
+            row = session.execute(
+                select(
+                    Campaign.id, Campaign.config_version, Campaign.name, Campaign.cadence_days,
+                    Campaign.max_touches, Campaign.sequence_json, Campaign.strategy_json,
+                    Campaign.run_config_json,
+                ).where(Campaign.id == campaign_id)
+            ).one()
+            cfg = CampaignConfig(*row)
+            CAMPAIGN_CONFIGS.put(cfg)
+        return cfg
+    finally:
+        if own_session:
+            session.close()
+
+
 def list_campaigns(workspace_id: int):
-    session = get_session()
+    session = get_read_session()
     campaigns = (
         session.query(Campaign)
         .filter(Campaign.workspace_id == workspace_id)
@@ -425,9 +1115,11 @@ def save_campaign_sequence(campaign_id: int, sequence: dict):
         session.close()
         return None
     campaign.sequence_json = json.dumps(sequence)
+    campaign.config_version = Campaign.config_version + 1
     session.commit()
     session.refresh(campaign)
     session.close()
+    CAMPAIGN_CONFIGS.invalidate(campaign_id)
     log_event("campaign.sequence_saved", campaign_id=campaign_id)
     return campaign
 
@@ -439,9 +1131,11 @@ def save_campaign_strategy(campaign_id: int, strategy: dict):
         session.close()
         return None
     campaign.strategy_json = json.dumps(strategy)
+    campaign.config_version = Campaign.config_version + 1
     session.commit()
     session.refresh(campaign)
     session.close()
+    CAMPAIGN_CONFIGS.invalidate(campaign_id)
     log_event("campaign.strategy_saved", campaign_id=campaign_id)
     return campaign
 
@@ -453,9 +1147,11 @@ def save_campaign_run_config(campaign_id: int, run_config: dict):
         session.close()
         return None
     campaign.run_config_json = json.dumps(run_config)
+    campaign.config_version = Campaign.config_version + 1
     session.commit()
     session.refresh(campaign)
     session.close()
+    CAMPAIGN_CONFIGS.invalidate(campaign_id)
     log_event("campaign.run_config_saved", campaign_id=campaign_id)
     return campaign
 
@@ -464,47 +1160,68 @@ def save_campaign_run_config(campaign_id: int, run_config: dict):
 # Lead helpers
 # ============================================================
 
-def add_leads_bulk(campaign_id: int, leads: list[dict]):
+def insert_leads(session, campaign_id: int, leads: list[dict]) -> int:
     """
-    leads items: {"full_name": "...", "email": "...", "company": "..."}
+    INSERT OR IGNORE one chunk of leads (executemany) in the caller's transaction.
+    Duplicates, within the chunk or against existing leads, are skipped by
+    uq_lead_campaign_email. Returns the number of rows inserted.
     """
-    session = get_session()
-
-    existing = set(
-        e[0] for e in session.query(Lead.email).filter(Lead.campaign_id == campaign_id).all()
-        if e and e[0]
-    )
-
-    objs = []
+    now = datetime.utcnow()
+    rows = []
     for l in leads:
         email = (l.get("email") or "").strip().lower()
-        if not email or email in existing:
+        if not email:
             continue
-        existing.add(email)
-
-        objs.append(
-            Lead(
-                campaign_id=campaign_id,
-                full_name=(l.get("full_name") or "").strip(),
-                email=email,
-                company=(l.get("company") or "").strip(),
-                state="NEW",
-                touch_count=0,
-                next_touch_at=datetime.utcnow(),
-            )
-        )
-
-    session.add_all(objs)
+        rows.append({
+            "campaign_id": campaign_id,
+            "full_name": (l.get("full_name") or "").strip(),
+            "email": email,
+            "company": (l.get("company") or "").strip(),
+            "state": "NEW",
+            "touch_count": 0,
+            "next_touch_at": now,
+            "created_at": now,
+        })
+    if not rows:
+        return 0
+    return session.execute(insert(Lead.__table__).prefix_with("OR IGNORE"), rows).rowcount
+
+
+def add_leads_bulk(campaign_id: int, leads: list[dict], chunk_size: int = 1000):
+    """
+    leads items: {"full_name": "...", "email": "...", "company": "..."}
+    For large files use the import_leads job (create_lead_import), which streams.
+    """
+    session = get_session()
+    count = 0
+    for i in range(0, len(leads), chunk_size):
+        count += insert_leads(session, campaign_id, leads[i:i + chunk_size])
     session.commit()
-    count = len(objs)
     session.close()
 
     log_event("leads.uploaded", campaign_id=campaign_id, message=f"Inserted {count} leads")
     return count
 
 
-def list_leads(campaign_id: int):
+def create_lead_import(campaign_id: int, path: str, filename: str | None = None) -> int:
     session = get_session()
+    row = LeadImport(campaign_id=campaign_id, path=path, filename=filename, status="queued")
+    session.add(row)
+    session.commit()
+    import_id = row.id
+    session.close()
+    return import_id
+
+
+def get_lead_import(import_id: int):
+    session = get_read_session()
+    row = session.query(LeadImport).filter(LeadImport.id == import_id).first()
+    session.close()
+    return row
+
+
+def list_leads(campaign_id: int):
+    session = get_read_session()
     leads = (
         session.query(Lead)
         .filter(Lead.campaign_id == campaign_id)
@@ -515,8 +1232,67 @@ def list_leads(campaign_id: int):
     return leads
 
 
+LEAD_PAGE_COLUMNS = (
+    Lead.id, Lead.full_name, Lead.email, Lead.company, Lead.state,
+    Lead.touch_count, Lead.next_touch_at, Lead.created_at,
+)
+
+
+def _encode_lead_cursor(created_at: datetime, lead_id: int) -> str:
+    raw = f"{created_at.isoformat() if created_at else ''}|{lead_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_lead_cursor(cursor: str) -> tuple[datetime | None, int]:
+    created, _, lead_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+    return (datetime.fromisoformat(created) if created else None), int(lead_id)
+
+
+def list_leads_page(
+    campaign_id: int,
+    limit: int = 100,
+    cursor: str | None = None,
+    states: list[str] | None = None,
+    q: str | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    One page of a campaign's leads, newest first, as plain dicts (no ORM entities).
+    Keyset pagination on (created_at, id) via ix_lead_campaign_created, so every
+    page costs the same regardless of depth. Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    states: only these lead states. q: prefix match on email, name or company.
+    """
+    stmt = select(*LEAD_PAGE_COLUMNS).where(Lead.campaign_id == campaign_id)
+    if states:
+        stmt = stmt.where(Lead.state.in_(states))
+    if q and q.strip():
+        prefix = q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        stmt = stmt.where(or_(
+            Lead.email.like(prefix, escape="\\"),
+            Lead.full_name.like(prefix, escape="\\"),
+            Lead.company.like(prefix, escape="\\"),
+        ))
+    if cursor:
+        created_at, lead_id = _decode_lead_cursor(cursor)
+        stmt = stmt.where(or_(
+            Lead.created_at < created_at,
+            and_(Lead.created_at == created_at, Lead.id < lead_id),
+        ))
+    stmt = stmt.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit + 1)
+
+    session = get_read_session()
+    rows = [dict(r._mapping) for r in session.execute(stmt)]
+    session.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_lead_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+
 def get_due_leads(campaign_id: int, limit: int = 10):
-    session = get_session()
+    session = get_read_session()
     now = datetime.utcnow()
     leads = (
         session.query(Lead)
@@ -563,6 +1339,10 @@ def schedule_followup(lead_id: int, days_from_now: int):
     session.refresh(lead)
     session.close()
     log_event("lead.followup_scheduled", lead_id=lead_id, data={"days": days_from_now})
+
+    # job_queue imports this module
+    from app.queue.scheduler import wake_scheduler
+    wake_scheduler(lead.next_touch_at)
     return lead
 
 
@@ -586,9 +1366,14 @@ def stop_lead(lead_id: int, positive: bool, note: str = ""):
 # Activity helpers (Human-friendly)
 # ============================================================
 
-def log_activity(lead_id: int, type: str, message: str):
-    session = get_session()
+def log_activity(lead_id: int, type: str, message: str, session=None):
     row = ActivityLog(lead_id=lead_id, type=type, message=message)
+    if session is not None:
+        # committed with the caller's transaction
+        session.add(row)
+        return row
+
+    session = get_session()
     session.add(row)
     session.commit()
     session.refresh(row)
@@ -597,7 +1382,7 @@ def log_activity(lead_id: int, type: str, message: str):
 
 
 def get_campaign_activity(campaign_id: int, limit: int = 200):
-    session = get_session()
+    session = get_read_session()
     rows = (
         session.query(ActivityLog)
         .join(Lead, ActivityLog.lead_id == Lead.id)
@@ -0,0 +1,64 @@
+# agent/app/llm/ollama_async.py
+"""
+Async Ollama client for coroutine handlers (see app.workers.clients).
+Same request/response contract and env config as app.llm.ollama_client.generate_text,
+but many generations can be in flight from one event loop.
+
+An httpx.AsyncClient belongs to the event loop it first runs on, so there is
+no module-level client: open one AsyncOllamaClient per loop and aclose() it
+before the loop ends.
+"""
+import os
+from typing import Optional
+
+import httpx
+
+from app.llm.ollama_client import (
+    OLLAMA_URL,
+    MODEL_NAME,
+    DEFAULT_TIMEOUT_SECS,
+    DEFAULT_NUM_PREDICT,
+    DEFAULT_TEMPERATURE,
+)
+
+# Ollama serializes generations per model anyway; keep the pool modest.
+MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8"))
+
+
+class AsyncOllamaClient:
+    def __init__(self):
+        self._http = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT_SECS,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def generate_text(self, prompt: str, temperature: float = DEFAULT_TEMPERATURE,
+                            num_predict: Optional[int] = None) -> str:
+        if num_predict is None:
+            num_predict = DEFAULT_NUM_PREDICT
+
+        payload = {
+            "model": MODEL_NAME,
+            "prompt": prompt,
+            "stream": False,
+            "options": {
+                "temperature": float(temperature),
+                "num_predict": int(num_predict),
+            },
+        }
+
+        try:
+            response = await self._http.post(OLLAMA_URL, json=payload)
+        except httpx.TimeoutException as e:
+            raise Exception(f"Ollama request timed out after {DEFAULT_TIMEOUT_SECS}s") from e
+        except Exception as e:
+            raise Exception(f"Error calling Ollama at {OLLAMA_URL}: {e}") from e
+
+        if response.status_code != 200:
+            raise Exception(f"Error generating text (status={response.status_code}): {response.text}")
+
+        data = response.json()
+        return (data.get("response", "") or "").strip()
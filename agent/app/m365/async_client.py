@@ -0,0 +1,60 @@
+import asyncio
+from typing import Callable
+
+import httpx
+
+from app.m365.client import GRAPH
+
+class AsyncM365Client:
+    """
+    Async twin of M365Client for coroutine handlers, on a shared httpx.AsyncClient
+    (one per event loop, see app.workers.clients).
+    get_token is a sync callable returning a current access token; it runs in a
+    thread because a silent token refresh may go to the network.
+    """
+
+    def __init__(self, get_token: Callable[[], str], http: httpx.AsyncClient):
+        self._get_token = get_token
+        self._http = http
+
+    async def _headers(self) -> dict:
+        token = await asyncio.to_thread(self._get_token)
+        return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    async def me(self):
+        r = await self._http.get(f"{GRAPH}/me", headers=await self._headers())
+        r.raise_for_status()
+        return r.json()
+
+    async def send_mail(self, to_email: str, subject: str, body_text: str) -> dict:
+        """
+        Send as a draft + send, so the message's id and conversationId come back
+        (sendMail returns neither). Returns {"id": ..., "conversationId": ...}.
+        """
+        headers = await self._headers()
+        draft = {
+            "subject": subject,
+            "body": {"contentType": "Text", "content": body_text},
+            "toRecipients": [{"emailAddress": {"address": to_email}}],
+        }
+        r = await self._http.post(f"{GRAPH}/me/messages", headers=headers, json=draft)
+        r.raise_for_status()
+        msg = r.json()
+        r = await self._http.post(f"{GRAPH}/me/messages/{msg['id']}/send", headers=headers)
+        r.raise_for_status()
+        return {"id": msg["id"], "conversationId": msg.get("conversationId")}
+
+    async def inbox_messages(self, conversation_id: str) -> list[dict]:
+        """
+        Inbox messages in a conversation: the replies to what we sent.
+        """
+        r = await self._http.get(
+            f"{GRAPH}/me/mailFolders/inbox/messages",
+            headers=await self._headers(),
+            params={
+                "$filter": "conversationId eq '{}'".format(conversation_id.replace("'", "''")),
+                "$select": "id,from,subject,receivedDateTime",
+            },
+        )
+        r.raise_for_status()
+        return r.json().get("value", [])
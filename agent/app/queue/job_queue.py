@@ -2,78 +2,437 @@ import json
 import socket
 import os
 from datetime import datetime, timedelta
-from app.db.sqlite import get_session, JobQueue
+from sqlalchemy import select, update, func, text, bindparam, or_, DateTime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.db.sqlite import get_session, JobQueue, JOB_ACTIVE_DEDUPE_WHERE
+from app.queue.notify import notify_enqueued
+from app.queue.metrics import STATS
 from app.db.sqlite import log_event  # we'll add this helper below
 
 LEASE_SECONDS_DEFAULT = 60
 
+# Lane weights for fair claiming. A lane is (campaign_id, job_type); within one
+# claim batch the k-th job of a lane is ordered by k / weight, so a weight-50 lane
+# gets ~5x the slots of a weight-10 lane and every campaign gets its turn.
+# Stored per job in job_queue.priority (enqueue(..., priority=) overrides it).
+JOB_PRIORITIES = {
+    "tick": 100,
+    "send_email": 50,
+    "poll_replies": 30,
+    "generate_copy": 10,
+}
+DEFAULT_PRIORITY = 10
+
+# Fair claim, one statement:
+# - lanes: loose index scan over (campaign_id, job_type) of queued jobs (ix_job_queue_lane),
+#   one O(log n) probe per lane instead of a scan of the backlog
+# - cand:  the first :n due jobs of each lane, ranked within the lane
+# - the UPDATE takes the :n best by rank / weight and leases them (status guard = CAS)
+_CLAIM_SQL = """
+WITH RECURSIVE lanes(cid, jt) AS (
+    SELECT (SELECT MIN(campaign_id) FROM job_queue WHERE status = 'queued'), ''
+    UNION ALL
+    -- next job_type in this campaign, else first campaign after it (with jt '' = "before any type")
+    SELECT
+        CASE WHEN (SELECT MIN(job_type) FROM job_queue
+                   WHERE status = 'queued' AND campaign_id = lanes.cid AND job_type > lanes.jt) IS NULL
+             THEN (SELECT MIN(campaign_id) FROM job_queue
+                   WHERE status = 'queued' AND campaign_id > lanes.cid)
+             ELSE lanes.cid END,
+        COALESCE((SELECT MIN(job_type) FROM job_queue
+                  WHERE status = 'queued' AND campaign_id = lanes.cid AND job_type > lanes.jt), '')
+    FROM lanes WHERE lanes.cid IS NOT NULL
+),
+cand AS (
+    SELECT j.id, j.priority, j.run_at,
+           ROW_NUMBER() OVER (
+               PARTITION BY j.campaign_id, j.job_type
+               ORDER BY j.priority DESC, j.run_at, j.id
+           ) AS rn
+    FROM lanes
+    JOIN job_queue j ON j.id IN (
+        SELECT q.id FROM job_queue q
+        WHERE q.status = 'queued' AND q.campaign_id = lanes.cid AND q.job_type = lanes.jt
+          AND q.run_at <= :now
+        ORDER BY q.priority DESC, q.run_at, q.id
+        LIMIT :n
+    )
+    WHERE lanes.cid IS NOT NULL AND lanes.jt != '' {lane_filter}
+)
+UPDATE job_queue
+SET status = 'running', lease_owner = :owner, lease_expires_at = :lease_expires, updated_at = :now
+WHERE status = 'queued' AND id IN (
+    SELECT id FROM cand
+    ORDER BY rn * 1.0 / MAX(priority, 1), run_at, id
+    LIMIT :n
+)
+RETURNING *
+"""
+
 def _owner_id() -> str:
     return f"{socket.gethostname()}:{os.getpid()}"
 
-def enqueue(job_type: str, payload: dict, run_at: datetime | None = None, max_attempts: int = 8) -> int:
-    session = get_session()
-    row = JobQueue(
+def _job_row(
+    job_type: str,
+    payload: dict,
+    run_at: datetime | None = None,
+    max_attempts: int = 8,
+    priority: int | None = None,
+) -> JobQueue:
+    return JobQueue(
         job_type=job_type,
         status="queued",
         run_at=run_at or datetime.utcnow(),
         attempts=0,
         max_attempts=max_attempts,
         payload_json=json.dumps(payload),
+        campaign_id=int(payload.get("campaign_id") or 0),
+        priority=priority if priority is not None else JOB_PRIORITIES.get(job_type, DEFAULT_PRIORITY),
         updated_at=datetime.utcnow(),
     )
-    session.add(row)
+
+def _insert_coalesced(session, row: JobQueue, dedupe_key: str, on_conflict: str = "ignore") -> int:
+    """
+    INSERT ... ON CONFLICT DO NOTHING against the active-dedupe_key index.
+    If a queued/running job already holds the key, return its id instead:
+    - on_conflict="ignore": leave it untouched (cheap no-op)
+    - on_conflict="reschedule": pull a queued job's run_at forward to row.run_at if earlier
+    """
+    stmt = (
+        sqlite_insert(JobQueue)
+        .values(
+            job_type=row.job_type,
+            status="queued",
+            run_at=row.run_at,
+            attempts=0,
+            max_attempts=row.max_attempts,
+            payload_json=row.payload_json,
+            campaign_id=row.campaign_id,
+            priority=row.priority,
+            dedupe_key=dedupe_key,
+            updated_at=row.updated_at,
+        )
+        .on_conflict_do_nothing(index_elements=["dedupe_key"], index_where=text(JOB_ACTIVE_DEDUPE_WHERE))
+        .returning(JobQueue.id)
+    )
+    new_id = session.execute(stmt).scalar()
+    if new_id is not None:
+        return new_id
+
+    existing = (
+        session.query(JobQueue)
+        .filter(JobQueue.dedupe_key == dedupe_key)
+        .filter(JobQueue.status.in_(["queued", "running"]))
+        .first()
+    )
+    if on_conflict == "reschedule" and existing.status == "queued" and row.run_at < existing.run_at:
+        existing.run_at = row.run_at
+        existing.updated_at = datetime.utcnow()
+        session.flush()
+    return existing.id
+
+def enqueue(
+    job_type: str,
+    payload: dict,
+    run_at: datetime | None = None,
+    max_attempts: int = 8,
+    dedupe_key: str | None = None,
+    on_conflict: str = "ignore",
+    priority: int | None = None,
+) -> int:
+    """
+    dedupe_key: coalesce with a queued/running job holding the same key
+    (e.g. "generate_copy:c{campaign}:l{lead}"); see _insert_coalesced for on_conflict.
+    priority: lane weight, defaults to JOB_PRIORITIES[job_type].
+    """
+    session = get_session()
+    row = _job_row(job_type, payload, run_at=run_at, max_attempts=max_attempts, priority=priority)
+    if dedupe_key:
+        job_id = _insert_coalesced(session, row, dedupe_key, on_conflict)
+    else:
+        session.add(row)
+        session.flush()
+        job_id = row.id
     session.commit()
-    session.refresh(row)
     session.close()
-    return row.id
+    notify_enqueued()
+    return job_id
 
-def claim_next_job(lease_seconds: int = LEASE_SECONDS_DEFAULT) -> JobQueue | None:
+def enqueue_many(jobs: list[dict], session=None) -> list[int]:
     """
-    Claim the next due job by taking a lease. Crash-safe: expired leases can be reclaimed.
+    Insert a batch of jobs in one transaction (one commit) and return their ids
+    in input order. Coalesced jobs return the id of the job already holding the key.
+    jobs items: {"job_type": "...", "payload": {...}, "run_at": datetime | None, "max_attempts": int,
+                 "dedupe_key": str | None, "on_conflict": "ignore" | "reschedule", "priority": int | None}
+    With session=, the jobs join the caller's transaction: nothing is committed, and
+    the caller calls notify_enqueued() after its commit (see app.workers.context.UnitOfWork).
     """
+    if not jobs:
+        return []
+
+    own_session = session is None
+    if own_session:
+        session = get_session()
+    ids = [None] * len(jobs)
+    plain = []
+    for i, j in enumerate(jobs):
+        row = _job_row(
+            j["job_type"],
+            j.get("payload") or {},
+            run_at=j.get("run_at"),
+            max_attempts=j.get("max_attempts", 8),
+            priority=j.get("priority"),
+        )
+        if j.get("dedupe_key"):
+            ids[i] = _insert_coalesced(session, row, j["dedupe_key"], j.get("on_conflict", "ignore"))
+        else:
+            plain.append((i, row))
+
+    session.add_all([row for _, row in plain])
+    session.flush()
+    for i, row in plain:
+        ids[i] = row.id
+
+    if own_session:
+        session.commit()
+        session.close()
+        notify_enqueued()
+    return ids
+
+def enqueue_bulk(jobs: list[dict], session=None) -> int:
+    """
+    Insert a batch of jobs with one executemany and return how many were inserted.
+    Jobs whose dedupe_key is already held by a queued/running job are skipped
+    (on_conflict="ignore" only). No ids come back, which is what keeps it to one
+    statement; use enqueue_many when the caller needs them.
+    session= joins the caller's transaction, as in enqueue_many.
+    """
+    if not jobs:
+        return 0
+
+    rows = []
+    for j in jobs:
+        row = _job_row(
+            j["job_type"],
+            j.get("payload") or {},
+            run_at=j.get("run_at"),
+            max_attempts=j.get("max_attempts", 8),
+            priority=j.get("priority"),
+        )
+        rows.append({
+            "job_type": row.job_type,
+            "status": row.status,
+            "run_at": row.run_at,
+            "attempts": row.attempts,
+            "max_attempts": row.max_attempts,
+            "payload_json": row.payload_json,
+            "campaign_id": row.campaign_id,
+            "priority": row.priority,
+            "dedupe_key": j.get("dedupe_key"),
+            "updated_at": row.updated_at,
+        })
+
+    stmt = sqlite_insert(JobQueue.__table__).on_conflict_do_nothing(
+        index_elements=["dedupe_key"], index_where=text(JOB_ACTIVE_DEDUPE_WHERE)
+    )
+    own_session = session is None
+    if own_session:
+        session = get_session()
+    inserted = session.execute(stmt, rows).rowcount
+
+    if own_session:
+        session.commit()
+        session.close()
+        if inserted:
+            notify_enqueued()
+    return inserted
+
+def next_due_at(partitions: list[int] | None = None, partition_count: int = 1) -> datetime | None:
+    """
+    Earliest moment a job becomes claimable: the next queued run_at or the next
+    running lease to expire. Two index-backed MIN() lookups, no table scan.
+    partitions / partition_count: only jobs this runner may claim, as in claim_jobs.
+    """
+    mine = []
+    if partitions is not None:
+        mine.append(or_(
+            JobQueue.campaign_id == 0,
+            (JobQueue.campaign_id % partition_count).in_(list(partitions) or [-1]),
+        ))
+
+    session = get_session()
+    next_run = (
+        session.query(func.min(JobQueue.run_at))
+        .filter(JobQueue.status == "queued", *mine)
+        .scalar()
+    )
+    next_expiry = (
+        session.query(func.min(JobQueue.lease_expires_at))
+        .filter(JobQueue.status == "running", *mine)
+        .scalar()
+    )
+    session.close()
+    candidates = [t for t in (next_run, next_expiry) if t is not None]
+    return min(candidates) if candidates else None
+
+def claim_jobs(
+    n: int = 1,
+    lease_seconds: int = LEASE_SECONDS_DEFAULT,
+    job_types: list[str] | None = None,
+    exclude_types: list[str] | None = None,
+    partitions: list[int] | None = None,
+    partition_count: int = 1,
+) -> list[JobQueue]:
+    """
+    Claim up to n due jobs in one transaction:
+    1) expired leases (crashed runners) go back to queued
+    2) a single fair-claim UPDATE ... RETURNING (see _CLAIM_SQL) leases the batch,
+       interleaving (campaign_id, job_type) lanes by weight so one huge campaign
+       cannot starve a small one or the tick.
+    The first statement takes SQLite's write lock, so two runners can never lease the same job.
+
+    job_types / exclude_types restrict the claim to (or away from) specific job types.
+    partitions restricts campaign jobs to campaign_id % partition_count in partitions
+    (app.queue.partitions); jobs without a campaign are always claimable.
+    """
+    if n <= 0:
+        return []
+
     session = get_session()
     now = datetime.utcnow()
     owner = _owner_id()
     lease_expires = now + timedelta(seconds=lease_seconds)
 
-    # Find candidate
-    job = (
-        session.query(JobQueue)
-        .filter(JobQueue.status.in_(["queued", "running"]))
-        .filter(JobQueue.run_at <= now)
-        .filter((JobQueue.lease_expires_at == None) | (JobQueue.lease_expires_at <= now))
-        .order_by(JobQueue.run_at.asc(), JobQueue.id.asc())
-        .first()
+    session.execute(
+        update(JobQueue)
+        .where(JobQueue.status == "running")
+        .where(JobQueue.lease_expires_at <= now)
+        .values(status="queued", lease_owner=None, lease_expires_at=None, updated_at=now)
+        .execution_options(synchronize_session=False)
     )
 
-    if not job:
-        session.close()
-        return None
+    lane_filter = ""
+    params = {"now": now, "n": n, "owner": owner, "lease_expires": lease_expires}
+    binds = [bindparam("now", type_=DateTime), bindparam("lease_expires", type_=DateTime)]
+    if job_types is not None:
+        lane_filter += " AND lanes.jt IN :job_types"
+        params["job_types"] = list(job_types) or [""]
+        binds.append(bindparam("job_types", expanding=True))
+    if exclude_types:
+        lane_filter += " AND lanes.jt NOT IN :exclude_types"
+        params["exclude_types"] = list(exclude_types)
+        binds.append(bindparam("exclude_types", expanding=True))
+    if partitions is not None:
+        lane_filter += " AND (lanes.cid = 0 OR lanes.cid % :partition_count IN :partitions)"
+        params["partitions"] = list(partitions) or [-1]
+        params["partition_count"] = partition_count
+        binds.append(bindparam("partitions", expanding=True))
 
-    # Claim by setting lease
-    job.status = "running"
-    job.lease_owner = owner
-    job.lease_expires_at = lease_expires
-    job.updated_at = now
+    stmt = text(_CLAIM_SQL.format(lane_filter=lane_filter)).bindparams(*binds)
+    jobs = list(session.scalars(select(JobQueue).from_statement(stmt), params))
+    # detach before commit so the returned rows stay loaded
+    for job in jobs:
+        session.expunge(job)
     session.commit()
-    session.refresh(job)
     session.close()
 
-    log_event("job.claimed", job_id=job.id, message=f"Claimed {job.job_type}", data={"owner": owner})
-    return job
+    STATS.record_claims([job.job_type for job in jobs])
+    for job in jobs:
+        log_event("job.claimed", job_id=job.id, message=f"Claimed {job.job_type}", data={"owner": owner})
+    return jobs
+
+def claim_next_job(lease_seconds: int = LEASE_SECONDS_DEFAULT, **claim_filter) -> JobQueue | None:
+    """
+    Claim the next due job by taking a lease. Crash-safe: expired leases can be reclaimed.
+    claim_filter: partitions / partition_count, as in claim_jobs.
+    """
+    jobs = claim_jobs(1, lease_seconds=lease_seconds, **claim_filter)
+    return jobs[0] if jobs else None
+
+def renew_leases(job_ids: list[int], lease_seconds: int = LEASE_SECONDS_DEFAULT) -> int:
+    """
+    Push lease_expires_at out for jobs this process is still running.
+    Only touches rows we own, so a lease that already moved to another runner is left alone.
+    Returns the number of leases renewed.
+    """
+    if not job_ids:
+        return 0
 
-def mark_done(job_id: int):
     session = get_session()
-    job = session.query(JobQueue).filter(JobQueue.id == job_id).first()
-    if not job:
-        session.close()
-        return
-    job.status = "done"
-    job.lease_expires_at = None
-    job.updated_at = datetime.utcnow()
+    result = session.execute(
+        update(JobQueue)
+        .where(JobQueue.id.in_(job_ids))
+        .where(JobQueue.status == "running")
+        .where(JobQueue.lease_owner == _owner_id())
+        .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
     session.commit()
     session.close()
-    log_event("job.done", job_id=job_id)
+    return result.rowcount
+
+def mark_done(job_id: int, session=None):
+    """
+    With session=, the update (and its job.done event) joins the caller's
+    transaction and is committed by the caller.
+    """
+    own_session = session is None
+    if own_session:
+        session = get_session()
+    session.execute(
+        update(JobQueue)
+        .where(JobQueue.id == job_id)
+        .values(status="done", lease_expires_at=None, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if own_session:
+        session.commit()
+        session.close()
+    log_event("job.done", job_id=job_id, session=None if own_session else session)
+
+class JobDeferred(Exception):
+    """
+    Raised by a handler that can't proceed yet (e.g. its send slot is later).
+    The runner commits the handler's writes and requeues the job for run_at
+    without spending an attempt.
+    """
+
+    def __init__(self, run_at: datetime, reason: str = ""):
+        super().__init__(reason or f"deferred until {run_at.isoformat()}")
+        self.run_at = run_at
+        self.reason = reason
+
+
+def defer_job(job_id: int, run_at: datetime, session=None):
+    """
+    Put a running job back in the queue for run_at; attempts are unchanged.
+    With session=, joins the caller's transaction as in mark_done.
+    """
+    own_session = session is None
+    if own_session:
+        session = get_session()
+    session.execute(
+        update(JobQueue)
+        .where(JobQueue.id == job_id)
+        .values(status="queued", run_at=run_at, lease_owner=None, lease_expires_at=None,
+                updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if own_session:
+        session.commit()
+        session.close()
+
+def release_dedupe_key(job_id: int, session):
+    """
+    Let a running job hand its dedupe_key to a successor it enqueues in the same
+    transaction (a recurring job rescheduling itself).
+    """
+    session.execute(
+        update(JobQueue)
+        .where(JobQueue.id == job_id)
+        .values(dedupe_key=None)
+        .execution_options(synchronize_session=False)
+    )
 
 def mark_failed(job_id: int, err: str, retry_at: datetime | None):
     session = get_session()
@@ -86,16 +445,19 @@ def mark_failed(job_id: int, err: str, retry_at: datetime | None):
     job.last_error = err
     job.updated_at = datetime.utcnow()
     job.lease_expires_at = None
+    campaign_id = job.campaign_id or None
 
     if job.attempts >= (job.max_attempts or 8):
         job.status = "failed"
         session.commit()
         session.close()
-        log_event("job.failed", level="ERROR", job_id=job_id, message=err)
+        log_event("job.failed", level="ERROR", campaign_id=campaign_id, job_id=job_id, message=err)
         return
 
     job.status = "queued"
     job.run_at = retry_at or (datetime.utcnow() + timedelta(seconds=10))
+    # capture before commit expires the instance
+    data = {"attempts": job.attempts, "run_at": job.run_at.isoformat()}
     session.commit()
     session.close()
-    log_event("job.retry_scheduled", level="WARN", job_id=job_id, message=err, data={"attempts": job.attempts, "run_at": job.run_at.isoformat()})
+    log_event("job.retry_scheduled", level="WARN", campaign_id=campaign_id, job_id=job_id, message=err, data=data)
@@ -0,0 +1,216 @@
+# agent/app/queue/metrics.py
+"""
+Queue health and throughput metrics.
+
+Nothing here scans job_queue or event:
+- depth per job_type/status comes from job_queue_depth (trigger-maintained)
+- lag is one MIN(run_at) lookup on ix_job_queue_status_run_at
+- claims/completions/retries and handler latency are counted in-process by each
+  runner (QueueStats) and flushed as a small snapshot to its runner_status row;
+  completions are jobs that finished done, not retried or failed attempts
+- runner heartbeats upsert the same row (record_heartbeat) rather than adding events
+
+Latency uses fixed histogram buckets so snapshots from several runners merge exactly.
+"""
+import bisect
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db.sqlite import get_session, get_read_session, JobQueue, JobQueueDepth, RunnerStatus
+
+BUCKET_SECONDS = 10
+KEEP_SECONDS = 300
+RATE_WINDOW_SECONDS = 60
+
+# upper bounds (ms); the last bucket is open-ended
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+
+_COUNTERS = ("claims", "completions", "retries", "failures", "deferrals")
+
+
+def _empty_stats() -> dict:
+    return {**{c: 0 for c in _COUNTERS}, "latency": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+
+
+class QueueStats:
+    """
+    Thread-safe per-process counters in BUCKET_SECONDS time buckets, keyed by job_type.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[int, dict[str, dict]] = {}
+        self.dirty = False
+
+    def _stats(self, job_type: str) -> dict:
+        t = int(time.time()) // BUCKET_SECONDS * BUCKET_SECONDS
+        bucket = self._buckets.setdefault(t, {})
+        return bucket.setdefault(job_type, _empty_stats())
+
+    def record_claims(self, job_types: list[str]):
+        with self._lock:
+            for jt in job_types:
+                self._stats(jt)["claims"] += 1
+            self.dirty = self.dirty or bool(job_types)
+
+    def record_finish(self, job_type: str, outcome: str, seconds: float | None):
+        """
+        outcome: "done" | "retry" | "failed" | "deferred"
+        """
+        with self._lock:
+            st = self._stats(job_type)
+            if outcome == "deferred":
+                st["deferrals"] += 1
+                self.dirty = True
+                return
+            if outcome == "done":
+                st["completions"] += 1
+            elif outcome == "retry":
+                st["retries"] += 1
+            elif outcome == "failed":
+                st["failures"] += 1
+            if seconds is not None:
+                st["latency"][bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+            self.dirty = True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cutoff = time.time() - KEEP_SECONDS
+            for t in [t for t in self._buckets if t < cutoff]:
+                del self._buckets[t]
+            self.dirty = False
+            return {"bucket_seconds": BUCKET_SECONDS, "buckets": {str(t): b for t, b in self._buckets.items()}}
+
+
+STATS = QueueStats()
+
+
+def flush_runner_metrics(runner_id: str, stats: QueueStats = STATS):
+    """
+    Upsert this runner's snapshot into runner_status (one row per runner).
+    """
+    session = get_session()
+    now = datetime.utcnow()
+    session.execute(
+        sqlite_insert(RunnerStatus)
+        .values(runner_id=runner_id, last_seen_at=now, metrics_json=json.dumps(stats.snapshot()))
+        .on_conflict_do_update(
+            index_elements=["runner_id"],
+            set_={"last_seen_at": now, "metrics_json": sqlite_insert(RunnerStatus).excluded.metrics_json},
+        )
+    )
+    session.commit()
+    session.close()
+
+
+def record_heartbeat(runner_id: str, data: dict | None = None):
+    """
+    Upsert this runner's "last seen" row instead of appending a heartbeat event.
+    """
+    session = get_session()
+    now = datetime.utcnow()
+    heartbeat_json = json.dumps(data) if data else None
+    session.execute(
+        sqlite_insert(RunnerStatus)
+        .values(runner_id=runner_id, last_seen_at=now, heartbeat_json=heartbeat_json)
+        .on_conflict_do_update(
+            index_elements=["runner_id"],
+            set_={"last_seen_at": now, "heartbeat_json": heartbeat_json},
+        )
+    )
+    session.commit()
+    session.close()
+
+
+def _percentile(hist: list[int], q: float) -> float | None:
+    total = sum(hist)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= rank:
+            return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else float(LATENCY_BUCKETS_MS[-1])
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+def get_queue_metrics() -> dict:
+    now = datetime.utcnow()
+    session = get_read_session()
+
+    depth: dict[str, dict[str, int]] = {}
+    for row in session.query(JobQueueDepth).filter(JobQueueDepth.n > 0).all():
+        depth.setdefault(row.job_type, {})[row.status] = row.n
+
+    oldest_due = (
+        session.query(func.min(JobQueue.run_at))
+        .filter(JobQueue.status == "queued")
+        .filter(JobQueue.run_at <= now)
+        .scalar()
+    )
+
+    runners = (
+        session.query(RunnerStatus)
+        .filter(RunnerStatus.last_seen_at >= now - timedelta(seconds=KEEP_SECONDS))
+        .all()
+    )
+    session.close()
+
+    # merge runner snapshots
+    rate_cutoff = time.time() - RATE_WINDOW_SECONDS
+    latency_cutoff = time.time() - KEEP_SECONDS
+    totals = {c: 0 for c in _COUNTERS}
+    hist_all = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    hist_by_type: dict[str, list[int]] = {}
+    for r in runners:
+        snap = json.loads(r.metrics_json or "{}")
+        for t, bucket in (snap.get("buckets") or {}).items():
+            t = int(t)
+            for jt, st in bucket.items():
+                if t >= rate_cutoff:
+                    for c in _COUNTERS:
+                        totals[c] += st.get(c, 0)
+                if t >= latency_cutoff:
+                    h = hist_by_type.setdefault(jt, [0] * len(hist_all))
+                    for i, n in enumerate(st.get("latency") or []):
+                        h[i] += n
+                        hist_all[i] += n
+
+    minutes = RATE_WINDOW_SECONDS / 60
+    attempts = totals["completions"] + totals["retries"] + totals["failures"]
+    return {
+        "depth": depth,
+        "oldest_due_at": oldest_due.isoformat() if oldest_due else None,
+        "lag_seconds": (now - oldest_due).total_seconds() if oldest_due else 0.0,
+        "per_minute": {
+            "claims": totals["claims"] / minutes,
+            "completions": totals["completions"] / minutes,
+            "retries": totals["retries"] / minutes,
+            "failures": totals["failures"] / minutes,
+            "deferrals": totals["deferrals"] / minutes,
+        },
+        # share of finished attempts that ended in a retry
+        "retry_rate": (totals["retries"] / attempts) if attempts else 0.0,
+        "latency_ms": {
+            "p50": _percentile(hist_all, 0.50),
+            "p95": _percentile(hist_all, 0.95),
+            "by_job_type": {
+                jt: {"p50": _percentile(h, 0.50), "p95": _percentile(h, 0.95)}
+                for jt, h in hist_by_type.items()
+            },
+        },
+        "runners": [
+            {
+                "runner_id": r.runner_id,
+                "last_seen_at": r.last_seen_at.isoformat() if r.last_seen_at else None,
+                "heartbeat": json.loads(r.heartbeat_json) if r.heartbeat_json else None,
+            }
+            for r in runners
+        ],
+    }
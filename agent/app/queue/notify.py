@@ -0,0 +1,104 @@
+# agent/app/queue/notify.py
+"""
+Local wakeup channel between enqueue() and the runner.
+
+enqueue() fires a 1-byte UDP datagram at 127.0.0.1:SALESTROOPZ_WAKEUP_PORT after
+it commits. The runner binds that port and blocks on it (select) instead of
+polling SQLite, so a job enqueued from the API is dispatched within milliseconds.
+
+Fire-and-forget: if nobody is listening the datagram is simply dropped.
+"""
+import os
+import select
+import socket
+import threading
+
+WAKEUP_HOST = "127.0.0.1"
+WAKEUP_PORT = int(os.getenv("SALESTROOPZ_WAKEUP_PORT", "8716"))
+
+_send_sock = None
+_send_lock = threading.Lock()
+
+
+def notify_enqueued() -> None:
+    """
+    Wake a waiting runner (this process or another). Never raises.
+    """
+    global _send_sock
+    try:
+        with _send_lock:
+            if _send_sock is None:
+                _send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                _send_sock.setblocking(False)
+            _send_sock.sendto(b"1", (WAKEUP_HOST, WAKEUP_PORT))
+    except OSError:
+        pass
+
+
+class WakeupListener:
+    """
+    Runner side of the channel.
+
+    Only one process can own the port; a second runner falls back to plain
+    timed waits (bound == False) and the caller should cap its sleep accordingly.
+    """
+
+    def __init__(self, port: int = WAKEUP_PORT):
+        self._event = threading.Event()
+        self.sock = None
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((WAKEUP_HOST, port))
+            sock.setblocking(False)
+            self.sock = sock
+        except OSError:
+            self.sock = None
+
+    @property
+    def bound(self) -> bool:
+        return self.sock is not None
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until a wakeup arrives or timeout passes. Returns True if woken.
+        """
+        timeout = max(0.0, timeout)
+        if self._event.is_set():
+            self._event.clear()
+            return True
+
+        if not self.sock:
+            woke = self._event.wait(timeout)
+            self._event.clear()
+            return woke
+
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return self._event.is_set()
+        self._drain()
+        return True
+
+    def poke(self) -> None:
+        """
+        Wake this listener from another thread of the same process.
+        """
+        self._event.set()
+        if self.sock:
+            try:
+                self.sock.sendto(b"1", self.sock.getsockname())
+            except OSError:
+                pass
+
+    def _drain(self) -> None:
+        # collapse a burst of enqueues into one wakeup
+        while True:
+            try:
+                self.sock.recv(64)
+            except OSError:
+                break
+        self._event.clear()
+
+    def close(self) -> None:
+        if self.sock:
+            self.sock.close()
+            self.sock = None
@@ -0,0 +1,255 @@
+# agent/app/queue/pacing.py
+"""
+Send pacing: enforces a campaign's run_config (timezone, quiet_hours,
+allowed_days, daily_send_limit, min_minutes_between_sends) and a per-mailbox
+limit.
+
+Each pacing key ("campaign:{id}", "mailbox:{provider}") is a token bucket kept
+as a theoretical arrival time: send_pacing.next_eligible_at is the earliest
+moment its next send may go out. reserve_send() books a campaign's next slot,
+moved into its allowed window and past its daily limit, and pushes the campaign
+forward by its spacing: the larger of min_minutes_between_sends and window
+length / daily_send_limit, so a day's sends spread over the whole window instead
+of going out at opening time. The mailbox is shared by every campaign, so it is
+only taken at send time (acquire_mailbox), never booked ahead.
+
+State lives in send_pacing, so booked slots survive restarts. Both consumers
+are O(1) per campaign: send_email reads and updates at most two rows, and the tick's
+due-leads query joins one row per running campaign to skip campaigns whose next
+slot is beyond PACING_HORIZON_SECONDS (see app.workers.handlers.tick).
+"""
+import os
+import random
+from datetime import datetime, timedelta, timezone, time as dtime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select, text
+
+from app.db.sqlite import SendPacing
+
+# Tick only prepares copy for campaigns whose next send slot is within this horizon.
+PACING_HORIZON_SECONDS = float(os.getenv("SALESTROOPZ_PACING_HORIZON_SECONDS", "900"))
+
+# A lead with a send in flight is parked (lead.next_touch_at) until this long after
+# the send is due, so the tick only looks at it again if the send never went out.
+SEND_GRACE_SECONDS = float(os.getenv("SALESTROOPZ_SEND_GRACE_SECONDS", "900"))
+
+# One connected mailbox per provider; these cap it across all campaigns.
+MAILBOX_DAILY_LIMIT = int(os.getenv("SALESTROOPZ_MAILBOX_DAILY_LIMIT", "1000"))
+MAILBOX_MIN_SECONDS = float(os.getenv("SALESTROOPZ_MAILBOX_MIN_SECONDS", "5"))
+
+DEFAULT_PROVIDER = "m365"  # OutboxEmail.provider default
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _parse_hhmm(value) -> dtime | None:
+    try:
+        h, m = str(value).split(":", 1)
+        return dtime(int(h), int(m))
+    except (ValueError, AttributeError):
+        return None
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name) if name else timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+class PacingPolicy:
+    """
+    When and how often one pacing key may send. Times in and out are naive UTC,
+    like every DateTime column in the DB; the window is evaluated in self.tz.
+    """
+
+    def __init__(self, tz=timezone.utc, quiet_start: dtime | None = None, quiet_end: dtime | None = None,
+                 allowed_days: set[int] | None = None, daily_limit: int | None = None,
+                 min_interval_seconds: float = 0.0, spread: bool = True):
+        self.tz = tz
+        if quiet_start == quiet_end:
+            quiet_start = quiet_end = None
+        self.quiet_start = quiet_start
+        self.quiet_end = quiet_end
+        self.allowed_days = allowed_days or None
+        self.daily_limit = daily_limit if daily_limit and daily_limit > 0 else None
+        self.min_interval_seconds = max(0.0, min_interval_seconds)
+        self.spread = spread
+
+    @classmethod
+    def from_run_config(cls, run_config: dict | None) -> "PacingPolicy":
+        rc = run_config or {}
+        quiet = rc.get("quiet_hours") or {}
+        days = {DAY_NAMES.index(d) for d in (rc.get("allowed_days") or []) if d in DAY_NAMES}
+        return cls(
+            tz=_zone(rc.get("timezone")),
+            quiet_start=_parse_hhmm(quiet.get("start")),
+            quiet_end=_parse_hhmm(quiet.get("end")),
+            allowed_days=days,
+            daily_limit=rc.get("daily_send_limit"),
+            min_interval_seconds=float(rc.get("min_minutes_between_sends") or 0) * 60,
+        )
+
+    @classmethod
+    def for_mailbox(cls) -> "PacingPolicy":
+        # a hard cap, not a target: no spreading over the day
+        return cls(daily_limit=MAILBOX_DAILY_LIMIT, min_interval_seconds=MAILBOX_MIN_SECONDS, spread=False)
+
+    def _local(self, at: datetime) -> datetime:
+        return at.replace(tzinfo=timezone.utc).astimezone(self.tz)
+
+    @staticmethod
+    def _utc(local: datetime) -> datetime:
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def window_seconds(self) -> float:
+        if self.quiet_start is None:
+            return 86400.0
+        start = self.quiet_start.hour * 3600 + self.quiet_start.minute * 60
+        end = self.quiet_end.hour * 3600 + self.quiet_end.minute * 60
+        return float((start - end) % 86400)
+
+    def spacing_seconds(self) -> float:
+        spacing = self.min_interval_seconds
+        if self.spread and self.daily_limit:
+            spacing = max(spacing, self.window_seconds() / self.daily_limit)
+        return spacing
+
+    def day_key(self, at: datetime) -> str:
+        return self._local(at).date().isoformat()
+
+    def _quiet_until(self, local: datetime) -> datetime | None:
+        """
+        End of the quiet period containing local, or None if local is not quiet.
+        """
+        if self.quiet_start is None:
+            return None
+        t = local.timetz().replace(tzinfo=None)
+        if self.quiet_start > self.quiet_end:  # wraps midnight, e.g. 20:00-08:00
+            if t >= self.quiet_start:
+                return datetime.combine(local.date() + timedelta(days=1), self.quiet_end, tzinfo=self.tz)
+            if t < self.quiet_end:
+                return datetime.combine(local.date(), self.quiet_end, tzinfo=self.tz)
+            return None
+        if self.quiet_start <= t < self.quiet_end:
+            return datetime.combine(local.date(), self.quiet_end, tzinfo=self.tz)
+        return None
+
+    def next_open(self, at: datetime) -> datetime:
+        """
+        Earliest moment >= at inside the allowed window.
+        """
+        local = self._local(at)
+        for _ in range(16):
+            if self.allowed_days and local.weekday() not in self.allowed_days:
+                local = datetime.combine(local.date() + timedelta(days=1), dtime(0), tzinfo=self.tz)
+                continue
+            until = self._quiet_until(local)
+            if until is not None:
+                local = until
+                continue
+            break
+        return self._utc(local)
+
+    def next_day_open(self, at: datetime) -> datetime:
+        local = self._local(at)
+        return self.next_open(self._utc(datetime.combine(local.date() + timedelta(days=1), dtime(0), tzinfo=self.tz)))
+
+    def next_slot(self, state: "SendPacing", at: datetime) -> datetime:
+        """
+        Earliest slot >= at this key can book, given its bucket and daily count.
+        """
+        slot = self.next_open(max(at, state.next_eligible_at or at))
+        if self.daily_limit and state.day == self.day_key(slot) and (state.sent_today or 0) >= self.daily_limit:
+            slot = self.next_day_open(slot)
+        return slot
+
+
+def campaign_key(campaign_id: int) -> str:
+    return f"campaign:{campaign_id}"
+
+
+def mailbox_key(provider: str | None = None) -> str:
+    return f"mailbox:{provider or DEFAULT_PROVIDER}"
+
+
+def _locked_state(session, key: str) -> SendPacing:
+    """
+    The key's row, read after an INSERT OR IGNORE: the write takes SQLite's write
+    lock first, so the row can't change under the caller before it is updated
+    (concurrent senders serialize here).
+    """
+    session.execute(text("INSERT OR IGNORE INTO send_pacing (key, sent_today) VALUES (:key, 0)"), {"key": key})
+    return session.execute(select(SendPacing).where(SendPacing.key == key)).scalar_one()
+
+
+def _book(policy: PacingPolicy, state: SendPacing, slot: datetime, now: datetime):
+    day = policy.day_key(slot)
+    state.sent_today = (state.sent_today or 0) + 1 if state.day == day else 1
+    state.day = day
+    # precomputed: already moved past quiet hours / the daily limit, so a
+    # single comparison against next_eligible_at answers "can it send soon?"
+    next_at = slot + timedelta(seconds=policy.spacing_seconds())
+    if policy.daily_limit and state.sent_today >= policy.daily_limit:
+        next_at = max(next_at, policy.next_day_open(slot))
+    state.next_eligible_at = policy.next_open(next_at)
+    state.updated_at = now
+
+
+def reserve_send(session, campaign_id: int, run_config: dict | None, now: datetime | None = None) -> datetime:
+    """
+    Book the campaign's next send slot in the caller's transaction and return it.
+    A slot <= now means "send now"; otherwise the caller holds the slot and sends
+    then. Rolling the transaction back releases it.
+    """
+    now = now or datetime.utcnow()
+    policy = PacingPolicy.from_run_config(run_config)
+    state = _locked_state(session, campaign_key(campaign_id))
+    slot = policy.next_slot(state, now)
+    _book(policy, state, slot, now)
+    session.flush()
+    return slot
+
+
+def acquire_mailbox(session, provider: str | None = None, now: datetime | None = None) -> datetime | None:
+    """
+    Take the mailbox for one send now, in the caller's transaction: None on success,
+    else when to try again. Unlike campaign slots this is never booked ahead, so
+    one campaign's future slots can't hold the mailbox against the others.
+    """
+    now = now or datetime.utcnow()
+    policy = PacingPolicy.for_mailbox()
+    state = _locked_state(session, mailbox_key(provider))
+    slot = policy.next_slot(state, now)
+    if slot > now:
+        # spread the senders that wake together
+        return slot + timedelta(seconds=random.uniform(0, max(1.0, policy.min_interval_seconds)))
+    _book(policy, state, now, now)
+    session.flush()
+    return None
+
+
+def park_lead(lead, send_at: datetime):
+    """
+    Keep the tick off a lead whose send is queued for send_at.
+    """
+    lead.next_touch_at = send_at + timedelta(seconds=SEND_GRACE_SECONDS)
+
+
+def pacing_horizon(now: datetime | None = None) -> datetime:
+    return (now or datetime.utcnow()) + timedelta(seconds=PACING_HORIZON_SECONDS)
+
+
+def mailbox_next_eligible(session, provider: str | None = None) -> datetime | None:
+    return session.execute(
+        select(SendPacing.next_eligible_at).where(SendPacing.key == mailbox_key(provider))
+    ).scalar()
+
+
+def mailbox_open(session, provider: str | None = None, now: datetime | None = None) -> bool:
+    """
+    False while the mailbox's next slot is beyond the horizon (e.g. its daily cap is reached).
+    """
+    next_at = mailbox_next_eligible(session, provider)
+    return next_at is None or next_at <= pacing_horizon(now)
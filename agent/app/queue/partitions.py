@@ -0,0 +1,179 @@
+# agent/app/queue/partitions.py
+"""
+Campaign partitioning across runner processes.
+
+Campaigns map to PARTITIONS fixed partitions (campaign_id % PARTITIONS), and
+partitions map to live runners by consistent hashing: each runner puts VNODES
+points on a hash ring and owns the partitions that hash onto its arcs. A runner
+joining or leaving only moves the partitions next to its own points.
+
+Membership is a lease in runner_member: a runner renews it from a background
+thread (PartitionMap.start), so a long dispatcher stall -- a slow claim, a
+retention pass -- does not cost it its partitions. It is dropped from the ring
+once lease_expires_at passes (or when it stops).
+Every runner computes the ring from the same member list, so they agree
+without talking to each other. While they briefly disagree (a lease just
+lapsed), two runners may both claim a partition's jobs; claim_jobs' lease
+still hands each job to one of them, so that costs contention, not duplicates.
+
+Jobs without a campaign (campaign_id 0: the tick, ...) are not partitioned.
+"""
+import bisect
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db.sqlite import get_session, log_event, RunnerMember
+
+PARTITIONS = int(os.getenv("SALESTROOPZ_PARTITIONS", "256"))
+VNODES = 128
+
+
+def partition_of(campaign_id: int, partitions: int = PARTITIONS) -> int:
+    return campaign_id % partitions
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring of runner ids, VNODES points each.
+    """
+
+    def __init__(self, members: list[str], vnodes: int = VNODES):
+        points = sorted((_hash(f"{m}#{v}"), m) for m in members for v in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._members = [m for _, m in points]
+
+    def owner(self, key: str) -> str | None:
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._members[i]
+
+
+def assign_partitions(members: list[str], partitions: int = PARTITIONS) -> dict[str, list[int]]:
+    """
+    runner_id -> the partitions it owns.
+    """
+    ring = HashRing(members)
+    owned = {m: [] for m in members}
+    for p in range(partitions):
+        owner = ring.owner(f"partition:{p}")
+        if owner is not None:
+            owned[owner].append(p)
+    return owned
+
+
+def renew_membership(runner_id: str, lease_seconds: float) -> list[str]:
+    """
+    Extend this runner's membership lease and return the live members (sorted).
+    """
+    session = get_session()
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=lease_seconds)
+    session.execute(
+        sqlite_insert(RunnerMember)
+        .values(runner_id=runner_id, lease_expires_at=expires, joined_at=now)
+        .on_conflict_do_update(index_elements=["runner_id"], set_={"lease_expires_at": expires})
+    )
+    # lapsed members are gone for everyone; deleting them keeps the table small
+    session.execute(delete(RunnerMember).where(RunnerMember.lease_expires_at <= now))
+    members = session.execute(select(RunnerMember.runner_id).order_by(RunnerMember.runner_id)).scalars().all()
+    session.commit()
+    session.close()
+    return list(members)
+
+
+def leave_membership(runner_id: str):
+    session = get_session()
+    session.execute(delete(RunnerMember).where(RunnerMember.runner_id == runner_id))
+    session.commit()
+    session.close()
+
+
+class PartitionMap:
+    """
+    One runner's view of the ring. start() renews the membership lease and
+    recomputes ownership every lease_seconds / 3 on a background thread, like
+    app.workers.context.LeaseKeeper.
+    owned is None while this runner owns every partition (the single-runner case),
+    so claims carry no filter at all.
+    """
+
+    def __init__(self, runner_id: str, lease_seconds: float, partitions: int = PARTITIONS):
+        self.runner_id = runner_id
+        self.lease_seconds = lease_seconds
+        self.interval = max(1.0, lease_seconds / 3)
+        self.partitions = partitions
+        self.members: list[str] = []
+        self.owned: list[int] | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> bool:
+        """
+        Renew membership and recompute ownership. Returns True if ownership changed.
+        """
+        members = renew_membership(self.runner_id, self.lease_seconds)
+        if members == self.members:
+            return False
+        owned = assign_partitions(members, self.partitions).get(self.runner_id, [])
+        if len(owned) == self.partitions:
+            owned = None
+        with self._lock:
+            self.members = members
+            self.owned = owned
+        log_event(
+            "runner.partitions_changed",
+            message=f"{len(members)} runner(s) live",
+            data={"runner_id": self.runner_id, "members": members, "owned": "all" if owned is None else owned},
+        )
+        return True
+
+    def start(self):
+        # join before the first claim, so it already carries our share
+        self._refresh_quietly()
+        self._thread = threading.Thread(target=self._loop, name="partition-map", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop renewing and leave the ring: our partitions move over now instead of
+        when the lease lapses.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.leave()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._refresh_quietly()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception:
+            # keep the current assignment; the lease has two more renewals to go
+            pass
+
+    def claim_filter(self) -> dict:
+        """
+        Keyword arguments for claim_jobs / next_due_at.
+        """
+        with self._lock:
+            owned = self.owned
+        if owned is None:
+            return {}
+        return {"partitions": owned, "partition_count": self.partitions}
+
+    def leave(self):
+        leave_membership(self.runner_id)
@@ -0,0 +1,136 @@
+# agent/app/queue/recurring.py
+"""
+Recurring jobs: exactly one live instance per name.
+
+An instance is an ordinary job_queue row holding the dedupe key
+"recurring:{name}", so it is claimed, leased, retried and recovered like any
+other job, and the active-dedupe index rules out a second queued/running copy.
+recurring_job keeps the definition (job_type, payload, interval_seconds) and
+the live instance's next_run_at.
+
+- register_recurring(): upserts the definition and makes sure an instance
+  exists. Idempotent, so every process start can call it.
+- When an instance finishes (done, or failed for good) the runner releases its
+  key and enqueues the successor in the same transaction, at the time the
+  handler asked for (JobContext.next_run_at) or else now + interval_seconds.
+- wake_recurring(): pulls the live instance forward, never back.
+"""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db.sqlite import get_session, JobQueue, RecurringJob
+from app.queue.job_queue import enqueue_many, release_dedupe_key
+from app.queue.notify import notify_enqueued
+
+RECURRING_PREFIX = "recurring:"
+
+
+def recurring_key(name: str) -> str:
+    return f"{RECURRING_PREFIX}{name}"
+
+
+def recurring_name(dedupe_key: str | None) -> str | None:
+    """
+    The registry name behind an instance's dedupe_key, or None for other jobs.
+    """
+    if dedupe_key and dedupe_key.startswith(RECURRING_PREFIX):
+        return dedupe_key[len(RECURRING_PREFIX):]
+    return None
+
+
+def _ensure_instance(session, row: RecurringJob, run_at: datetime, on_conflict: str) -> int:
+    """
+    Enqueue the instance (or coalesce with the live one) and mirror its run_at.
+    """
+    job_id = enqueue_many([{
+        "job_type": row.job_type,
+        "payload": json.loads(row.payload_json or "{}"),
+        "run_at": run_at,
+        "dedupe_key": recurring_key(row.name),
+        "on_conflict": on_conflict,
+    }], session=session)[0]
+    row.next_run_at = session.execute(select(JobQueue.run_at).where(JobQueue.id == job_id)).scalar()
+    row.updated_at = datetime.utcnow()
+    session.flush()
+    return job_id
+
+
+def register_recurring(name: str, job_type: str, interval_seconds: int, payload: dict | None = None,
+                       first_run_at: datetime | None = None) -> int:
+    """
+    Define (or update) a recurring job and make sure its instance is queued.
+    first_run_at pulls an existing instance forward; without it a live instance
+    is left alone. Returns the instance's job id.
+    """
+    now = datetime.utcnow()
+    session = get_session()
+    values = {
+        "job_type": job_type,
+        "payload_json": json.dumps(payload or {}),
+        "interval_seconds": int(interval_seconds),
+        "updated_at": now,
+    }
+    session.execute(
+        sqlite_insert(RecurringJob)
+        .values(name=name, **values)
+        .on_conflict_do_update(index_elements=["name"], set_=values)
+    )
+    row = session.get(RecurringJob, name)
+    job_id = _ensure_instance(session, row, first_run_at or now, "reschedule" if first_run_at else "ignore")
+    session.commit()
+    session.close()
+    notify_enqueued()
+    return job_id
+
+
+def wake_recurring(name: str, at: datetime | None = None, session=None) -> int | None:
+    """
+    Run `name` at `at` (default now) at the latest. None if it isn't registered.
+    With session=, joins the caller's transaction (see UnitOfWork.wake_recurring).
+    """
+    own_session = session is None
+    if own_session:
+        session = get_session()
+    row = session.get(RecurringJob, name)
+    job_id = None
+    if row is not None:
+        job_id = _ensure_instance(session, row, at or datetime.utcnow(), "reschedule")
+    if own_session:
+        session.commit()
+        session.close()
+        if job_id is not None:
+            notify_enqueued()
+    return job_id
+
+
+def begin_recurring_run(session, name: str):
+    """
+    Stamp the run's start. As a handler's first write it takes SQLite's write lock
+    before the handler reads anything, so a wake_recurring() either commits before
+    those reads or coalesces with the successor this run commits.
+    """
+    session.execute(
+        update(RecurringJob)
+        .where(RecurringJob.name == name)
+        .values(last_run_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def finish_recurring(session, job, next_run_at: datetime | None = None) -> int | None:
+    """
+    Hand the name over from a finished instance to its successor, in the caller's
+    transaction. No-op (None) for jobs that aren't registered recurring instances.
+    """
+    name = recurring_name(getattr(job, "dedupe_key", None))
+    if name is None:
+        return None
+    row = session.get(RecurringJob, name)
+    if row is None:
+        return None
+    release_dedupe_key(job.id, session)
+    at = next_run_at or datetime.utcnow() + timedelta(seconds=row.interval_seconds)
+    return _ensure_instance(session, row, at, "reschedule")
@@ -0,0 +1,101 @@
+# agent/app/queue/retention.py
+"""
+Retention for finished jobs.
+
+done/failed rows older than SALESTROOPZ_JOB_RETENTION_DAYS are moved to
+job_queue_archive (or deleted outright with SALESTROOPZ_JOB_RETENTION_MODE=delete),
+so the indexes claim_jobs walks only hold live work.
+
+Work is done in small batches, one short transaction each, so the runner and
+API never wait long on the write lock.
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, delete, text
+
+from app.db.sqlite import get_session, JobQueue, JobQueueArchive, log_event
+
+RETENTION_DAYS = float(os.getenv("SALESTROOPZ_JOB_RETENTION_DAYS", "7"))
+RETENTION_MODE = os.getenv("SALESTROOPZ_JOB_RETENTION_MODE", "archive")  # archive | delete
+BATCH_SIZE = int(os.getenv("SALESTROOPZ_JOB_RETENTION_BATCH", "500"))
+VACUUM_PAGES = int(os.getenv("SALESTROOPZ_VACUUM_PAGES", "1000"))
+
+# every job_queue column; the job's id goes to original_id (archive rows have their own)
+_JOB_COLUMNS = [c.name for c in JobQueue.__table__.columns]
+_ARCHIVE_COLUMNS = ["original_id" if c == "id" else c for c in _JOB_COLUMNS]
+
+
+def prune_finished_jobs(
+    older_than_days: float = RETENTION_DAYS,
+    mode: str = RETENTION_MODE,
+    batch_size: int = BATCH_SIZE,
+    max_batches: int = 20,
+) -> int:
+    """
+    Archive or delete done/failed jobs last updated before the cutoff.
+    Returns the number of rows removed from job_queue. Stops after max_batches
+    so one call stays short; the next call picks up where this one left off.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    total = 0
+
+    for _ in range(max_batches):
+        session = get_session()
+        ids = list(session.scalars(
+            select(JobQueue.id)
+            .where(JobQueue.status.in_(["done", "failed"]))
+            .where(JobQueue.updated_at < cutoff)
+            .order_by(JobQueue.id.asc())
+            .limit(batch_size)
+        ))
+        if not ids:
+            session.close()
+            break
+
+        if mode == "archive":
+            cols = [getattr(JobQueue, c) for c in _JOB_COLUMNS]
+            session.execute(
+                insert(JobQueueArchive)
+                .from_select(_ARCHIVE_COLUMNS, select(*cols).where(JobQueue.id.in_(ids)).order_by(JobQueue.id))
+            )
+        session.execute(delete(JobQueue).where(JobQueue.id.in_(ids)))
+        session.commit()
+        session.close()
+
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    return total
+
+
+def incremental_vacuum(pages: int = VACUUM_PAGES) -> bool:
+    """
+    Release up to `pages` free pages back to the filesystem.
+    No-op (returns False) unless the DB was created with auto_vacuum=INCREMENTAL.
+    """
+    session = get_session()
+    mode = session.execute(text("PRAGMA auto_vacuum")).scalar()
+    if mode != 2:
+        session.close()
+        return False
+    session.execute(text(f"PRAGMA incremental_vacuum({int(pages)})"))
+    session.commit()
+    session.close()
+    return True
+
+
+def run_retention() -> int:
+    """
+    One retention pass: prune a bounded number of batches, then incrementally vacuum.
+    """
+    removed = prune_finished_jobs()
+    vacuumed = incremental_vacuum() if removed else False
+    if removed:
+        log_event(
+            "queue.retention",
+            message=f"Removed {removed} finished jobs",
+            data={"removed": removed, "mode": RETENTION_MODE, "vacuumed": vacuumed},
+        )
+    return removed
@@ -0,0 +1,34 @@
+# agent/app/queue/scheduler.py
+"""
+Wakeups for the scheduler tick.
+
+The tick is the recurring job SCHEDULER_JOB (app.queue.recurring): one live
+instance, whose successor each run schedules for when the next lead becomes due
+(see app.workers.handlers.tick), so an idle desktop sleeps instead of scanning
+every 15s. Anything that makes leads due earlier than that (campaign start, lead
+import, a scheduled followup) calls wake_scheduler(), which only ever pulls the
+queued tick forward.
+"""
+import os
+from datetime import datetime
+
+from app.queue.recurring import register_recurring, wake_recurring
+
+SCHEDULER_JOB = "tick"
+
+# The tick runs at least this often: a backstop for writes that don't wake it.
+TICK_MAX_SLEEP_SECONDS = float(os.getenv("SALESTROOPZ_TICK_MAX_SLEEP_SECONDS", "3600"))
+
+
+def register_scheduler(first_run_at: datetime | None = None) -> int:
+    """
+    Make sure the tick exists; API and runner both call this on start.
+    """
+    return register_recurring(SCHEDULER_JOB, "tick", int(TICK_MAX_SLEEP_SECONDS), first_run_at=first_run_at)
+
+
+def wake_scheduler(at: datetime | None = None, session=None) -> int | None:
+    """
+    Run the tick at `at` (default now) at the latest. Returns the tick's job id.
+    """
+    return wake_recurring(SCHEDULER_JOB, at, session=session)
@@ -0,0 +1,196 @@
+# agent/app/workers/async_runner.py
+"""
+asyncio variant of app.workers.runner.run_forever for I/O-bound handlers.
+
+Coroutine handlers (async def handle_x(payload, ctx)) run directly on the event
+loop, so hundreds of Ollama / Graph requests can be in flight from one process.
+They share one set of HTTP clients opened for this loop (ctx.clients, see
+app.workers.clients) and run their short DB steps on the default executor.
+Sync handlers (tick, import_leads) are offloaded with asyncio.to_thread and
+hold a thread each. Claiming, retries, backoff, lease renewal and events are
+shared with the threaded runner.
+"""
+import asyncio
+import inspect
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import app.workers.runner as runner
+from app.queue.job_queue import claim_jobs, JobDeferred
+from app.queue.notify import WakeupListener
+from app.queue.partitions import PartitionMap
+from app.queue.scheduler import register_scheduler
+from app.workers.clients import JobClients
+from app.workers.context import LeaseKeeper
+from app.db.sqlite import log_event
+
+# Per-job_type in-flight caps; "*" covers any job_type without its own cap.
+ASYNC_CONCURRENCY = {
+    "generate_copy": 8,     # waits on Ollama, which queues generations itself
+    "send_email": 100,
+    "poll_replies": 100,
+    "tick": 1,
+    "import_leads": 1,
+    "*": 4,
+}
+
+# Threads for the DB steps of coroutine handlers and the dispatcher's DB calls.
+ASYNC_DB_THREADS = int(os.getenv("SALESTROOPZ_ASYNC_DB_THREADS", "8"))
+
+
+def executor_threads(concurrency: dict, handlers: dict | None = None) -> int:
+    """
+    to_thread workers: one per in-flight sync handler ("*" may be any type, so it
+    counts as sync), plus ASYNC_DB_THREADS.
+    """
+    handlers = handlers or runner.HANDLERS
+    sync = sum(
+        cap for job_type, cap in concurrency.items()
+        if job_type == "*" or not inspect.iscoroutinefunction(handlers.get(job_type))
+    )
+    return sync + ASYNC_DB_THREADS
+
+
+async def execute_job_async(job, leases: LeaseKeeper | None = None, clients: JobClients | None = None):
+    prepared = await asyncio.to_thread(runner.prepare_job, job)
+    if not prepared:
+        return
+    handler, payload, ctx = prepared
+
+    if leases:
+        leases.track(job.id)
+
+    try:
+        # Handlers should be idempotent.
+        if inspect.iscoroutinefunction(handler):
+            ctx.clients = clients
+            # run_final_step commits the job in the thread that wrote its last step
+            ctx.complete = lambda: runner.job_succeeded(job, leases, ctx)
+            await handler(payload, ctx)
+        else:
+            await asyncio.to_thread(handler, payload, ctx)
+        if not ctx.completed:
+            await asyncio.to_thread(runner.job_succeeded, job, leases, ctx)
+
+    except JobDeferred as e:
+        await asyncio.to_thread(runner.job_deferred, job, e, leases, ctx)
+
+    except Exception as e:
+        tb = traceback.format_exc(limit=12)
+        await asyncio.to_thread(runner.job_failed, job, payload, e, tb, leases, ctx)
+
+
+async def _read_wakeups(listener: WakeupListener, wake: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.sock_recv(listener.sock, 64)
+        except OSError:
+            return
+        wake.set()
+
+
+async def run_forever_async(
+    poll_interval: float = 0.5,
+    heartbeat_seconds: int = 15,
+    concurrency: dict | None = None,
+    max_idle_seconds: float = 30.0,
+    retention_seconds: float = 3600,
+):
+    """
+    Same contract as runner.run_forever in pool mode, but jobs are asyncio tasks.
+    Stops on SIGINT/SIGTERM (runner._STOP) after in-flight jobs finish.
+    """
+    concurrency = concurrency or ASYNC_CONCURRENCY
+    # every explicitly configured type stays out of "*", including those capped at 0 (paused)
+    capped_types = [t for t in concurrency if t != "*"]
+    caps = {t: c for t, c in concurrency.items() if c > 0}
+    in_flight = {t: 0 for t in caps}
+    tasks: set[asyncio.Task] = set()
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=executor_threads(caps),
+                                                 thread_name_prefix="async-runner"))
+
+    register_scheduler()
+    clients = await JobClients.open()
+    listener = runner._LISTENER = WakeupListener()
+    wake = asyncio.Event()
+    reader = asyncio.create_task(_read_wakeups(listener, wake)) if listener.bound else None
+
+    partitions = PartitionMap(runner.RUNNER_ID, lease_seconds=runner.MEMBER_LEASE_HEARTBEATS * heartbeat_seconds)
+    await asyncio.to_thread(partitions.start)
+    leases = LeaseKeeper()
+    leases.start()
+    chores = runner._Housekeeping(heartbeat_seconds, retention_seconds, in_flight=in_flight, partitions=partitions)
+
+    log_event(
+        "runner.started",
+        message="Runner loop started (asyncio)",
+        data={"runner_id": runner.RUNNER_ID, "concurrency": caps, "wakeup_channel": listener.bound},
+    )
+
+    def _spawn(job, bucket: str):
+        in_flight[bucket] += 1
+        task = asyncio.create_task(execute_job_async(job, leases, clients))
+        tasks.add(task)
+
+        def _done(t: asyncio.Task):
+            tasks.discard(t)
+            in_flight[bucket] -= 1
+            # a slot freed up: wake the dispatcher
+            wake.set()
+
+        task.add_done_callback(_done)
+
+    try:
+        while not runner._STOP:
+            await asyncio.to_thread(chores.run_due)
+
+            claimed = 0
+            for bucket, cap in caps.items():
+                free = cap - in_flight[bucket]
+                if free <= 0:
+                    continue
+
+                if bucket == "*":
+                    jobs = await asyncio.to_thread(claim_jobs, free, exclude_types=capped_types,
+                                                   **chores.claim_filter())
+                else:
+                    jobs = await asyncio.to_thread(claim_jobs, free, job_types=[bucket], **chores.claim_filter())
+
+                for job in jobs:
+                    _spawn(job, bucket)
+                claimed += len(jobs)
+
+            if claimed:
+                # let freshly spawned tasks start before claiming again
+                await asyncio.sleep(0)
+                continue
+
+            # sleep until the next due job, an enqueue, or a slot frees up
+            timeout = await asyncio.to_thread(
+                runner._idle_seconds, listener, poll_interval, max_idle_seconds,
+                chores.seconds_until_next(), max_idle_seconds, chores.claim_filter(),
+            )
+            try:
+                await asyncio.wait_for(wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+    finally:
+        # let in-flight handlers finish; their leases still protect them
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if reader:
+            reader.cancel()
+        await clients.aclose()
+        await asyncio.to_thread(runner._leave_quietly, partitions)
+        leases.stop()
+        runner._LISTENER = None
+        listener.close()
+        await asyncio.to_thread(runner._flush_metrics_quietly)
+
+    # clean shutdown
+    log_event("runner.stopped", level="WARN", message="Runner loop stopped", data={"runner_id": runner.RUNNER_ID})
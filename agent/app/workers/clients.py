@@ -0,0 +1,99 @@
+# agent/app/workers/clients.py
+"""
+HTTP clients for coroutine handlers, one set per event loop.
+
+An httpx.AsyncClient belongs to the loop it first runs on and fails with
+"Event loop is closed" once that loop is gone, so these are never module
+globals. The asyncio runner opens one JobClients for its loop and hands it to
+every job as ctx.clients; job_clients() opens a short-lived set when a
+coroutine handler runs without one (the threaded runner gives each coroutine
+handler its own asyncio.run loop).
+
+The M365 sign-in (msal, sync) is not loop-bound and is shared process-wide.
+"""
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.llm.ollama_async import AsyncOllamaClient
+from app.m365.async_client import AsyncM365Client
+
+GRAPH_TIMEOUT_SECS = 30
+GRAPH_MAX_CONNECTIONS = int(os.getenv("SALESTROOPZ_GRAPH_MAX_CONNECTIONS", "100"))
+
+_M365_AUTH = None
+_M365_AUTH_LOCK = threading.Lock()
+
+
+def _m365_auth():
+    """
+    The process's M365Auth, or None when M365 isn't configured (no M365_CLIENT_ID).
+    """
+    global _M365_AUTH
+    with _M365_AUTH_LOCK:
+        if _M365_AUTH is None:
+            try:
+                from app.m365.auth import M365Auth
+                _M365_AUTH = M365Auth()
+            except Exception:
+                _M365_AUTH = False
+        return _M365_AUTH or None
+
+
+def _m365_token_provider():
+    auth = _m365_auth()
+    if auth is None:
+        return None
+
+    def get_token() -> str:
+        token = auth.acquire_token_silent()
+        if not token or "access_token" not in token:
+            raise RuntimeError("M365 is not connected; sign in again")
+        return token["access_token"]
+
+    return get_token
+
+
+class JobClients:
+    """
+    llm: AsyncOllamaClient. graph: AsyncM365Client, or None when M365 isn't
+    configured (send_email then records sends locally, as before).
+    """
+
+    def __init__(self, get_token=None):
+        self.http = httpx.AsyncClient(
+            timeout=GRAPH_TIMEOUT_SECS,
+            limits=httpx.Limits(max_connections=GRAPH_MAX_CONNECTIONS),
+        )
+        self.llm = AsyncOllamaClient()
+        self.graph = AsyncM365Client(get_token, self.http) if get_token else None
+
+    @classmethod
+    async def open(cls) -> "JobClients":
+        # the first call builds the msal app, which reads the token cache from disk
+        return cls(await asyncio.to_thread(_m365_token_provider))
+
+    async def aclose(self):
+        await self.llm.aclose()
+        await self.http.aclose()
+
+
+@asynccontextmanager
+async def job_clients(ctx=None):
+    """
+    Yield the job's clients (ctx.clients), or a set opened for this call and
+    closed when the block exits.
+    """
+    clients = getattr(ctx, "clients", None)
+    if clients is not None:
+        yield clients
+        return
+
+    clients = await JobClients.open()
+    try:
+        yield clients
+    finally:
+        await clients.aclose()
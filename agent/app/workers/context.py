@@ -0,0 +1,214 @@
+# agent/app/workers/context.py
+"""
+Per-job context handed to handlers, plus the background lease keeper.
+
+Handlers are called as handler(payload, ctx). Long-running handlers can call
+ctx.extend_lease() explicitly (e.g. before a slow LLM call); the runner's
+LeaseKeeper also renews every in-flight lease in the background, so a lease
+only lapses when the worker process has actually died.
+
+Handlers write through ctx.uow (see UnitOfWork): domain rows, activity, events
+and follow-on jobs are committed by the runner together with the job's own
+mark_done, in one transaction. job_unit_of_work(ctx) gives handlers the same
+interface when they are called without a ctx.
+
+Coroutine handlers do their DB work in threads (asyncio.to_thread) and end
+with run_final_step(), which commits the job in the same thread as the
+handler's last writes.
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+from app.db.sqlite import get_session, log_event, log_activity
+from app.queue.job_queue import renew_leases, enqueue_many, enqueue_bulk, mark_done, defer_job, LEASE_SECONDS_DEFAULT
+from app.queue.notify import notify_enqueued
+from app.queue.recurring import wake_recurring, finish_recurring
+
+
+class UnitOfWork:
+    """
+    One transaction for everything a job does. Nothing is written until commit();
+    rollback() discards it all, so a failed attempt leaves no partial state.
+    The session is opened lazily: jobs that write nothing cost nothing extra.
+    """
+
+    def __init__(self):
+        self._session = None
+        self._enqueued = False
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = get_session()
+        return self._session
+
+    def log_event(self, event_type: str, **kwargs):
+        return log_event(event_type, session=self.session, **kwargs)
+
+    def log_activity(self, lead_id: int, type: str, message: str):
+        return log_activity(lead_id, type, message, session=self.session)
+
+    def enqueue_many(self, jobs: list[dict]) -> list[int]:
+        ids = enqueue_many(jobs, session=self.session)
+        self._enqueued = self._enqueued or bool(ids)
+        return ids
+
+    def enqueue_bulk(self, jobs: list[dict]) -> int:
+        inserted = enqueue_bulk(jobs, session=self.session)
+        self._enqueued = self._enqueued or bool(inserted)
+        return inserted
+
+    def wake_recurring(self, name: str, at=None):
+        job_id = wake_recurring(name, at, session=self.session)
+        self._enqueued = self._enqueued or job_id is not None
+        return job_id
+
+    def finish_recurring(self, job, next_run_at=None):
+        """
+        Enqueue a recurring instance's successor with this unit (see app.queue.recurring).
+        """
+        job_id = finish_recurring(self.session, job, next_run_at)
+        self._enqueued = self._enqueued or job_id is not None
+        return job_id
+
+    def commit(self, done_job_id: int | None = None):
+        """
+        Commit the unit, marking done_job_id done in the same transaction.
+        """
+        if done_job_id is not None:
+            mark_done(done_job_id, session=self.session)
+        if self._session is not None:
+            try:
+                self._session.commit()
+            finally:
+                self._session.close()
+                self._session = None
+        if self._enqueued:
+            self._enqueued = False
+            notify_enqueued()
+
+    def commit_deferred(self, job_id: int, run_at):
+        """
+        Commit the unit with the job requeued for run_at instead of marked done.
+        """
+        defer_job(job_id, run_at, session=self.session)
+        self.commit()
+
+    def rollback(self):
+        if self._session is not None:
+            self._session.rollback()
+            self._session.close()
+            self._session = None
+        self._enqueued = False
+
+
+@contextmanager
+def job_unit_of_work(ctx=None):
+    """
+    Yield the job's UnitOfWork (committed later by the runner), or, without a ctx,
+    a standalone one committed when the block exits cleanly.
+    """
+    if ctx is not None:
+        yield ctx.uow
+        return
+
+    uow = UnitOfWork()
+    try:
+        yield uow
+    except BaseException:
+        uow.rollback()
+        raise
+    uow.commit()
+
+
+class JobContext:
+    def __init__(self, job_id: int, job_type: str, attempts: int = 0, lease_seconds: int = LEASE_SECONDS_DEFAULT):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.attempts = attempts
+        self.lease_seconds = lease_seconds
+        self.started_at = time.monotonic()
+        self.uow = UnitOfWork()
+        # recurring jobs: when the successor should run (None = the registry's interval)
+        self.next_run_at = None
+        # the runner loop's HTTP clients for coroutine handlers (app.workers.clients)
+        self.clients = None
+        # set by the asyncio runner: commits the job (see run_final_step)
+        self.complete = None
+        self.completed = False
+
+    def extend_lease(self, seconds: int | None = None) -> bool:
+        """
+        Extend this job's lease to now + seconds (default: the claim lease).
+        Returns False if the lease is no longer ours.
+        """
+        return renew_leases([self.job_id], seconds or self.lease_seconds) > 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+async def run_final_step(ctx, fn, *args):
+    """
+    Run a coroutine handler's last DB step, fn(*args, ctx), in a thread, and
+    commit the job in that same thread when the runner asked for it (ctx.complete).
+    The step's writes hold SQLite's write lock until the commit; handing the
+    commit to another to_thread call would let the loop queue it behind jobs
+    waiting on that lock.
+    """
+    def _step():
+        try:
+            fn(*args, ctx)
+        except BaseException:
+            if ctx is not None:
+                ctx.uow.rollback()
+            raise
+        if ctx is not None and ctx.complete is not None:
+            ctx.complete()
+            ctx.completed = True
+
+    await asyncio.to_thread(_step)
+
+
+class LeaseKeeper:
+    """
+    Background thread that renews the leases of all in-flight jobs in one
+    UPDATE every lease_seconds / 3.
+    """
+
+    def __init__(self, lease_seconds: int = LEASE_SECONDS_DEFAULT):
+        self.lease_seconds = lease_seconds
+        self.interval = max(1.0, lease_seconds / 3)
+        self._jobs: set[int] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, job_id: int):
+        with self._lock:
+            self._jobs.add(job_id)
+
+    def untrack(self, job_id: int):
+        with self._lock:
+            self._jobs.discard(job_id)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="lease-keeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                job_ids = list(self._jobs)
+            try:
+                renew_leases(job_ids, self.lease_seconds)
+            except Exception:
+                # a missed renewal is retried next interval; the lease has 2 more to go
+                pass
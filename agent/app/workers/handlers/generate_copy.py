@@ -1,61 +1,103 @@
-import json
-from app.db.sqlite import get_session, Campaign, Lead, OutboxEmail
-from app.queue.job_queue import enqueue
-from app.db.sqlite import log_event
+import asyncio
+from datetime import datetime
+from app.agent.prompts import prompt_email_body
+from app.db.sqlite import Lead, OutboxEmail, get_session, get_campaign_config
+from app.queue.pacing import park_lead
+from app.workers.clients import job_clients
+from app.workers.context import job_unit_of_work, run_final_step
 
 def _dedupe_key(campaign_id: int, lead_id: int, step_index: int) -> str:
     return f"c{campaign_id}:l{lead_id}:s{step_index}"
 
-def handle_generate_copy(payload: dict):
-    campaign_id = int(payload["campaign_id"])
-    lead_id = int(payload["lead_id"])
+def _send_job(outbox_id: int, campaign_id: int) -> dict:
+    return {
+        "job_type": "send_email",
+        "payload": {"outbox_id": outbox_id, "campaign_id": campaign_id},
+        "dedupe_key": f"send_email:o{outbox_id}",
+    }
 
+def _plan_copy(campaign_id: int, lead_id: int) -> dict | None:
+    """
+    Read what the next step needs, in a short session of its own (no transaction
+    stays open across the LLM call). None if the lead needs no copy.
+    """
     session = get_session()
-    c = session.query(Campaign).filter(Campaign.id == campaign_id).first()
-    l = session.query(Lead).filter(Lead.id == lead_id).first()
-    if not c or not l:
-        session.close()
-        return
+    try:
+        c = get_campaign_config(campaign_id, session=session)
+        l = session.query(Lead).filter(Lead.id == lead_id).first()
+        if not c or not l:
+            return None
 
-    if l.state not in ["NEW", "FOLLOWUP"]:
-        session.close()
-        return
+        if l.state not in ["NEW", "FOLLOWUP"]:
+            return None
 
-    sequence = json.loads(c.sequence_json or "{}")
-    steps = sequence.get("steps") or []
-    step_index = min(l.touch_count or 0, max(0, len(steps) - 1))
-    if not steps:
+        steps = c.steps
+        step_index = min(l.touch_count or 0, max(0, len(steps) - 1))
+        if not steps:
+            raise RuntimeError("No sequence steps saved for campaign")
+
+        step = steps[step_index]
+        template = step.get("template") or {}
+        first_name = l.full_name.split(" ")[0] if l.full_name else ""
+        plan = {
+            "step_index": step_index,
+            "dedupe_key": _dedupe_key(campaign_id, lead_id, step_index),
+            "subject": step.get("subject") or template.get("subject") or f"Quick question, {first_name}",
+            "body": step.get("body"),
+            "prompt": None,
+        }
+        if not plan["body"]:
+            lead = {"full_name": l.full_name, "company": l.company}
+            plan["prompt"] = prompt_email_body(step, lead, c.name)
+        return plan
+    finally:
         session.close()
-        raise RuntimeError("No sequence steps saved for campaign")
 
-    # NOTE: placeholder copy generation for now (next: call RunnerAgent + Ollama)
-    step = steps[step_index]
-    subject = step.get("subject") or f"Quick question, {l.full_name.split(' ')[0] if l.full_name else ''}"
-    body = step.get("body") or f"Hi {l.full_name or ''},\n\nWanted to reach out about {c.name}.\n\n— Taylor"
+def _queue_outbox(campaign_id: int, lead_id: int, plan: dict, ctx=None):
+    with job_unit_of_work(ctx) as uow:
+        session = uow.session
 
-    dk = _dedupe_key(campaign_id, lead_id, step_index)
+        # parked until send_email books its slot, which moves it again
+        lead = session.query(Lead).filter(Lead.id == lead_id).first()
+        if lead:
+            park_lead(lead, datetime.utcnow())
 
-    # Idempotency: if outbox exists, don't recreate
-    existing = session.query(OutboxEmail).filter(OutboxEmail.dedupe_key == dk).first()
-    if existing:
-        session.close()
-        enqueue("send_email", {"outbox_id": existing.id})
+        # Idempotency: if outbox exists, don't recreate
+        existing = session.query(OutboxEmail).filter(OutboxEmail.dedupe_key == plan["dedupe_key"]).first()
+        if existing:
+            uow.enqueue_many([_send_job(existing.id, campaign_id)])
+            return
+
+        row = OutboxEmail(
+            campaign_id=campaign_id,
+            lead_id=lead_id,
+            step_index=plan["step_index"],
+            dedupe_key=plan["dedupe_key"],
+            subject=plan["subject"],
+            body=plan["body"],
+            status="queued",
+            provider="m365",
+        )
+        session.add(row)
+        session.flush()  # assigns row.id for the send_email payload
+
+        uow.log_event("outbox.created", campaign_id=campaign_id, lead_id=lead_id,
+                      message=f"Outbox queued step {plan['step_index']}")
+        uow.enqueue_many([_send_job(row.id, campaign_id)])
+
+async def handle_generate_copy(payload: dict, ctx=None):
+    campaign_id = int(payload["campaign_id"])
+    lead_id = int(payload["lead_id"])
+
+    plan = await asyncio.to_thread(_plan_copy, campaign_id, lead_id)
+    if plan is None:
         return
 
-    row = OutboxEmail(
-        campaign_id=campaign_id,
-        lead_id=lead_id,
-        step_index=step_index,
-        dedupe_key=dk,
-        subject=subject,
-        body=body,
-        status="queued",
-        provider="m365",
-    )
-    session.add(row)
-    session.commit()
-    session.refresh(row)
-    session.close()
-
-    log_event("outbox.created", campaign_id=campaign_id, lead_id=lead_id, message=f"Outbox queued step {step_index}")
-    enqueue("send_email", {"outbox_id": row.id})
+    # steps without literal copy are written per lead by the local LLM
+    if plan["prompt"]:
+        async with job_clients(ctx) as clients:
+            plan["body"] = await clients.llm.generate_text(plan["prompt"])
+        if not plan["body"]:
+            raise RuntimeError("LLM returned an empty email body")
+
+    await run_final_step(ctx, _queue_outbox, campaign_id, lead_id, plan)
@@ -0,0 +1,103 @@
+import csv
+import os
+from datetime import datetime
+
+from app.db.sqlite import get_session, LeadImport, insert_leads, log_event
+from app.queue.scheduler import SCHEDULER_JOB
+from app.workers.context import job_unit_of_work
+
+# Rows per INSERT OR IGNORE executemany; each chunk commits with its progress row.
+IMPORT_CHUNK_ROWS = int(os.getenv("SALESTROOPZ_IMPORT_CHUNK_ROWS", "1000"))
+
+
+def _lead_from_row(row: dict) -> dict:
+    return {
+        "full_name": row.get("full_name") or row.get("name") or "",
+        "email": row.get("email") or "",
+        "company": row.get("company") or "",
+    }
+
+
+def _commit_chunk(import_id: int, campaign_id: int, chunk: list[dict], rows_read: int, done: bool = False) -> int:
+    """
+    Insert one chunk and advance the import's resume point in the same transaction,
+    so a retried job continues after the last committed chunk.
+    """
+    session = get_session()
+    inserted = insert_leads(session, campaign_id, chunk)
+    now = datetime.utcnow()
+    values = {
+        "rows_read": rows_read,
+        "inserted": LeadImport.inserted + inserted,
+        "status": "done" if done else "running",
+        "updated_at": now,
+    }
+    if done:
+        values["finished_at"] = now
+    session.query(LeadImport).filter(LeadImport.id == import_id).update(values, synchronize_session=False)
+    session.commit()
+    session.close()
+    return inserted
+
+
+def _fail(import_id: int, err: str):
+    session = get_session()
+    session.query(LeadImport).filter(LeadImport.id == import_id).update(
+        {"status": "failed", "error": err, "updated_at": datetime.utcnow()}, synchronize_session=False
+    )
+    session.commit()
+    session.close()
+
+
+def handle_import_leads(payload: dict, ctx=None):
+    """
+    Stream a spooled CSV upload into lead, IMPORT_CHUNK_ROWS rows at a time.
+    Memory stays bounded by the chunk size whatever the file size.
+    """
+    import_id = int(payload["import_id"])
+
+    session = get_session()
+    imp = session.query(LeadImport).filter(LeadImport.id == import_id).first()
+    session.close()
+    if not imp or imp.status in ("done", "failed"):
+        if imp and os.path.exists(imp.path):
+            os.remove(imp.path)
+        return
+
+    if not os.path.exists(imp.path):
+        _fail(import_id, "Upload file is missing")
+        log_event("leads.import_failed", level="ERROR", campaign_id=imp.campaign_id,
+                  message=f"Import {import_id}: upload file is missing")
+        return
+
+    campaign_id = imp.campaign_id
+    resume_at = imp.rows_read
+    total_inserted = imp.inserted
+    rows_read = 0
+    chunk = []
+
+    with open(imp.path, newline="", encoding="utf-8-sig", errors="ignore") as f:
+        for row in csv.DictReader(f):
+            rows_read += 1
+            if rows_read <= resume_at:
+                continue
+            chunk.append(_lead_from_row(row))
+            if len(chunk) >= IMPORT_CHUNK_ROWS:
+                total_inserted += _commit_chunk(import_id, campaign_id, chunk, rows_read)
+                chunk = []
+
+    total_inserted += _commit_chunk(import_id, campaign_id, chunk, rows_read, done=True)
+
+    # only once "done" is committed; a retry before this point still finds the file
+    os.remove(imp.path)
+
+    with job_unit_of_work(ctx) as uow:
+        uow.log_event(
+            "leads.uploaded",
+            campaign_id=campaign_id,
+            message=f"Inserted {total_inserted} leads",
+            data={"import_id": import_id, "rows": rows_read, "inserted": total_inserted},
+        )
+        if total_inserted:
+            # new leads are due now; don't wait out the scheduler's sleep
+            uow.wake_recurring(SCHEDULER_JOB)
@@ -1,16 +1,36 @@
-from app.db.sqlite import get_session, Lead
-from app.db.sqlite import log_event
-
-def handle_poll_replies(payload: dict):
-    lead_id = int(payload["lead_id"])
+import asyncio
+from app.db.sqlite import Lead, get_session
+from app.workers.clients import job_clients
+from app.workers.context import job_unit_of_work, run_final_step
 
+def _conversation_id(lead_id: int) -> str | None:
     session = get_session()
-    lead = session.query(Lead).filter(Lead.id == lead_id).first()
-    if not lead:
+    try:
+        lead = session.query(Lead).filter(Lead.id == lead_id).first()
+        if not lead:
+            return None
+        return lead.conversation_id or ""
+    finally:
         session.close()
+
+def _record_poll(lead_id: int, replies: list[dict] | None, ctx=None):
+    with job_unit_of_work(ctx) as uow:
+        # TODO: classify replies and move the lead on
+        data = {"replies": len(replies)} if replies is not None else None
+        uow.log_event("replies.polled", lead_id=lead_id, message="Polled replies", data=data)
+
+async def handle_poll_replies(payload: dict, ctx=None):
+    lead_id = int(payload["lead_id"])
+
+    conversation_id = await asyncio.to_thread(_conversation_id, lead_id)
+    if conversation_id is None:
         return
 
-    # TODO: call M365 replies API and classify
-    # For now: do nothing
-    session.close()
-    log_event("replies.polled", lead_id=lead_id, message="Polled replies (stub)")
+    # local-only sends (no M365) have no conversation to look in
+    replies = None
+    if conversation_id and not conversation_id.startswith("local-"):
+        async with job_clients(ctx) as clients:
+            if clients.graph is not None:
+                replies = await clients.graph.inbox_messages(conversation_id)
+
+    await run_final_step(ctx, _record_poll, lead_id, replies)
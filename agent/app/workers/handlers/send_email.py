@@ -1,47 +1,95 @@
+import asyncio
 from datetime import datetime, timedelta
-from app.db.sqlite import get_session, OutboxEmail, Lead, Campaign
-from app.queue.job_queue import enqueue
-from app.db.sqlite import log_event, log_activity
-
-def handle_send_email(payload: dict):
-    outbox_id = int(payload["outbox_id"])
+from app.db.sqlite import OutboxEmail, Lead, get_session, get_campaign_config
+from app.queue.job_queue import JobDeferred
+from app.queue.pacing import reserve_send, acquire_mailbox, park_lead
+from app.workers.clients import job_clients
+from app.workers.context import job_unit_of_work, run_final_step
 
+def _take_send_slot(outbox_id: int) -> dict | None:
+    """
+    Book the campaign slot (once per outbox row) and take the mailbox, in a
+    transaction of its own: the pacing rows hold SQLite's write lock, which must
+    not stay held across the Graph call. Returns what to send, or None if there
+    is nothing to send; raises JobDeferred when the slot or the mailbox is later.
+    """
     session = get_session()
-    ob = session.query(OutboxEmail).filter(OutboxEmail.id == outbox_id).first()
-    if not ob:
-        session.close()
-        return
+    try:
+        ob = session.query(OutboxEmail).filter(OutboxEmail.id == outbox_id).first()
+        if not ob or ob.status == "sent":
+            return None
 
-    if ob.status == "sent":
-        session.close()
-        return
+        lead = session.query(Lead).filter(Lead.id == ob.lead_id).first()
+        camp = get_campaign_config(ob.campaign_id, session=session)
+        if not lead or not camp:
+            return None
+
+        # a later slot parks the job until then; the booking stays committed
+        now = datetime.utcnow()
+        if ob.scheduled_at is None:
+            ob.scheduled_at = reserve_send(session, ob.campaign_id, camp.run_config, now=now)
+        scheduled_at = ob.scheduled_at
+        if scheduled_at > now:
+            park_lead(lead, scheduled_at)
+            session.commit()
+            raise JobDeferred(scheduled_at, reason="send paced")
 
-    lead = session.query(Lead).filter(Lead.id == ob.lead_id).first()
-    camp = session.query(Campaign).filter(Campaign.id == ob.campaign_id).first()
-    if not lead or not camp:
+        retry_at = acquire_mailbox(session, ob.provider, now=now)
+        send = {"to_email": lead.email, "subject": ob.subject, "body": ob.body}
+        if retry_at is not None:
+            park_lead(lead, retry_at)
+        session.commit()
+        if retry_at is not None:
+            raise JobDeferred(retry_at, reason="mailbox busy")
+        return send
+    finally:
         session.close()
-        return
 
-    # TODO: Replace with actual M365 send returning message_id/thread_id
-    fake_message_id = f"local-{ob.dedupe_key}"
-    fake_thread_id = lead.conversation_id or fake_message_id
+def _record_sent(outbox_id: int, message_id: str | None, thread_id: str | None, ctx=None):
+    # outbox + lead update, event, activity and the poll job commit together
+    with job_unit_of_work(ctx) as uow:
+        session = uow.session
+        ob = session.query(OutboxEmail).filter(OutboxEmail.id == outbox_id).first()
+        lead = session.query(Lead).filter(Lead.id == ob.lead_id).first()
+        camp = get_campaign_config(ob.campaign_id, session=session)
+
+        # without M365 configured the send is recorded locally only
+        message_id = message_id or f"local-{ob.dedupe_key}"
+        thread_id = thread_id or lead.conversation_id or message_id
+
+        ob.status = "sent"
+        ob.provider_message_id = message_id
+        ob.thread_id = thread_id
+        ob.sent_at = datetime.utcnow()
+
+        # advance lead state
+        lead.touch_count = (lead.touch_count or 0) + 1
+        lead.state = "WAITING_REPLY"
+        lead.conversation_id = thread_id
+        lead.next_touch_at = datetime.utcnow() + timedelta(days=camp.cadence_days)
 
-    ob.status = "sent"
-    ob.provider_message_id = fake_message_id
-    ob.thread_id = fake_thread_id
-    ob.sent_at = datetime.utcnow()
+        uow.log_event("email.sent", campaign_id=ob.campaign_id, lead_id=lead.id, message=f"Sent step {ob.step_index}")
+        uow.log_activity(lead.id, "email_sent", f"Sent: {ob.subject}")
 
-    # advance lead state
-    lead.touch_count = (lead.touch_count or 0) + 1
-    lead.state = "WAITING_REPLY"
-    lead.conversation_id = fake_thread_id
-    lead.next_touch_at = datetime.utcnow() + timedelta(days=camp.cadence_days)
+        # schedule reply polling soon
+        uow.enqueue_many([{
+            "job_type": "poll_replies",
+            "payload": {"campaign_id": ob.campaign_id, "lead_id": lead.id},
+            "run_at": datetime.utcnow() + timedelta(seconds=30),
+            "dedupe_key": f"poll_replies:l{lead.id}",
+        }])
 
-    session.commit()
-    session.close()
+async def handle_send_email(payload: dict, ctx=None):
+    outbox_id = int(payload["outbox_id"])
+
+    send = await asyncio.to_thread(_take_send_slot, outbox_id)
+    if send is None:
+        return
 
-    log_event("email.sent", campaign_id=camp.id, lead_id=lead.id, message=f"Sent step {ob.step_index}")
-    log_activity(lead.id, "email_sent", f"Sent: {ob.subject}")
+    message_id = thread_id = None
+    async with job_clients(ctx) as clients:
+        if clients.graph is not None:
+            sent = await clients.graph.send_mail(send["to_email"], send["subject"], send["body"])
+            message_id, thread_id = sent["id"], sent["conversationId"]
 
-    # schedule reply polling soon
-    enqueue("poll_replies", {"campaign_id": camp.id, "lead_id": lead.id}, run_at=(datetime.utcnow() + timedelta(seconds=30)))
+    await run_final_step(ctx, _record_sent, outbox_id, message_id, thread_id)
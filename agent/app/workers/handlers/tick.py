@@ -1,29 +1,133 @@
+import os
 from datetime import datetime, timedelta
-from app.queue.job_queue import enqueue
-from app.db.sqlite import get_session, Campaign, Lead
+from sqlalchemy import text, bindparam, DateTime
+from app.queue.pacing import mailbox_open, mailbox_next_eligible, pacing_horizon, PACING_HORIZON_SECONDS
+from app.queue.recurring import begin_recurring_run
+from app.queue.scheduler import SCHEDULER_JOB, TICK_MAX_SLEEP_SECONDS
+from app.workers.context import job_unit_of_work
 
-def handle_tick(payload: dict):
+# Leads per campaign per tick when run_config has no max_concurrent_leads.
+TICK_DEFAULT_LEAD_CAP = int(os.getenv("SALESTROOPZ_TICK_DEFAULT_LEAD_CAP", "25"))
+# Ticks run when the next lead is due, but no more often than TICK_MIN_SECONDS
+# and no less often than TICK_MAX_SLEEP_SECONDS.
+TICK_MIN_SECONDS = float(os.getenv("SALESTROOPZ_TICK_MIN_SECONDS", "15"))
+
+# Due leads of every running campaign, one statement:
+# - running: each running campaign with its cap (run_config.max_concurrent_leads),
+#            skipping those whose next send slot (app.queue.pacing) is past the horizon
+# - picked:  per campaign, an index probe on ix_lead_campaign_state_due bounded by the
+#            largest cap, most overdue first (LIMIT can't reference the outer row)
+# - outer:   trims each campaign to its own cap
+# Leads stay NEW/FOLLOWUP until sent, but once their outbox row exists they are
+# parked past the send (app.queue.pacing.park_lead), and generate_copy is deduped
+# per lead while it runs; so a lead is picked once per send, and the cap bounds
+# how many leads a campaign starts per tick.
+_DUE_LEADS_SQL = """
+WITH running AS (
+    SELECT c.id,
+           CAST(COALESCE(
+               CASE WHEN json_valid(c.run_config_json)
+                    THEN json_extract(c.run_config_json, '$.max_concurrent_leads') END,
+               :default_cap
+           ) AS INTEGER) AS cap
+    FROM campaign c
+    LEFT JOIN send_pacing p ON p.key = 'campaign:' || c.id
+    WHERE c.status = 'running'
+      AND (p.next_eligible_at IS NULL OR p.next_eligible_at <= :horizon)
+),
+picked AS (
+    SELECT r.id AS campaign_id, r.cap, l.id AS lead_id, l.next_touch_at
+    FROM running r
+    JOIN lead l ON l.id IN (
+        SELECT id FROM lead
+        WHERE campaign_id = r.id AND state IN ('NEW', 'FOLLOWUP') AND next_touch_at <= :now
+        ORDER BY next_touch_at
+        LIMIT (SELECT MAX(cap) FROM running)
+    )
+)
+SELECT campaign_id, lead_id FROM (
+    SELECT campaign_id, lead_id, cap,
+           ROW_NUMBER() OVER (PARTITION BY campaign_id ORDER BY next_touch_at, lead_id) AS rn
+    FROM picked
+)
+WHERE rn <= cap
+"""
+
+
+# When the next lead of any running campaign becomes due (julianday), no earlier than
+# its campaign's pacing slot minus the horizon. Per campaign and state, one MIN()
+# probe on ix_lead_campaign_state_due; NULL when nothing is pending.
+_NEXT_DUE_SQL = """
+SELECT MIN(MAX(d.due, COALESCE(julianday(p.next_eligible_at) - :horizon_days, 0)))
+FROM (
+    SELECT c.id,
+           MIN(
+               COALESCE(julianday((SELECT MIN(next_touch_at) FROM lead
+                                   WHERE campaign_id = c.id AND state = 'NEW')), 1e9),
+               COALESCE(julianday((SELECT MIN(next_touch_at) FROM lead
+                                   WHERE campaign_id = c.id AND state = 'FOLLOWUP')), 1e9)
+           ) AS due
+    FROM campaign c
+    WHERE c.status = 'running'
+) d
+LEFT JOIN send_pacing p ON p.key = 'campaign:' || d.id
+WHERE d.due < 1e9
+"""
+
+_UNIX_EPOCH_JULIANDAY = 2440587.5
+
+
+def due_leads(session, now: datetime, default_cap: int = TICK_DEFAULT_LEAD_CAP) -> list[tuple[int, int]]:
+    """
+    (campaign_id, lead_id) pairs to generate copy for, across all running campaigns.
+    """
+    if not mailbox_open(session, now=now):
+        return []
+    return session.execute(
+        text(_DUE_LEADS_SQL).bindparams(bindparam("now", type_=DateTime), bindparam("horizon", type_=DateTime)),
+        {"now": now, "horizon": pacing_horizon(now), "default_cap": default_cap},
+    ).all()
+
+
+def next_tick_at(session, now: datetime) -> datetime:
     """
-    Periodically enqueue work for running campaigns.
+    When the tick should run next: when the next lead becomes due and its campaign
+    and the mailbox can send, clamped to [now + TICK_MIN_SECONDS, now + TICK_MAX_SLEEP_SECONDS].
     """
-    session = get_session()
-    now = datetime.utcnow()
-
-    campaigns = session.query(Campaign).filter(Campaign.status == "running").all()
-    for c in campaigns:
-        # enqueue generate_copy jobs for due leads
-        due_leads = (
-            session.query(Lead)
-            .filter(Lead.campaign_id == c.id)
-            .filter(Lead.next_touch_at <= now)
-            .filter(Lead.state.in_(["NEW", "FOLLOWUP"]))
-            .limit(25)
-            .all()
-        )
-        for lead in due_leads:
-            enqueue("generate_copy", {"campaign_id": c.id, "lead_id": lead.id})
-
-    session.close()
-
-    # schedule next tick
-    enqueue("tick", {}, run_at=(datetime.utcnow() + timedelta(seconds=15)))
+    earliest = now + timedelta(seconds=TICK_MIN_SECONDS)
+    latest = now + timedelta(seconds=TICK_MAX_SLEEP_SECONDS)
+
+    due = session.execute(text(_NEXT_DUE_SQL), {"horizon_days": PACING_HORIZON_SECONDS / 86400}).scalar()
+    if due is None:
+        return latest
+    at = datetime(1970, 1, 1) + timedelta(days=due - _UNIX_EPOCH_JULIANDAY)
+
+    mailbox_at = mailbox_next_eligible(session)
+    if mailbox_at is not None:
+        at = max(at, mailbox_at - timedelta(seconds=PACING_HORIZON_SECONDS))
+    return min(max(at, earliest), latest)
+
+
+def handle_tick(payload: dict, ctx=None):
+    """
+    Enqueue work for running campaigns, and ask for the next tick when more becomes
+    due (the runner enqueues it; app.queue.scheduler.wake_scheduler pulls it earlier).
+    """
+    with job_unit_of_work(ctx) as uow:
+        # first write: takes the write lock before anything is read
+        begin_recurring_run(uow.session, SCHEDULER_JOB)
+        now = datetime.utcnow()
+
+        jobs = [
+            {
+                "job_type": "generate_copy",
+                "payload": {"campaign_id": campaign_id, "lead_id": lead_id},
+                # no-op while this lead already has a generate_copy queued or running
+                "dedupe_key": f"generate_copy:c{campaign_id}:l{lead_id}",
+            }
+            for campaign_id, lead_id in due_leads(uow.session, now)
+        ]
+
+        uow.enqueue_bulk(jobs)
+        if ctx is not None:
+            ctx.next_run_at = next_tick_at(uow.session, now)
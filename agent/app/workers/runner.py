@@ -1,12 +1,23 @@
 import time
 import json
+import asyncio
+import inspect
 import signal
 import traceback
 import socket
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-from app.queue.job_queue import claim_next_job, mark_done, mark_failed
+from app.queue.job_queue import claim_next_job, claim_jobs, mark_done, mark_failed, next_due_at, JobDeferred, defer_job
+from app.workers.context import JobContext, LeaseKeeper
+from app.queue.notify import WakeupListener
+from app.queue.partitions import PartitionMap
+from app.queue.scheduler import register_scheduler
+from app.queue.retention import run_retention
+from app.db.event_rollup import run_event_retention
+from app.queue.metrics import STATS, flush_runner_metrics, record_heartbeat
 from app.db.sqlite import log_event
 
 # Import handlers
@@ -14,23 +25,31 @@ from app.workers.handlers.generate_copy import handle_generate_copy
 from app.workers.handlers.send_email import handle_send_email
 from app.workers.handlers.poll_replies import handle_poll_replies
 from app.workers.handlers.tick import handle_tick
+from app.workers.handlers.import_leads import handle_import_leads
 
 HANDLERS = {
     "tick": handle_tick,
     "generate_copy": handle_generate_copy,
     "send_email": handle_send_email,
     "poll_replies": handle_poll_replies,
+    "import_leads": handle_import_leads,
 }
 
 # ----------------------------
 # Runner identity + shutdown
 # ----------------------------
 RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+# Membership lease in heartbeats: a runner that misses this many loses its partitions.
+MEMBER_LEASE_HEARTBEATS = 3
 _STOP = False
+_LISTENER: WakeupListener | None = None
 
 def _handle_stop(signum, frame):
     global _STOP
     _STOP = True
+    # don't wait out an idle sleep before shutting down
+    if _LISTENER:
+        _LISTENER.poke()
 
 # Best-effort: handle Ctrl+C and termination
 signal.signal(signal.SIGINT, _handle_stop)
@@ -41,98 +60,435 @@ except Exception:
     pass
 
 
+# ----------------------------
+# Pool mode: per-job_type concurrency caps
+# ----------------------------
+# "*" applies to any job_type without its own cap.
+DEFAULT_CONCURRENCY = {
+    "generate_copy": 1,   # local LLM; one at a time
+    "send_email": 8,
+    "poll_replies": 4,
+    "tick": 1,
+    "import_leads": 1,    # one writer streaming a file at a time
+    "*": 1,
+}
+
+
+def parse_concurrency(spec: str | None, defaults: dict | None = None) -> dict | None:
+    """
+    "generate_copy=1,send_email=8" -> defaults (DEFAULT_CONCURRENCY) overridden with those caps.
+    Empty / None -> None (serial mode).
+    """
+    if not spec or not spec.strip():
+        return None
+
+    caps = dict(defaults or DEFAULT_CONCURRENCY)
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        job_type, _, cap = part.partition("=")
+        caps[job_type.strip()] = max(0, int(cap))
+    return caps
+
+
 def backoff_seconds(attempt: int) -> int:
     # 1,2,4,8,16,30,60...
     return min(60, 2 ** max(0, attempt - 1))
 
 
-def run_forever(poll_interval: float = 0.5, heartbeat_seconds: int = 15):
+class _Housekeeping:
+    """
+    Periodic chores run from the dispatcher loop between claims:
+    - heartbeat (runner_status.last_seen_at upsert) every heartbeat_seconds
+    - job retention and event rollup/retention pass every retention_seconds (0 disables)
+    - queue metrics snapshot every metrics_seconds, only when something changed
+    """
+
+    def __init__(self, heartbeat_seconds: float, retention_seconds: float, in_flight: dict | None = None,
+                 metrics_seconds: float = 2.0, partitions: PartitionMap | None = None):
+        self.heartbeat_seconds = heartbeat_seconds
+        self.partitions = partitions
+        self.retention_seconds = retention_seconds
+        self.metrics_seconds = metrics_seconds
+        self.in_flight = in_flight
+        self.last_heartbeat = 0.0
+        self.last_retention = time.time()  # don't prune on every restart
+        self.last_metrics = 0.0
+
+    def run_due(self):
+        now = time.time()
+        if now - self.last_heartbeat >= self.heartbeat_seconds:
+            self.last_heartbeat = now
+            data = {"in_flight": dict(self.in_flight)} if self.in_flight is not None else None
+            try:
+                record_heartbeat(RUNNER_ID, data)
+            except Exception:
+                pass
+
+        if self.retention_seconds and now - self.last_retention >= self.retention_seconds:
+            self.last_retention = now
+            try:
+                run_retention()
+            except Exception as e:
+                log_event("queue.retention_error", level="ERROR", message=f"{type(e).__name__}: {e}")
+            try:
+                run_event_retention()
+            except Exception as e:
+                log_event("event.retention_error", level="ERROR", message=f"{type(e).__name__}: {e}")
+
+        if STATS.dirty and now - self.last_metrics >= self.metrics_seconds:
+            self.last_metrics = now
+            _flush_metrics_quietly()
+
+    def claim_filter(self) -> dict:
+        """
+        claim_jobs keyword arguments restricting claims to this runner's partitions.
+        """
+        return self.partitions.claim_filter() if self.partitions else {}
+
+    def seconds_until_next(self) -> float:
+        now = time.time()
+        waits = [self.heartbeat_seconds - (now - self.last_heartbeat)]
+        if self.retention_seconds:
+            waits.append(self.retention_seconds - (now - self.last_retention))
+        if STATS.dirty:
+            waits.append(self.metrics_seconds - (now - self.last_metrics))
+        return max(0.0, min(waits))
+
+
+def _leave_quietly(partitions: PartitionMap):
+    # hand our partitions over now instead of when the membership lease lapses
+    try:
+        partitions.stop()
+    except Exception:
+        pass
+
+
+def _flush_metrics_quietly():
+    if STATS.dirty:
+        try:
+            flush_runner_metrics(RUNNER_ID)
+        except Exception:
+            pass
+
+
+def _idle_seconds(listener: WakeupListener, poll_interval: float, max_idle_seconds: float,
+                  until_housekeeping: float, blocked_wait: float | None = None,
+                  claim_filter: dict | None = None) -> float:
+    """
+    How long an idle runner may sleep: until the earliest run_at / lease expiry
+    among the jobs it may claim (claim_filter, see _Housekeeping.claim_filter),
+    capped by the next housekeeping chore. Without a bound wakeup socket we cannot
+    hear enqueues, so the cap falls back to poll_interval.
+    """
+    cap = max_idle_seconds if listener.bound else poll_interval
+    cap = max(0.0, min(cap, until_housekeeping))
+
+    due = next_due_at(**(claim_filter or {}))
+    if due is None:
+        return cap
+
+    wait = (due - datetime.utcnow()).total_seconds()
+    if wait <= 0:
+        # due, but we could not claim it (another runner, or our caps are full)
+        return min(cap, poll_interval if blocked_wait is None else blocked_wait)
+    return min(cap, wait)
+
+
+def prepare_job(job, handlers: dict | None = None):
+    """
+    Parse the payload and resolve the handler for a claimed job.
+    Returns (handler, payload, ctx), or None if the job was failed permanently
+    (corrupt payload / unknown job_type).
+    """
+    job_id = getattr(job, "id", None)
+    job_type = getattr(job, "job_type", None)
+
+    try:
+        payload = json.loads(job.payload_json or "{}")
+    except Exception:
+        # If payload is corrupt, fail the job permanently
+        err = "Invalid payload_json (not parseable JSON)"
+        mark_failed(job_id, err=err, retry_at=None)
+        STATS.record_finish(job_type, _failure_outcome(job), None)
+        log_event(
+            "job.payload_invalid",
+            level="ERROR",
+            job_id=job_id,
+            message=err,
+            data={"job_type": job_type, "payload_json": job.payload_json},
+        )
+        return None
+
+    handler = (handlers or HANDLERS).get(job_type)
+    if not handler:
+        err = f"No handler for job_type={job_type}"
+        mark_failed(job_id, err=err, retry_at=None)
+        STATS.record_finish(job_type, _failure_outcome(job), None)
+        log_event("job.no_handler", level="ERROR", job_id=job_id, message=err, data={"payload": payload})
+        return None
+
+    log_event("job.start", job_id=job_id, message=f"Executing {job_type}", data={"payload": payload})
+    return handler, payload, JobContext(job_id, job_type, attempts=job.attempts or 0)
+
+
+def _failure_outcome(job) -> str:
+    # mirrors mark_failed: the attempt that reaches max_attempts fails the job for good
+    return "failed" if (job.attempts or 0) + 1 >= (job.max_attempts or 8) else "retry"
+
+
+def job_succeeded(job, leases: LeaseKeeper | None = None, ctx: JobContext | None = None):
+    """
+    Commit the handler's unit of work together with mark_done: one commit per job.
+    """
+    if leases:
+        leases.untrack(job.id)
+    if ctx:
+        ctx.uow.log_event("job.success", campaign_id=job.campaign_id or None, job_id=job.id,
+                          message=f"Completed {job.job_type}")
+        # a recurring job's successor commits with this run
+        ctx.uow.finish_recurring(job, ctx.next_run_at)
+        ctx.uow.commit(done_job_id=job.id)
+    else:
+        mark_done(job.id)
+        log_event("job.success", campaign_id=job.campaign_id or None, job_id=job.id,
+                  message=f"Completed {job.job_type}")
+    STATS.record_finish(job.job_type, "done", ctx.elapsed() if ctx else None)
+
+
+def job_deferred(job, e: JobDeferred, leases: LeaseKeeper | None = None, ctx: JobContext | None = None):
+    """
+    Commit the handler's unit of work with the job requeued for e.run_at.
+    Not a failure: attempts and backoff are untouched.
+    """
+    if leases:
+        leases.untrack(job.id)
+    if ctx:
+        ctx.uow.commit_deferred(job.id, e.run_at)
+    else:
+        defer_job(job.id, e.run_at)
+    STATS.record_finish(job.job_type, "deferred", None)
+    log_event("job.deferred", campaign_id=job.campaign_id or None, job_id=job.id, message=str(e),
+              data={"run_at": e.run_at.isoformat()})
+
+
+def job_failed(job, payload: dict, e: Exception, tb: str, leases: LeaseKeeper | None = None,
+               ctx: JobContext | None = None):
+    """
+    Discard the handler's unit of work, record the exception and schedule a retry
+    with exponential backoff.
+    """
+    if leases:
+        leases.untrack(job.id)
+    if ctx:
+        ctx.uow.rollback()
+    attempt_next = (job.attempts or 0) + 1
+    retry_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(attempt_next))
+    err = f"{type(e).__name__}: {str(e)}"
+
+    mark_failed(job.id, err=err, retry_at=retry_at)
+    outcome = _failure_outcome(job)
+    if outcome == "failed" and ctx:
+        # out of attempts: a recurring job still gets its next run
+        ctx.uow.finish_recurring(job)
+        ctx.uow.commit()
+    STATS.record_finish(job.job_type, outcome, ctx.elapsed() if ctx else None)
+
+    log_event(
+        "job.error",
+        level="ERROR",
+        campaign_id=job.campaign_id or None,
+        job_id=job.id,
+        message=err,
+        data={
+            "job_type": job.job_type,
+            "payload": payload,
+            "attempt_next": attempt_next,
+            "retry_at": retry_at.isoformat(),
+            "traceback": tb,
+        },
+    )
+
+
+def execute_job(job, leases: LeaseKeeper | None = None):
+    """
+    Run one claimed job to completion: parse payload, dispatch to its handler,
+    then mark it done or schedule a retry with exponential backoff.
+    While the handler runs, `leases` keeps renewing the job's lease.
+    Coroutine handlers are run to completion with asyncio.run().
+    """
+    prepared = prepare_job(job)
+    if not prepared:
+        return
+    handler, payload, ctx = prepared
+
+    if leases:
+        leases.track(job.id)
+
+    try:
+        # Handlers should be idempotent.
+        result = handler(payload, ctx)
+        if inspect.isawaitable(result):
+            asyncio.run(result)
+        job_succeeded(job, leases, ctx)
+
+    except JobDeferred as e:
+        job_deferred(job, e, leases, ctx)
+
+    except Exception as e:
+        # include traceback to make debugging easier
+        job_failed(job, payload, e, traceback.format_exc(limit=12), leases, ctx)
+
+
+def run_forever(
+    poll_interval: float = 0.5,
+    heartbeat_seconds: int = 15,
+    concurrency: dict | None = None,
+    max_idle_seconds: float = 30.0,
+    retention_seconds: float = 3600,
+):
     """
     Durable worker loop:
     - claims jobs with leases
     - executes handlers
     - retries with exponential backoff
+    - renews leases of in-flight jobs in the background (LeaseKeeper)
     - emits operational events
     - supports clean shutdown (Electron quit)
+
+    Handlers are called as handler(payload, ctx) with a JobContext.
+
+    concurrency: per-job_type caps (see DEFAULT_CONCURRENCY). When given, jobs run
+    on a thread pool instead of one at a time.
+
+    When idle the loop sleeps until the next due job, and enqueue() wakes it early
+    through the loopback channel in app.queue.notify. poll_interval is only the
+    fallback when that channel is unavailable.
+
+    retention_seconds: how often finished jobs are archived/pruned (app.queue.retention);
+    0 disables it.
     """
-    log_event("runner.started", message="Runner loop started", data={"runner_id": RUNNER_ID})
+    global _LISTENER
+    register_scheduler()
+    listener = _LISTENER = WakeupListener()
+    partitions = PartitionMap(RUNNER_ID, lease_seconds=MEMBER_LEASE_HEARTBEATS * heartbeat_seconds)
+    partitions.start()
+    leases = LeaseKeeper()
+    leases.start()
+    try:
+        if concurrency:
+            return _run_pool(concurrency, poll_interval, heartbeat_seconds, max_idle_seconds, retention_seconds,
+                             listener, leases, partitions)
+        return _run_serial(poll_interval, heartbeat_seconds, max_idle_seconds, retention_seconds, listener, leases,
+                           partitions)
+    finally:
+        _leave_quietly(partitions)
+        leases.stop()
+        _LISTENER = None
+        listener.close()
+        _flush_metrics_quietly()
+
 
-    last_heartbeat = 0.0
+def _run_serial(poll_interval: float, heartbeat_seconds: int, max_idle_seconds: float, retention_seconds: float,
+                listener: WakeupListener, leases: LeaseKeeper, partitions: PartitionMap | None = None):
+    log_event(
+        "runner.started",
+        message="Runner loop started",
+        data={"runner_id": RUNNER_ID, "wakeup_channel": listener.bound},
+    )
+
+    chores = _Housekeeping(heartbeat_seconds, retention_seconds, partitions=partitions)
 
     while not _STOP:
-        now = time.time()
-        if now - last_heartbeat >= heartbeat_seconds:
-            last_heartbeat = now
-            try:
-                log_event("runner.heartbeat", message="alive", data={"runner_id": RUNNER_ID})
-            except Exception:
-                pass
+        chores.run_due()
 
-        job = claim_next_job()
+        job = claim_next_job(**chores.claim_filter())
         if not job:
-            time.sleep(poll_interval)
+            listener.wait(_idle_seconds(listener, poll_interval, max_idle_seconds, chores.seconds_until_next(),
+                                        claim_filter=chores.claim_filter()))
             continue
 
-        job_id = getattr(job, "id", None)
-        job_type = getattr(job, "job_type", None)
+        execute_job(job, leases)
 
+        # small yield so we don't spin too hard in tight loops
+        time.sleep(0.01)
+
+    # clean shutdown
+    log_event("runner.stopped", level="WARN", message="Runner loop stopped", data={"runner_id": RUNNER_ID})
+
+
+def _run_pool(concurrency: dict, poll_interval: float, heartbeat_seconds: int, max_idle_seconds: float,
+              retention_seconds: float, listener: WakeupListener, leases: LeaseKeeper,
+              partitions: PartitionMap | None = None):
+    """
+    Pool mode: claim only as many jobs of each type as that type has free slots,
+    and run them on a shared thread pool. Retry/backoff is unchanged (execute_job).
+    """
+    # every explicitly configured type stays out of "*", including those capped at 0 (paused)
+    capped_types = [t for t in concurrency if t != "*"]
+    caps = {t: c for t, c in concurrency.items() if c > 0}
+    in_flight = {t: 0 for t in caps}
+    lock = threading.Lock()
+
+    log_event(
+        "runner.started",
+        message="Runner loop started (pool mode)",
+        data={"runner_id": RUNNER_ID, "concurrency": caps, "wakeup_channel": listener.bound},
+    )
+
+    def _release(bucket: str):
+        with lock:
+            in_flight[bucket] -= 1
+        # a slot freed up: wake the dispatcher
+        listener.poke()
+
+    def _run(job, bucket: str):
         try:
-            payload = json.loads(job.payload_json or "{}")
+            execute_job(job, leases)
         except Exception:
-            payload = {}
-            # If payload is corrupt, fail the job permanently
-            err = "Invalid payload_json (not parseable JSON)"
-            mark_failed(job_id, err=err, retry_at=None)
-            log_event(
-                "job.payload_invalid",
-                level="ERROR",
-                job_id=job_id,
-                message=err,
-                data={"job_type": job_type, "payload_json": job.payload_json},
-            )
-            continue
+            # execute_job already records failures; never let a worker thread die silently
+            pass
+        finally:
+            _release(bucket)
 
-        handler = HANDLERS.get(job_type)
-        if not handler:
-            err = f"No handler for job_type={job_type}"
-            mark_failed(job_id, err=err, retry_at=None)
-            log_event("job.no_handler", level="ERROR", job_id=job_id, message=err, data={"payload": payload})
-            continue
+    executor = ThreadPoolExecutor(max_workers=max(1, sum(caps.values())), thread_name_prefix="job")
+    chores = _Housekeeping(heartbeat_seconds, retention_seconds, in_flight=in_flight, partitions=partitions)
 
-        log_event("job.start", job_id=job_id, message=f"Executing {job_type}", data={"payload": payload})
+    try:
+        while not _STOP:
+            chores.run_due()
 
-        try:
-            # Handlers should be idempotent.
-            handler(payload)
-            mark_done(job_id)
-            log_event("job.success", job_id=job_id, message=f"Completed {job_type}")
-
-        except Exception as e:
-            attempt_next = (job.attempts or 0) + 1
-            retry_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(attempt_next))
-
-            # include traceback to make debugging easier
-            tb = traceback.format_exc(limit=12)
-            err = f"{type(e).__name__}: {str(e)}"
-
-            mark_failed(job_id, err=err, retry_at=retry_at)
-
-            log_event(
-                "job.error",
-                level="ERROR",
-                job_id=job_id,
-                message=err,
-                data={
-                    "job_type": job_type,
-                    "payload": payload,
-                    "attempt_next": attempt_next,
-                    "retry_at": retry_at.isoformat(),
-                    "traceback": tb,
-                },
-            )
+            claimed = 0
+            for bucket, cap in caps.items():
+                with lock:
+                    free = cap - in_flight[bucket]
+                if free <= 0:
+                    continue
 
-        # small yield so we don't spin too hard in tight loops
-        time.sleep(0.01)
+                if bucket == "*":
+                    jobs = claim_jobs(free, exclude_types=capped_types, **chores.claim_filter())
+                else:
+                    jobs = claim_jobs(free, job_types=[bucket], **chores.claim_filter())
+
+                for job in jobs:
+                    with lock:
+                        in_flight[bucket] += 1
+                    executor.submit(_run, job, bucket)
+                claimed += len(jobs)
+
+            if not claimed:
+                # sleep until the next due job, an enqueue, or a slot frees up
+                listener.wait(_idle_seconds(
+                    listener, poll_interval, max_idle_seconds, chores.seconds_until_next(),
+                    blocked_wait=max_idle_seconds, claim_filter=chores.claim_filter(),
+                ))
+                continue
+
+            # small yield so we don't spin too hard in tight loops
+            time.sleep(0.01)
+    finally:
+        # let in-flight handlers finish; their leases still protect them
+        executor.shutdown(wait=True)
 
     # clean shutdown
     log_event("runner.stopped", level="WARN", message="Runner loop stopped", data={"runner_id": RUNNER_ID})
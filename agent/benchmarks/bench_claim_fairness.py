@@ -0,0 +1,84 @@
+# agent/benchmarks/bench_claim_fairness.py
+"""
+Fair claim latency vs backlog depth.
+
+One big campaign has a deep generate_copy backlog. Five small campaigns each have
+a few send_email jobs, and there is one tick. The script reports claim_jobs(16)
+latency at each depth and what the first batch contained.
+
+Run from agent/:
+    python -m benchmarks.bench_claim_fairness --depth 1000 --depth 10000 --depth 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--depth", type=int, action="append")
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("--rounds", type=int, default=30)
+    args = ap.parse_args()
+    depths = args.depth or [1_000, 10_000, 100_000]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SALESTROOPZ_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'salestroopz.db')}"
+
+        from sqlalchemy import insert, delete, text
+        from app.db.sqlite import init_db, get_session, JobQueue
+        from app.queue.job_queue import claim_jobs, _CLAIM_SQL, JOB_PRIORITIES
+
+        init_db()
+
+        print(f"{'backlog':>8} {'p50 ms':>8} {'p95 ms':>8}  first batch")
+        for depth in depths:
+            session = get_session()
+            session.execute(delete(JobQueue))
+            past = datetime.utcnow() - timedelta(minutes=5)
+            rows = [
+                {"job_type": "generate_copy", "status": "queued", "run_at": past + timedelta(microseconds=i),
+                 "payload_json": "{}", "campaign_id": 1, "priority": JOB_PRIORITIES["generate_copy"]}
+                for i in range(depth)
+            ]
+            rows += [
+                {"job_type": "send_email", "status": "queued", "run_at": datetime.utcnow(),
+                 "payload_json": "{}", "campaign_id": c, "priority": JOB_PRIORITIES["send_email"]}
+                for c in range(2, 7) for _ in range(3)
+            ]
+            rows.append({"job_type": "tick", "status": "queued", "run_at": datetime.utcnow(),
+                         "payload_json": "{}", "campaign_id": 0, "priority": JOB_PRIORITIES["tick"]})
+            session.execute(insert(JobQueue), rows)
+            session.commit()
+            session.execute(text("ANALYZE"))
+            session.close()
+
+            first = claim_jobs(args.batch)
+            mix = Counter(f"{j.job_type}@c{j.campaign_id}" for j in first)
+
+            timings = []
+            for _ in range(args.rounds):
+                t0 = time.perf_counter()
+                claim_jobs(args.batch)
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{depth:>8} {statistics.median(timings):>8.2f} {p95:>8.2f}  {dict(mix)}")
+
+        session = get_session()
+        plan = session.execute(
+            text("EXPLAIN QUERY PLAN " + _CLAIM_SQL.format(lane_filter="")),
+            {"now": datetime.utcnow().isoformat(" "), "n": args.batch, "owner": "x", "lease_expires": None},
+        ).all()
+        session.close()
+        print("\nEXPLAIN QUERY PLAN (claim):")
+        for row in plan:
+            print("  ", row[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# agent/benchmarks/bench_claim_jobs.py
+"""
+Claims/sec for competing runner processes on one salestroopz.db.
+
+Run from agent/:
+    python -m benchmarks.bench_claim_jobs --jobs 4000 --batch 1 --batch 16
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+
+def _worker(db_url: str, batch: int, start_evt, out_q):
+    os.environ["SALESTROOPZ_DATABASE_URL"] = db_url
+    from app.queue.job_queue import claim_jobs
+
+    claimed = []
+    start_evt.wait()
+    while True:
+        jobs = claim_jobs(batch)
+        if not jobs:
+            break
+        claimed.extend(j.id for j in jobs)
+    out_q.put(claimed)
+
+
+def _seed(db_url: str, n_jobs: int):
+    os.environ["SALESTROOPZ_DATABASE_URL"] = db_url
+    from app.db.sqlite import init_db, get_session, JobQueue
+
+    init_db()
+    session = get_session()
+    session.add_all(JobQueue(job_type="bench", payload_json="{}") for _ in range(n_jobs))
+    session.commit()
+    session.close()
+
+
+def run(runners: int, batch: int, n_jobs: int) -> tuple[float, bool]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'salestroopz.db')}"
+
+        p = mp.Process(target=_seed, args=(db_url, n_jobs))
+        p.start()
+        p.join()
+
+        start_evt = mp.Event()
+        out_q = mp.Queue()
+        procs = [mp.Process(target=_worker, args=(db_url, batch, start_evt, out_q)) for _ in range(runners)]
+        for p in procs:
+            p.start()
+
+        t0 = time.perf_counter()
+        start_evt.set()
+        results = [out_q.get() for _ in procs]
+        elapsed = time.perf_counter() - t0
+        for p in procs:
+            p.join()
+
+    ids = [i for r in results for i in r]
+    no_double_claims = len(ids) == len(set(ids)) == n_jobs
+    return len(ids) / elapsed, no_double_claims
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=4000)
+    ap.add_argument("--runners", type=int, action="append")
+    ap.add_argument("--batch", type=int, action="append")
+    args = ap.parse_args()
+
+    runners = args.runners or [1, 4, 8]
+    batches = args.batch or [1, 16]
+
+    print(f"{'runners':>8} {'batch':>6} {'claims/s':>10}  exclusive")
+    for b in batches:
+        for r in runners:
+            rate, ok = run(r, b, args.jobs)
+            print(f"{r:>8} {b:>6} {rate:>10.0f}  {'yes' if ok else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# agent/benchmarks/bench_log_event.py
+"""
+log_event() calls/sec from concurrent threads, buffered vs. synchronous writes.
+
+Run from agent/:
+    python -m benchmarks.bench_log_event --events 5000 --threads 8
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
+
+
+def _run(db_url: str, buffered: bool, n_events: int, threads: int, out_q):
+    os.environ["SALESTROOPZ_DATABASE_URL"] = db_url
+    os.environ["SALESTROOPZ_EVENT_BUFFER"] = "1" if buffered else "0"
+    # large enough that the benchmark measures batching, not the drop policy
+    os.environ["SALESTROOPZ_EVENT_BUFFER_MAX"] = str(n_events * threads + 1)
+    from app.db.sqlite import init_db, log_event, flush_events, get_session, Event
+
+    init_db()
+
+    def _emit():
+        for i in range(n_events):
+            log_event("bench.event", job_id=i, data={"i": i})
+
+    ts = [threading.Thread(target=_emit) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    emitted = time.perf_counter() - t0
+    flush_events()
+    written = time.perf_counter() - t0
+
+    session = get_session()
+    n = session.query(Event).filter(Event.event_type == "bench.event").count()
+    session.close()
+    out_q.put((n / emitted, n / written, n))
+
+
+def run(buffered: bool, n_events: int, threads: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'salestroopz.db')}"
+        out_q = mp.Queue()
+        p = mp.Process(target=_run, args=(db_url, buffered, n_events, threads, out_q))
+        p.start()
+        result = out_q.get()
+        p.join()
+        return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=2000, help="events per thread")
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+
+    print(f"{'mode':>10} {'calls/s':>10} {'written/s':>10} {'rows':>8}")
+    for buffered in (False, True):
+        calls, written, n = run(buffered, args.events, args.threads)
+        print(f"{'buffered' if buffered else 'sync':>10} {calls:>10.0f} {written:>10.0f} {n:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# agent/benchmarks/bench_partitions.py
+"""
+Jobs/sec for 1..N runner processes draining one queue: every runner claiming
+from every campaign ("shared") vs. each claiming only its consistent-hash
+partitions of campaigns ("partitioned", app.queue.partitions).
+
+Each runner joins the membership table, waits until all runners are live,
+then loops: claim a batch, hold each job --work-ms (the handler), mark it done.
+"lost races" counts claim calls that came back empty while the queue still
+had due jobs: the write-lock / lease race partitioning is meant to avoid.
+
+Run from agent/:
+    python -m benchmarks.bench_partitions --campaigns 200 --jobs 4000 --runners 1 --runners 2 --runners 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import tempfile
+import time
+
+
+def _seed(db_url: str, n_campaigns: int, n_jobs: int):
+    os.environ["SALESTROOPZ_DATABASE_URL"] = db_url
+    from app.db.sqlite import init_db
+    from app.queue.job_queue import enqueue_bulk
+
+    init_db()
+    enqueue_bulk([
+        {"job_type": "bench", "payload": {"campaign_id": 1 + i % n_campaigns}}
+        for i in range(n_jobs)
+    ])
+
+
+def _remaining(path: str, partitions: list[int] | None = None, partition_count: int = 1) -> int:
+    sql = "SELECT COUNT(*) FROM job_queue WHERE status = 'queued'"
+    if partitions is not None:
+        sql += f" AND campaign_id % {partition_count} IN ({','.join(map(str, partitions)) or '-1'})"
+    conn = sqlite3.connect(path)
+    n = conn.execute(sql).fetchone()[0]
+    conn.close()
+    return n
+
+
+def _worker(db_url: str, path: str, n: int, partitioned: bool, batch: int, work_ms: float,
+            ready, start_evt, out_q):
+    os.environ["SALESTROOPZ_DATABASE_URL"] = db_url
+    os.environ["SALESTROOPZ_EVENT_LEVELS"] = "*=ERROR"
+    os.environ["SALESTROOPZ_EVENT_BUFFER"] = "0"
+    from app.queue.job_queue import claim_jobs, mark_done
+    from app.queue.partitions import PartitionMap
+
+    pmap = PartitionMap(f"bench:{n}", lease_seconds=600)
+    pmap.refresh()
+    ready.put(n)
+    start_evt.wait()
+    pmap.refresh()  # everyone has joined by now
+    claim_filter = pmap.claim_filter() if partitioned else {}
+
+    done = lost = 0
+    while True:
+        jobs = claim_jobs(batch, **claim_filter)
+        if not jobs:
+            if _remaining(path, **claim_filter) == 0:
+                break
+            lost += 1
+            continue
+        for job in jobs:
+            time.sleep(work_ms / 1000)
+            mark_done(job.id)
+            done += 1
+    pmap.leave()
+    out_q.put((done, lost, time.perf_counter()))
+
+
+def run(runners: int, partitioned: bool, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "salestroopz.db")
+        db_url = f"sqlite:///{path}"
+        p = mp.Process(target=_seed, args=(db_url, args.campaigns, args.jobs))
+        p.start()
+        p.join()
+
+        ready, start_evt, out_q = mp.Queue(), mp.Event(), mp.Queue()
+        procs = [
+            mp.Process(target=_worker, args=(db_url, path, n, partitioned, args.batch, args.work_ms,
+                                             ready, start_evt, out_q))
+            for n in range(runners)
+        ]
+        for p in procs:
+            p.start()
+        for _ in procs:
+            ready.get()
+
+        t0 = time.perf_counter()
+        start_evt.set()
+        results = [out_q.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = max(r[2] for r in results) - t0
+        done = sum(r[0] for r in results)
+        return {
+            "jobs_per_s": done / elapsed,
+            "done": done,
+            "lost": sum(r[1] for r in results),
+            "spread": [r[0] for r in results],
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--campaigns", type=int, default=200)
+    ap.add_argument("--jobs", type=int, default=4000)
+    ap.add_argument("--runners", type=int, action="append")
+    ap.add_argument("--batch", type=int, default=8)
+    ap.add_argument("--work-ms", type=float, default=2.0, help="time each job holds its runner")
+    args = ap.parse_args()
+
+    print(f"{args.jobs} jobs over {args.campaigns} campaigns, batch {args.batch}, {args.work_ms:.0f} ms per job")
+    print(f"{'runners':>7} {'claiming':>12} {'jobs/s':>8} {'lost races':>11}  jobs per runner")
+    for runners in args.runners or [1, 2, 4]:
+        for partitioned in (False, True):
+            r = run(runners, partitioned, args)
+            name = "partitioned" if partitioned else "shared"
+            print(f"{runners:>7} {name:>12} {r['jobs_per_s']:>8.0f} {r['lost']:>11}  {r['spread']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# agent/benchmarks/bench_read_engine.py
+"""
+API read latency under concurrent writes: reads on the shared writer engine
+(SALESTROOPZ_DB_READ_ENGINE=0) vs. the separate read-only engine.
+
+Reader threads page leads and activity the way the dashboard does
+(list_leads_page, get_campaign_activity, get_campaign). Writer threads commit
+lead chunks and activity rows (uploads, saves). A separate "runner" process
+holds SQLite's write lock in short bursts, so API writers spend time parked on
+busy_timeout while holding a pooled connection, which is when reads sharing
+that pool queue behind them.
+
+Run from agent/:
+    python -m benchmarks.bench_read_engine --seconds 10 --readers 8 --writers 4 --pool 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+N_CAMPAIGNS = 5
+SEED_LEADS = 20_000
+
+
+def _seed():
+    from app.db.sqlite import get_session, Workspace, ActivityLog, create_campaign, add_leads_bulk
+
+    session = get_session()
+    session.add(Workspace(company_name="bench"))
+    session.commit()
+    session.close()
+    for i in range(N_CAMPAIGNS):
+        c = create_campaign(1, f"c{i}")
+        per = SEED_LEADS // N_CAMPAIGNS
+        add_leads_bulk(c.id, [{"email": f"seed{c.id}-{k}@example.com"} for k in range(per)])
+
+    session = get_session()
+    session.add_all(ActivityLog(lead_id=1 + k % SEED_LEADS, type="email_sent", message="seed") for k in range(SEED_LEADS))
+    session.commit()
+    session.close()
+
+
+def _reader(stop: threading.Event, latencies: list):
+    from app.db.sqlite import list_leads_page, get_campaign_activity, get_campaign
+
+    k = 0
+    while not stop.is_set():
+        c = 1 + k % N_CAMPAIGNS
+        t0 = time.perf_counter()
+        get_campaign(c)
+        list_leads_page(c, limit=100)
+        get_campaign_activity(c, limit=100)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        k += 1
+
+
+def _writer(n: int, stop: threading.Event, counts: list):
+    from sqlalchemy.exc import OperationalError
+    from app.db.sqlite import get_session, insert_leads, ActivityLog
+
+    k = 0
+    while not stop.is_set():
+        session = get_session()
+        c = 1 + k % N_CAMPAIGNS
+        try:
+            insert_leads(session, c, [{"email": f"w{n}-{k}-{i}@example.com"} for i in range(200)])
+            session.add_all(ActivityLog(lead_id=1 + (k * 7 + i) % SEED_LEADS, type="email_sent", message="w") for i in range(20))
+            session.commit()
+            counts[n] += 1
+        except OperationalError:  # busy_timeout ran out
+            session.rollback()
+        finally:
+            session.close()
+        k += 1
+
+
+def _runner_process(path: str, hold_ms: float, stop):
+    """
+    Stand-in for the runner: takes the write lock, holds it hold_ms, releases.
+    """
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO activity_log (lead_id, type, message) VALUES (1, 'runner', 'x')")
+        time.sleep(hold_ms / 1000)
+        conn.execute("COMMIT")
+        time.sleep(hold_ms / 4000)
+    conn.close()
+
+
+def _run(db_path: str, env: dict, args, out_q):
+    os.environ.update(env)
+    os.environ["SALESTROOPZ_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SALESTROOPZ_EVENT_BUFFER"] = "0"
+    os.environ["SALESTROOPZ_EVENT_LEVELS"] = "*=ERROR"
+    from app.db.sqlite import init_db, configure_pool
+
+    seconds, readers, writers = args.seconds, args.readers, args.writers
+    configure_pool(args.pool, max_overflow=0, read_pool_size=args.pool, read_max_overflow=0)
+    init_db()
+    _seed()
+
+    runner_stop = mp.Event()
+    runner = mp.Process(target=_runner_process, args=(db_path, args.hold_ms, runner_stop))
+    runner.start()
+
+    stop = threading.Event()
+    latencies: list[float] = []
+    counts = [0] * writers
+    threads = [threading.Thread(target=_reader, args=(stop, latencies)) for _ in range(readers)]
+    threads += [threading.Thread(target=_writer, args=(n, stop, counts)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    runner_stop.set()
+    runner.join()
+
+    latencies.sort()
+    out_q.put({
+        "reads_per_s": len(latencies) / seconds,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "writes_per_s": sum(counts) / seconds,
+    })
+
+
+def run(env: dict, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        out_q = mp.Queue()
+        p = mp.Process(target=_run, args=(os.path.join(tmp, "salestroopz.db"), env, args, out_q))
+        p.start()
+        result = out_q.get()
+        p.join()
+        return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--pool", type=int, default=4, help="writer pool size; the read pool gets the same")
+    ap.add_argument("--hold-ms", type=float, default=20, help="how long the runner holds the write lock")
+    args = ap.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, pool {args.pool}, "
+          f"runner holds the write lock {args.hold_ms:.0f} ms at a time, {args.seconds:.0f}s each")
+    print(f"{'reads via':>10} {'reads/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'writes/s':>9}")
+    for name, env in (("writer", {"SALESTROOPZ_DB_READ_ENGINE": "0"}), ("read-only", {"SALESTROOPZ_DB_READ_ENGINE": "1"})):
+        r = run(env, args)
+        print(f"{name:>10} {r['reads_per_s']:>8.0f} {r['p50']:>7.1f} {r['p95']:>7.1f} {r['p99']:>7.1f} {r['writes_per_s']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# agent/benchmarks/bench_schema_indexes.py
+"""
+EXPLAIN QUERY PLAN and timings for the tick, lead, activity and claim queries
+on a 100k-lead DB, before and after migration 4 (hot-path composite indexes).
+
+"before" is the same DB with the migration-4 indexes dropped and the
+single-column job_queue indexes it removed put back.
+
+Run from agent/:
+    python -m benchmarks.bench_schema_indexes --leads 100000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+N_CAMPAIGNS = 20
+STATES = ["NEW", "FOLLOWUP", "WAITING_REPLY", "WAITING_REPLY", "STOPPED_NEGATIVE", "COMPLETED"]
+
+
+def _ts(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+QUERIES = {
+    # app.workers.handlers.tick
+    "tick due leads": (
+        "SELECT * FROM lead WHERE campaign_id = :c AND next_touch_at <= :now "
+        "AND state IN ('NEW', 'FOLLOWUP') LIMIT 25"
+    ),
+    # get_due_leads
+    "get_due_leads": (
+        "SELECT * FROM lead WHERE campaign_id = :c AND next_touch_at <= :now "
+        "AND state IN ('NEW', 'FOLLOWUP') ORDER BY next_touch_at LIMIT 10"
+    ),
+    # list_leads
+    "list_leads": "SELECT * FROM lead WHERE campaign_id = :c ORDER BY created_at DESC",
+    # get_campaign_activity
+    "campaign activity": (
+        "SELECT activity_log.* FROM activity_log JOIN lead ON activity_log.lead_id = lead.id "
+        "WHERE lead.campaign_id = :c ORDER BY activity_log.timestamp DESC LIMIT 200"
+    ),
+    # claim_jobs: requeue expired leases
+    "expired leases": "SELECT id FROM job_queue WHERE status = 'running' AND lease_expires_at < :now",
+    # next_due_at
+    "next due run_at": "SELECT MIN(run_at) FROM job_queue WHERE status = 'queued'",
+}
+
+
+def _seed(path: str, n_leads: int, n_jobs: int):
+    os.environ["SALESTROOPZ_DATABASE_URL"] = f"sqlite:///{path}"
+    from app.db.sqlite import init_db
+
+    init_db()
+    rnd = random.Random(7)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO workspace (id, company_name) VALUES (1, 'bench')")
+    conn.executemany(
+        "INSERT INTO campaign (id, workspace_id, name, status) VALUES (?, 1, ?, 'running')",
+        [(c, f"c{c}") for c in range(1, N_CAMPAIGNS + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO lead (id, campaign_id, email, state, touch_count, next_touch_at, created_at) "
+        "VALUES (?, ?, ?, ?, 0, ?, ?)",
+        [
+            (
+                i, 1 + i % N_CAMPAIGNS, f"l{i}@example.com", rnd.choice(STATES),
+                _ts(now + timedelta(hours=rnd.randint(-72, 72))),
+                _ts(now - timedelta(minutes=n_leads - i)),
+            )
+            for i in range(1, n_leads + 1)
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO activity_log (lead_id, type, message, timestamp) VALUES (?, 'email_sent', 'x', ?)",
+        [(rnd.randint(1, n_leads), _ts(now - timedelta(seconds=rnd.randint(0, 30 * 86400)))) for _ in range(n_leads)],
+    )
+    statuses = ["done"] * 8 + ["queued", "running"]
+    conn.executemany(
+        "INSERT INTO job_queue (job_type, status, run_at, lease_expires_at, payload_json, campaign_id, priority, "
+        "attempts, max_attempts, updated_at) VALUES (?, ?, ?, ?, '{}', ?, 10, 0, 8, ?)",
+        [
+            (
+                rnd.choice(["generate_copy", "send_email", "poll_replies"]), st,
+                _ts(now + timedelta(seconds=rnd.randint(-3600, 3600))),
+                _ts(now + timedelta(seconds=rnd.randint(-60, 60))) if st == "running" else None,
+                1 + rnd.randrange(N_CAMPAIGNS), _ts(now),
+            )
+            for st in (rnd.choice(statuses) for _ in range(n_jobs))
+        ],
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def _make_before(path: str):
+    from app.db.sqlite import HOT_PATH_INDEXES, REDUNDANT_JOB_QUEUE_INDEXES
+
+    conn = sqlite3.connect(path)
+    for name, _ in HOT_PATH_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for _, ddl in REDUNDANT_JOB_QUEUE_INDEXES:
+        conn.execute(ddl)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def _measure(path: str, repeat: int) -> dict:
+    conn = sqlite3.connect(path)
+    params = {"c": 7, "now": _ts(datetime.utcnow())}
+    out = {}
+    for name, sql in QUERIES.items():
+        plan = [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            times.append((time.perf_counter() - t0) * 1000)
+        out[name] = (statistics.median(times), plan)
+    conn.close()
+    return out
+
+
+def _time_claims(path: str, rounds: int) -> float:
+    """
+    Median ms of claim_jobs(16) against a scratch copy (claims mutate the DB).
+    """
+    scratch = path + ".claim.db"
+    shutil.copy(path, scratch)
+    conn = sqlite3.connect(scratch)
+    conn.execute("UPDATE job_queue SET run_at = ? WHERE status = 'queued'", (_ts(datetime.utcnow()),))
+    conn.commit()
+    conn.close()
+
+    import app.db.sqlite as db
+    from app.queue.job_queue import claim_jobs
+
+    db.DATABASE_URL = f"sqlite:///{scratch}"
+    db.configure_pool(2)
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        claim_jobs(16)
+        times.append((time.perf_counter() - t0) * 1000)
+    db.engine.dispose()
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--leads", type=int, default=100_000)
+    ap.add_argument("--jobs", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    # keep the benchmark's own events out of the numbers
+    os.environ["SALESTROOPZ_EVENT_LEVELS"] = "*=ERROR"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        after = os.path.join(tmp, "after.db")
+        before = os.path.join(tmp, "before.db")
+        _seed(after, args.leads, args.jobs)
+        shutil.copy(after, before)
+        _make_before(before)
+
+        results = {"before": _measure(before, args.repeat), "after": _measure(after, args.repeat)}
+        claims = {"before": _time_claims(before, args.repeat), "after": _time_claims(after, args.repeat)}
+
+    print(f"{args.leads} leads, {args.leads} activity rows, {args.jobs} jobs; median of {args.repeat} runs\n")
+    for name in QUERIES:
+        b_ms, b_plan = results["before"][name]
+        a_ms, a_plan = results["after"][name]
+        print(f"{name}: {b_ms:.2f} ms -> {a_ms:.2f} ms")
+        print("  before: " + " | ".join(b_plan))
+        print("  after:  " + " | ".join(a_plan))
+    print(f"claim_jobs(16): {claims['before']:.2f} ms -> {claims['after']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
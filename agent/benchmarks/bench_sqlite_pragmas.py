@@ -0,0 +1,127 @@
+# agent/benchmarks/bench_sqlite_pragmas.py
+"""
+SQLite's per-connection defaults vs. the tuned pragmas in app.db.sqlite,
+on the queue workload (claim + one-commit unit of work from several threads)
+and the lead workload (bulk insert, list, due-lead scans).
+
+Run from agent/:
+    python -m benchmarks.bench_sqlite_pragmas --jobs 3000 --leads 20000
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
+
+# what every pooled connection got before pragmas were applied per connection
+SQLITE_DEFAULTS = {
+    "SALESTROOPZ_SQLITE_SYNCHRONOUS": "FULL",
+    "SALESTROOPZ_SQLITE_CACHE_KB": "2000",
+    "SALESTROOPZ_SQLITE_MMAP_MB": "0",
+    "SALESTROOPZ_SQLITE_TEMP_STORE": "DEFAULT",
+    "SALESTROOPZ_SQLITE_WAL_AUTOCHECKPOINT": "1000",
+}
+TUNED = {}  # app.db.sqlite defaults
+
+
+def _queue_workload(n_jobs: int, threads: int) -> float:
+    from app.queue.job_queue import enqueue_many, claim_jobs
+    from app.workers.context import UnitOfWork
+
+    for i in range(0, n_jobs, 500):
+        enqueue_many([
+            {"job_type": "bench", "payload": {"campaign_id": 1 + k % 5, "i": k}}
+            for k in range(i, min(n_jobs, i + 500))
+        ])
+
+    def _work():
+        while True:
+            jobs = claim_jobs(8, job_types=["bench"])
+            if not jobs:
+                return
+            for job in jobs:
+                uow = UnitOfWork()
+                uow.log_event("bench.done", job_id=job.id)
+                uow.commit(done_job_id=job.id)
+
+    ts = [threading.Thread(target=_work) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return n_jobs / (time.perf_counter() - t0)
+
+
+def _lead_workload(n_leads: int) -> dict:
+    from app.db.sqlite import get_session, Workspace, create_campaign, add_leads_bulk, list_leads, get_due_leads
+
+    session = get_session()
+    session.add(Workspace(company_name="bench"))
+    session.commit()
+    session.close()
+    campaigns = [create_campaign(1, f"c{i}") for i in range(5)]
+
+    t0 = time.perf_counter()
+    per = n_leads // len(campaigns)
+    for c in campaigns:
+        for i in range(0, per, 1000):
+            add_leads_bulk(c.id, [{"email": f"l{c.id}-{k}@example.com"} for k in range(i, min(per, i + 1000))])
+    insert_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(3):
+        for c in campaigns:
+            list_leads(c.id)
+    list_ms = (time.perf_counter() - t0) * 1000 / (3 * len(campaigns))
+
+    t0 = time.perf_counter()
+    for _ in range(50):
+        for c in campaigns:
+            get_due_leads(c.id, limit=25)
+    due_ms = (time.perf_counter() - t0) * 1000 / (50 * len(campaigns))
+
+    return {"leads_insert_per_s": n_leads / insert_s, "list_leads_ms": list_ms, "due_leads_ms": due_ms}
+
+
+def _run(db_url: str, env: dict, n_jobs: int, n_leads: int, threads: int, out_q):
+    os.environ.update(env)
+    os.environ["SALESTROOPZ_DATABASE_URL"] = db_url
+    os.environ["SALESTROOPZ_EVENT_BUFFER"] = "0"  # measure the unit-of-work path only
+    from app.db.sqlite import init_db, configure_pool
+
+    configure_pool(threads + 2)
+    init_db()
+    result = {"jobs_per_s": _queue_workload(n_jobs, threads)}
+    result.update(_lead_workload(n_leads))
+    out_q.put(result)
+
+
+def run(env: dict, n_jobs: int, n_leads: int, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'salestroopz.db')}"
+        out_q = mp.Queue()
+        p = mp.Process(target=_run, args=(db_url, env, n_jobs, n_leads, threads, out_q))
+        p.start()
+        result = out_q.get()
+        p.join()
+        return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=3000)
+    ap.add_argument("--leads", type=int, default=20000)
+    ap.add_argument("--threads", type=int, default=4)
+    args = ap.parse_args()
+
+    print(f"{'config':>10} {'jobs/s':>8} {'leads/s':>9} {'list ms':>8} {'due ms':>7}")
+    for name, env in (("defaults", SQLITE_DEFAULTS), ("tuned", TUNED)):
+        r = run(env, args.jobs, args.leads, args.threads)
+        print(f"{name:>10} {r['jobs_per_s']:>8.0f} {r['leads_insert_per_s']:>9.0f} "
+              f"{r['list_leads_ms']:>8.1f} {r['due_leads_ms']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# agent/benchmarks/bench_tick.py
+"""
+Scheduler tick at 500 running campaigns x 10k leads: the previous per-campaign
+loop (one due-leads query per campaign, limit 25, enqueue_many) vs. the
+set-based handle_tick (one windowed query, one enqueue_bulk).
+
+Each variant runs on its own copy of the seeded DB:
+- first tick: empty queue, every picked lead becomes a generate_copy job
+- next tick: same due leads, all coalesced by their dedupe keys
+
+Run from agent/:
+    python -m benchmarks.bench_tick --campaigns 500 --leads 10000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+
+def _ts(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _seed(path: str, n_campaigns: int, n_leads: int):
+    os.environ["SALESTROOPZ_DATABASE_URL"] = f"sqlite:///{path}"
+    from app.db.sqlite import init_db
+
+    init_db()
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO workspace (id, company_name) VALUES (1, 'bench')")
+    # a third of the campaigns have no max_concurrent_leads (default cap), one in ten is paused
+    conn.executemany(
+        "INSERT INTO campaign (id, workspace_id, name, status, run_config_json, config_version) VALUES (?, 1, ?, ?, ?, 1)",
+        [
+            (c, f"c{c}", "paused" if c % 10 == 0 else "running",
+             f'{{"max_concurrent_leads": {5 + c % 20}}}' if c % 3 else None)
+            for c in range(1, n_campaigns + 1)
+        ],
+    )
+    # leads generated in SQL; about a third NEW/FOLLOWUP, next_touch_at within +-72h
+    conn.execute(
+        """
+        WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i < :total - 1)
+        INSERT INTO lead (campaign_id, email, state, touch_count, next_touch_at, created_at)
+        SELECT 1 + i / :per, 'l' || i || '@example.com',
+               CASE abs(random()) % 6 WHEN 0 THEN 'NEW' WHEN 1 THEN 'FOLLOWUP' WHEN 2 THEN 'WAITING_REPLY'
+                    WHEN 3 THEN 'WAITING_REPLY' WHEN 4 THEN 'STOPPED_NEGATIVE' ELSE 'COMPLETED' END,
+               0,
+               strftime('%Y-%m-%d %H:%M:%f000', :now, ((abs(random()) % 144) - 72) || ' hours'),
+               :now
+        FROM seq
+        """,
+        {"total": n_campaigns * n_leads, "per": n_leads, "now": _ts(now)},
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def _legacy_jobs(session, now: datetime) -> list[dict]:
+    """
+    handle_tick before it went set-based.
+    """
+    from app.db.sqlite import Campaign, Lead
+
+    jobs = []
+    for c in session.query(Campaign).filter(Campaign.status == "running").all():
+        due = (
+            session.query(Lead)
+            .filter(Lead.campaign_id == c.id)
+            .filter(Lead.next_touch_at <= now)
+            .filter(Lead.state.in_(["NEW", "FOLLOWUP"]))
+            .limit(25)
+            .all()
+        )
+        for lead in due:
+            jobs.append({
+                "job_type": "generate_copy",
+                "payload": {"campaign_id": c.id, "lead_id": lead.id},
+                "dedupe_key": f"generate_copy:c{c.id}:l{lead.id}",
+            })
+    return jobs
+
+
+def _legacy_tick():
+    from app.workers.context import UnitOfWork
+
+    uow = UnitOfWork()
+    uow.enqueue_many(_legacy_jobs(uow.session, datetime.utcnow()))
+    uow.commit()
+
+
+def _legacy_picked() -> int:
+    from app.db.sqlite import get_session
+
+    session = get_session()
+    n = len(_legacy_jobs(session, datetime.utcnow()))
+    session.close()
+    return n
+
+
+def _set_based_tick():
+    from app.workers.handlers.tick import handle_tick
+
+    handle_tick({})
+
+
+def _set_based_picked() -> int:
+    from app.db.sqlite import get_session
+    from app.workers.handlers.tick import due_leads
+
+    session = get_session()
+    n = len(due_leads(session, datetime.utcnow()))
+    session.close()
+    return n
+
+
+def _time_variant(path: str, tick, picked) -> dict:
+    import app.db.sqlite as db
+
+    db.DATABASE_URL = f"sqlite:///{path}"
+    db.configure_pool(2)
+    times = []
+    for _ in range(2):
+        t0 = time.perf_counter()
+        tick()
+        times.append((time.perf_counter() - t0) * 1000)
+    n = picked()
+    db.engine.dispose()
+
+    conn = sqlite3.connect(path)
+    queued = conn.execute("SELECT COUNT(*) FROM job_queue WHERE job_type = 'generate_copy'").fetchone()[0]
+    conn.close()
+    return {"first_ms": times[0], "next_ms": times[1], "picked": n, "queued": queued}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--campaigns", type=int, default=500)
+    ap.add_argument("--leads", type=int, default=10_000, help="leads per campaign")
+    args = ap.parse_args()
+
+    os.environ["SALESTROOPZ_EVENT_LEVELS"] = "*=ERROR"
+    os.environ["SALESTROOPZ_EVENT_BUFFER"] = "0"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, "seed.db")
+        t0 = time.perf_counter()
+        _seed(seeded, args.campaigns, args.leads)
+        print(f"seeded {args.campaigns} campaigns x {args.leads} leads in {time.perf_counter() - t0:.0f}s\n")
+
+        results = {}
+        variants = (("per-campaign", _legacy_tick, _legacy_picked), ("set-based", _set_based_tick, _set_based_picked))
+        for name, tick, picked in variants:
+            path = os.path.join(tmp, f"{name}.db")
+            shutil.copy(seeded, path)
+            results[name] = _time_variant(path, tick, picked)
+
+    print(f"{'tick':>13} {'first ms':>9} {'next ms':>8} {'leads picked':>13} {'generate_copy jobs':>19}")
+    for name, r in results.items():
+        print(f"{name:>13} {r['first_ms']:>9.0f} {r['next_ms']:>8.0f} {r['picked']:>13} {r['queued']:>19}")
+
+
+if __name__ == "__main__":
+    main()
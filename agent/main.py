@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from app.llm.ollama_client import check_ollama, generate_text
-from app.db.sqlite import init_db, save_workspace, log_event
+from app.db.sqlite import init_db, save_workspace, log_event, configure_pool
 from app.schemas.models import WorkspaceRequest
 
 from app.m365.auth import M365Auth
@@ -11,8 +11,10 @@ from app.m365.client import M365Client
 
 from app.api.campaign_routes import router as campaign_router
 from app.api.agent_routes import router as agent_router
+from app.api.queue_routes import router as queue_router
 
 from datetime import datetime, timedelta
+import os
 
 
 app = FastAPI(title="Salestroopz Local Agent")
@@ -29,6 +31,7 @@ app.add_middleware(
 # Include routers AFTER app is created
 app.include_router(campaign_router)
 app.include_router(agent_router)
+app.include_router(queue_router)
 
 # --- M365 setup ---
 # NOTE: keep this lightweight; device-flow does the real work later
@@ -53,16 +56,24 @@ class SendEmailRequest(BaseModel):
 def on_startup():
     """
     Keep startup safe + fast:
-    - init DB
+    - size the DB pool for the request threadpool, init DB
     - enqueue first scheduler tick (fails soft if queue not present yet)
     """
+    # sync routes run on a threadpool; the overflow absorbs bursts beyond the steady size.
+    # Reads (dashboard polling) get their own read-only pool so they never queue behind writes.
+    configure_pool(
+        int(os.getenv("SALESTROOPZ_API_DB_POOL_SIZE", "8")),
+        max_overflow=int(os.getenv("SALESTROOPZ_API_DB_MAX_OVERFLOW", "16")),
+        read_pool_size=int(os.getenv("SALESTROOPZ_API_DB_READ_POOL_SIZE", "8")),
+        read_max_overflow=int(os.getenv("SALESTROOPZ_API_DB_READ_MAX_OVERFLOW", "16")),
+    )
     init_db()
     try:
         # Only available after you add app/queue/job_queue.py
-        from app.queue.job_queue import enqueue
+        from app.queue.scheduler import register_scheduler
 
-        # Seed the scheduler loop (runner will keep scheduling subsequent ticks)
-        enqueue("tick", {}, run_at=datetime.utcnow() + timedelta(seconds=1))
+        # Make sure the scheduler tick exists (one instance, however often the API restarts)
+        register_scheduler(first_run_at=datetime.utcnow() + timedelta(seconds=1))
         log_event("api.startup", message="DB initialized; tick seeded")
     except Exception as e:
         # Do not crash API if queue isn't wired yet
@@ -1,15 +1,55 @@
 # agent/worker_main.py
 import os
-from app.db.sqlite import init_db, log_event
+import asyncio
+from app.db.sqlite import init_db, log_event, configure_pool
 
 # You will create app/workers/runner.py with run_forever()
 # (If you already have it elsewhere, update the import below.)
-from app.workers.runner import run_forever
+from app.workers.runner import run_forever, parse_concurrency
+
+def _pool_size(concurrency: dict | None, async_mode: bool) -> int:
+    """
+    Connections the runner can hold at once: one per handler thread, plus the
+    dispatcher, lease keeper, partition map, event sink and housekeeping.
+    """
+    if async_mode:
+        # DB work runs on the runner's to_thread executor
+        from app.workers.async_runner import ASYNC_CONCURRENCY, executor_threads
+        threads = executor_threads(concurrency or ASYNC_CONCURRENCY)
+    else:
+        threads = sum(concurrency.values()) if concurrency else 1
+    return threads + 5
+
 
 def main():
+    async_mode = os.getenv("SALESTROOPZ_RUNNER_MODE", "threads") == "async"
+    if async_mode:
+        from app.workers.async_runner import ASYNC_CONCURRENCY
+        concurrency = parse_concurrency(os.getenv("SALESTROOPZ_RUNNER_CONCURRENCY"), defaults=ASYNC_CONCURRENCY)
+    else:
+        # e.g. "generate_copy=1,send_email=8" enables pool mode
+        concurrency = parse_concurrency(os.getenv("SALESTROOPZ_RUNNER_CONCURRENCY"))
+
+    configure_pool(int(os.getenv("SALESTROOPZ_DB_POOL_SIZE", _pool_size(concurrency, async_mode))))
     init_db()
     log_event("runner.boot", message="Runner starting (worker_main)")
-    run_forever(poll_interval=float(os.getenv("SALESTROOPZ_RUNNER_POLL", "0.5")))
+
+    # SALESTROOPZ_RUNNER_MODE=async runs the asyncio runner (I/O-bound handlers)
+    if async_mode:
+        from app.workers.async_runner import run_forever_async
+
+        asyncio.run(run_forever_async(
+            poll_interval=float(os.getenv("SALESTROOPZ_RUNNER_POLL", "0.5")),
+            concurrency=concurrency,
+            retention_seconds=float(os.getenv("SALESTROOPZ_RETENTION_INTERVAL", "3600")),
+        ))
+        return
+
+    run_forever(
+        poll_interval=float(os.getenv("SALESTROOPZ_RUNNER_POLL", "0.5")),
+        concurrency=concurrency,
+        retention_seconds=float(os.getenv("SALESTROOPZ_RETENTION_INTERVAL", "3600")),
+    )
 
 if __name__ == "__main__":
     main()
@@ -27,6 +27,7 @@ export const runStatus = () => axios.get(`${API}/orchestrator/run/status`);
 
 export const activityFeed = () => axios.get(`${API}/orchestrator/activity`);
 export const metrics = () => axios.get(`${API}/orchestrator/metrics`);
+export const queueMetrics = () => axios.get(`${API}/queue/metrics`);
 
 // Health
 export const ollamaStatus = () => axios.get(`${API}/ollama/status`);
@@ -1,6 +1,9 @@
 import { useState } from "react";
 
 const API_BASE = import.meta.env.VITE_AGENT_URL || "http://127.0.0.1:8000";
+const POLL_MS = 1000;
+
+const sleep = (ms) => new Promise((r) => setTimeout(r, ms));
 
 export default function CSVUpload({ campaignId }) {
   const [file, setFile] = useState(null);
@@ -37,7 +40,19 @@ export default function CSVUpload({ campaignId }) {
 
       if (!res.ok) throw new Error(data.detail || "Upload failed");
 
-      setMessage(`✅ ${data.inserted} leads uploaded`);
+      // the import runs as a background job; follow its progress
+      let status = data;
+      while (status.status === "queued" || status.status === "running") {
+        setMessage(`⏳ Importing... ${status.rows_read || 0} rows read, ${status.inserted || 0} new leads`);
+        await sleep(POLL_MS);
+        const r = await fetch(`${API_BASE}/campaign/${campaignId}/leads/imports/${data.import_id}`);
+        status = await r.json();
+        if (!r.ok) throw new Error(status.detail || "Import status unavailable");
+      }
+
+      if (status.status === "failed") throw new Error(status.error || "Import failed");
+
+      setMessage(`✅ ${status.inserted} leads uploaded (${status.skipped} duplicates/invalid skipped)`);
       setFile(null);
 
     } catch (err) {
@@ -1,56 +1,138 @@
-import { useState } from "react";
-// import { uploadLeads } from "../api";
-
-const DEMO_LEADS = [
-  { id: 1, name: "Asha N.", company: "RetailCo", title: "VP Ops", status: "ready" },
-  { id: 2, name: "Ben T.", company: "SaaSWorks", title: "Head of Growth", status: "in_sequence" },
-  { id: 3, name: "Carla M.", company: "CloudLab", title: "CRO", status: "replied_positive" },
-];
-
-export default function LeadsPanel() {
-  const [file, setFile] = useState(null);
-  const [leads] = useState(DEMO_LEADS);
-
-  const upload = async () => {
-    if (!file) return alert("Pick a CSV first.");
-    // await uploadLeads(file);
-    alert("Uploaded (UI stub). Wire to /leads/upload later.");
+import { useCallback, useEffect, useState } from "react";
+
+const API_BASE = import.meta.env.VITE_AGENT_URL || "http://127.0.0.1:8000";
+
+const PAGE_SIZE = 50;
+const STATES = ["", "NEW", "FOLLOWUP", "WAITING_REPLY", "STOPPED_POSITIVE", "STOPPED_NEGATIVE", "COMPLETED"];
+
+// Pages through GET /campaign/{id}/leads with its keyset cursor, so only the
+// rows on screen are ever fetched. Filters run server-side.
+export default function LeadsPanel({ campaignId }) {
+  const [leads, setLeads] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [state, setState] = useState("");
+  const [query, setQuery] = useState("");
+  const [search, setSearch] = useState("");
+  const [loading, setLoading] = useState(false);
+  const [msg, setMsg] = useState("");
+
+  // debounce typing before hitting the API
+  useEffect(() => {
+    const t = setTimeout(() => setSearch(query.trim()), 300);
+    return () => clearTimeout(t);
+  }, [query]);
+
+  const fetchPage = useCallback(
+    async (cursor) => {
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (cursor) params.set("cursor", cursor);
+      if (state) params.set("state", state);
+      if (search) params.set("q", search);
+
+      const res = await fetch(`${API_BASE}/campaign/${campaignId}/leads?${params}`);
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.detail || "Failed to load leads");
+      return data;
+    },
+    [campaignId, state, search]
+  );
+
+  const reload = useCallback(async () => {
+    setLeads([]);
+    setNextCursor(null);
+    if (!campaignId) return;
+
+    try {
+      setLoading(true);
+      setMsg("");
+      const data = await fetchPage(null);
+      setLeads(data.items);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setMsg(`❌ ${err.message}`);
+    } finally {
+      setLoading(false);
+    }
+  }, [campaignId, fetchPage]);
+
+  useEffect(() => {
+    reload();
+  }, [reload]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoading(true);
+      const data = await fetchPage(nextCursor);
+      setLeads((prev) => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setMsg(`❌ ${err.message}`);
+    } finally {
+      setLoading(false);
+    }
   };
 
   return (
     <div style={{ marginTop: 14 }}>
-      <h2>Leads</h2>
+      <div className="row" style={{ justifyContent: "space-between", alignItems: "center" }}>
+        <h2>Leads</h2>
+        <button className="btn" onClick={reload} disabled={!campaignId || loading}>
+          Refresh
+        </button>
+      </div>
 
-      <div className="row">
-        <div className="col">
-          <label>Upload CSV (name, email, company, title...)</label>
-          <input type="file" accept=".csv" onChange={(e) => setFile(e.target.files?.[0])} />
-        </div>
-        <div className="col" style={{ display: "flex", alignItems: "end" }}>
-          <button className="btn" onClick={upload}>Upload</button>
+      {!campaignId && <p className="muted">Create/select a campaign to see its leads.</p>}
+
+      {campaignId && (
+        <div className="row">
+          <div className="col">
+            <label>Search (email, name or company prefix)</label>
+            <input value={query} onChange={(e) => setQuery(e.target.value)} placeholder="e.g. ben@ or SaaS" />
+          </div>
+          <div className="col">
+            <label>State</label>
+            <select value={state} onChange={(e) => setState(e.target.value)}>
+              {STATES.map((s) => (
+                <option key={s} value={s}>
+                  {s || "All"}
+                </option>
+              ))}
+            </select>
+          </div>
         </div>
-      </div>
+      )}
+
+      {msg && <p style={{ marginTop: 10 }}>{msg}</p>}
 
       <table className="table" style={{ marginTop: 10 }}>
         <thead>
           <tr>
             <th>Name</th>
+            <th>Email</th>
             <th>Company</th>
-            <th>Title</th>
+            <th>Touches</th>
             <th>Status</th>
           </tr>
         </thead>
         <tbody>
           {leads.map((l) => (
             <tr key={l.id}>
-              <td>{l.name}</td>
+              <td>{l.full_name}</td>
+              <td>{l.email}</td>
               <td>{l.company}</td>
-              <td>{l.title}</td>
-              <td className="mono">{l.status}</td>
+              <td>{l.touch_count}</td>
+              <td className="mono">{l.state}</td>
             </tr>
           ))}
         </tbody>
       </table>
+
+      {nextCursor && (
+        <button className="btn" style={{ marginTop: 10 }} onClick={loadMore} disabled={loading}>
+          {loading ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }